@@ -0,0 +1,267 @@
+"""
+api_cache.py
+
+Response cache for the metered deep-scan APIs (IntelligenceX, HIBP,
+Shodan) and the free mention sources.
+- Each source has its own TTL. Breach data changes slowly, Shodan faster.
+- Concurrent identical queries are coalesced: one caller makes the
+  upstream request and the others wait for its answer.
+- A quota ledger records upstream spend per API key and day. An optional
+  daily limit per source stops calls once the key's budget is used up.
+- In multi-worker deployments, responses are also stored in SharedState,
+  so a lookup made by one worker is a cache hit in the others.
+  Coalescing stays per process.
+Plugged into DeepScanService._make_request.
+"""
+
+import hashlib
+import json
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import date
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import APIConfig
+from database import db
+from deadline import DeadlineExceeded
+from shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that carry credentials; never part of a cache key
+SECRET_PARAMS = {"key", "apikey", "api_key", "token"}
+
+
+def key_fingerprint(api_key: Optional[str]) -> str:
+    """Stable short id for an API key, so the ledger never stores the key itself"""
+    if not api_key:
+        return "anonymous"
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+class QuotaLedger:
+    """Per-source, per-API-key, per-day usage counters persisted in the database"""
+
+    def __init__(self, database, daily_limits: Optional[Dict[str, int]] = None):
+        self.db = database
+        self.daily_limits = daily_limits if daily_limits is not None else APIConfig.API_DAILY_QUOTAS
+
+    def record(self, source: str, api_key: Optional[str], **counts: int):
+        self.db.record_api_usage(source, key_fingerprint(api_key), date.today().isoformat(), **counts)
+
+    def reserve(self, source: str, api_key: Optional[str]) -> bool:
+        """
+        Count one upstream call, checking and spending the daily limit together.
+        False when the key's budget for the source is used up.
+        """
+        limit = self.daily_limits.get(source, 0)
+        day = date.today().isoformat()
+        if not limit:
+            self.db.record_api_usage(source, key_fingerprint(api_key), day, calls=1)
+            return True
+        reserved = self.db.reserve_api_call(source, key_fingerprint(api_key), day, limit)
+        if reserved is None:
+            # Ledger unavailable: don't block the call, but still count it
+            self.db.record_api_usage(source, key_fingerprint(api_key), day, calls=1)
+            return True
+        return reserved
+
+    def remaining(self, source: str, api_key: Optional[str]) -> Optional[int]:
+        """Calls left today for this key, or None when the source has no limit"""
+        limit = self.daily_limits.get(source, 0)
+        if not limit:
+            return None
+        usage = self.db.get_api_usage(date.today().isoformat(), source=source, key_id=key_fingerprint(api_key))
+        spent = usage[0]["calls"] if usage else 0
+        return max(0, limit - spent)
+
+    def usage(self, day: Optional[str] = None):
+        return self.db.get_api_usage(day or date.today().isoformat())
+
+
+class APIResponseCache:
+    """TTL cache with request coalescing in front of upstream API calls"""
+
+    def __init__(self, ledger: Optional[QuotaLedger] = None,
+                 ttls: Optional[Dict[str, float]] = None,
+                 max_entries: int = APIConfig.API_CACHE_SIZE,
+                 shared: Optional[SharedState] = None):
+        self.ledger = ledger
+        self.ttls = ttls if ttls is not None else APIConfig.API_CACHE_TTLS
+        self.max_entries = max_entries
+        self.shared = shared
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def cache_key(source: str, url: str, params: Optional[Dict] = None) -> str:
+        public = {k: v for k, v in (params or {}).items() if k.lower() not in SECRET_PARAMS}
+        raw = json.dumps([source, url, public], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _count(self, source: str, counter: str):
+        counters = self._stats.setdefault(source, {
+            "hits": 0, "shared_hits": 0, "misses": 0, "coalesced": 0, "upstream": 0, "failures": 0,
+            "quota_denied": 0,
+        })
+        counters[counter] += 1
+
+    def _record(self, source: str, api_key: Optional[str], **counts: int):
+        if self.ledger is None:
+            return
+        try:
+            self.ledger.record(source, api_key, **counts)
+        except Exception as e:
+            logger.debug(f"Quota ledger error ({source}): {str(e)}")
+
+    def fetch(self, source: str, url: str, params: Optional[Dict], upstream: Callable[[], Optional[Any]],
+              api_key: Optional[str] = None, force_refresh: bool = False,
+              wait_timeout: Optional[float] = None) -> Optional[Any]:
+        """
+        Return the cached response for (source, url, params) or call upstream().
+        A None response (failed request) is never cached.
+        wait_timeout bounds how long a coalesced caller waits for the
+        in-flight request (TimeoutError when exceeded). If that request
+        ran out of its own scan's budget, waiters don't inherit the
+        DeadlineExceeded: they look again and one of them calls upstream.
+        """
+        ttl = self.ttls.get(source, 0)
+        key = self.cache_key(source, url, params)
+        wait_until = time.monotonic() + wait_timeout if wait_timeout is not None else None
+
+        while True:
+            with self._lock:
+                cached = None
+                entry = self._entries.get(key) if ttl > 0 and not force_refresh else None
+                if entry is not None:
+                    if entry[0] > time.time():
+                        self._entries.move_to_end(key)
+                        self._count(source, "hits")
+                        cached = entry[2]
+                    else:
+                        del self._entries[key]
+
+                if cached is None:
+                    waiting = self._inflight.get(key)
+                    if waiting is None:
+                        future = self._inflight[key] = Future()
+                        self._count(source, "misses")
+                    else:
+                        self._count(source, "coalesced")
+
+            if cached is not None:
+                self._record(source, api_key, cache_hits=1)
+                return cached
+            if waiting is None:
+                break
+            self._record(source, api_key, coalesced=1)
+            try:
+                timeout = max(0.0, wait_until - time.monotonic()) if wait_until is not None else None
+                return waiting.result(timeout=timeout)
+            except DeadlineExceeded:
+                continue  # the leader's budget, not ours
+
+        try:
+            expires_at = time.time() + ttl
+            shared = self._shared_get(source, key) if ttl > 0 and not force_refresh else None
+            if shared is not None:
+                result, expires_at = shared
+                self._record(source, api_key, cache_hits=1)
+            else:
+                result = self._call_upstream(source, upstream, api_key)
+                if result is not None and ttl > 0:
+                    self._shared_set(source, key, result, ttl)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if result is not None and ttl > 0:
+                self._entries[key] = (expires_at, source, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def _shared_get(self, source: str, key: str) -> Optional[Tuple[Any, float]]:
+        """(response, expires_at) from the cross-worker tier"""
+        if self.shared is None:
+            return None
+        try:
+            entry = self.shared.cache_get(f"api:{source}", key)
+        except Exception as e:
+            logger.debug(f"Shared API cache read error ({source}): {str(e)}")
+            return None
+        if entry is not None:
+            with self._lock:
+                self._count(source, "shared_hits")
+        return entry
+
+    def _shared_set(self, source: str, key: str, result: Any, ttl: float):
+        if self.shared is None:
+            return
+        try:
+            self.shared.cache_set(f"api:{source}", key, result, ttl)
+        except Exception as e:
+            logger.debug(f"Shared API cache write error ({source}): {str(e)}")
+
+    def _call_upstream(self, source: str, upstream: Callable[[], Optional[Any]],
+                       api_key: Optional[str]) -> Optional[Any]:
+        # The call is counted when it is reserved, so concurrent callers can't overshoot the limit
+        if self.ledger is not None:
+            try:
+                allowed = self.ledger.reserve(source, api_key)
+            except Exception as e:
+                logger.debug(f"Quota ledger error ({source}): {str(e)}")
+                allowed = True
+            if not allowed:
+                logger.warning(f"Daily quota exhausted for {source}; skipping request")
+                with self._lock:
+                    self._count(source, "quota_denied")
+                return None
+
+        result = upstream()
+        with self._lock:
+            self._count(source, "upstream")
+            if result is None:
+                self._count(source, "failures")
+        if result is None:
+            self._record(source, api_key, failures=1)
+        return result
+
+    def invalidate(self, source: Optional[str] = None):
+        """Drop cached responses (all sources when source is None)"""
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+            else:
+                for key in [key for key, entry in self._entries.items() if entry[1] == source]:
+                    del self._entries[key]
+        if self.shared is not None:
+            if source is None:
+                self.shared.cache_delete("api:", prefix=True)
+            else:
+                self.shared.cache_delete(f"api:{source}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "shared": self.shared is not None,
+                "inflight": len(self._inflight),
+                "sources": {source: dict(counters) for source, counters in self._stats.items()},
+            }
+
+
+# Initialize cache singleton (ledger persisted in the investigations database)
+api_cache = APIResponseCache(QuotaLedger(db), shared=shared_state)
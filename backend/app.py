@@ -6,26 +6,56 @@ Case-based investigation workflow with phone intelligence support.
 
 Endpoints:
   POST /api/investigation/create       - Create investigation case
-  POST /api/investigation/scan/{caseId}/{scanType}  - Run scan
+  POST /api/investigation/scan/{caseId}/{scanType}  - Queue scan (202 + job id)
+  GET  /api/investigation/job/{jobId}             - Scan job state/progress
+  GET  /api/investigation/stream/{jobId}          - Scan results as Server-Sent Events
   GET  /api/investigation/result/{caseId}         - Get results
+  GET  /api/investigation/related/{caseId}        - Cases sharing indicators
+  GET  /api/indicator/{kind}/{value}              - Cases containing an indicator
+  POST /api/batch/username-scan        - Batch username scan (Server-Sent Events)
   POST /api/phone/lookup               - Phone intelligence
   POST /api/phone/scan                 - Phone scan shortcut
+  POST /api/phone/batch-lookup         - Batch phone intelligence (JSON or CSV)
+  GET  /api/cache/stats                - Cache counters and API quota usage
+  GET  /api/rate-limits                - Per-host rate limiter and probe hedging metrics
+  GET  /api/probe-transfer             - Per-platform probe bytes downloaded
+  GET  /api/platforms                  - Probed sites and their category tags
   GET  /api/health                     - Health check
 """
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import base64
+import json
+import math
 import os
+import threading
+import time
 import uuid
 from dotenv import load_dotenv
 import logging
 
-from sherlock_scan import light_scan
-from deep_scan_service import deep_scan_service
-from phone_intel import validate_and_analyze_phone
-from database import db
+from sherlock_scan import light_scan_async
+from phone_intel import validate_and_analyze_phone, phone_metadata_cache, warm_up_phone_metadata
+from phone_batch import phone_batch_engine, parse_phone_csv
+from text_scan import text_scan_engine, SEPARATORS
+from database import db, INDICATOR_TABLES
+from http_pool import http_pool
+from platforms import platform_registry
+from scan_plan import plan_scan
+from soft404 import soft_404
+from probe_cache import probe_cache
+from api_cache import api_cache
+from shared_state import shared_state
+from blocking import blocking_executor, run_blocking
+from rate_limiter import rate_limiter
+from hedging import hedger
+from batch_scan import batch_scanner, normalize_usernames
+from jobs import scan_jobs, job_events, SCAN_TYPES, TERMINAL_EVENTS
+from config import APIConfig
 
 
 # Load environment variables
@@ -67,6 +97,12 @@ class CreateInvestigationRequest(BaseModel):
     filters: Optional[dict] = None
 
 
+class BatchUsernameScanRequest(BaseModel):
+    """Batch username scan request"""
+    usernames: List[str] = Field(..., min_length=1)
+    force_refresh: bool = False
+
+
 class PhoneAnalysisRequest(BaseModel):
     """Phone analysis request"""
     phone_number: str = Field(..., min_length=7, max_length=20)
@@ -74,6 +110,29 @@ class PhoneAnalysisRequest(BaseModel):
     scan_type: Optional[str] = Field("light", pattern="^(light|deep)$")
 
 
+@app.on_event("startup")
+def start_scan_workers():
+    """Start background scan workers"""
+    scan_jobs.start()
+    if shared_state is not None:
+        shared_state.purge_expired()
+    if APIConfig.PHONE_METADATA_WARMUP:
+        # Off the startup path: the worker accepts requests while this loads
+        threading.Thread(target=warm_up_phone_metadata, name="phone-warmup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def shutdown_background_services():
+    """Stop scan workers and release pooled connections"""
+    scan_jobs.stop()
+    blocking_executor.close()
+    phone_batch_engine.close()
+    text_scan_engine.close()
+    http_pool.close()
+    probe_cache.close()
+    db.close_all()
+
+
 # ── Health Check ──
 @app.get("/api/health")
 async def health():
@@ -85,19 +144,66 @@ async def health():
     }
 
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Probe, API response, phone metadata and soft-404 baseline cache counters, plus today's API quota ledger"""
+    return {
+        "status": "success",
+        "data": {
+            "probe_cache": probe_cache.stats(),
+            "api_cache": api_cache.stats(),
+            "phone_metadata": phone_metadata_cache.stats(),
+            "soft_404": soft_404.stats(),
+            "api_usage": await run_blocking(api_cache.ledger.usage) if api_cache.ledger else []
+        }
+    }
+
+
+@app.get("/api/rate-limits")
+async def rate_limit_stats():
+    """Per-host rate limiter state: tokens, rate, waits, throttles and circuit trips; probe hedging counters"""
+    return {
+        "status": "success",
+        "data": {**rate_limiter.metrics(), "hedging": hedger.metrics()}
+    }
+
+
+@app.get("/api/platforms")
+async def list_platforms(tag: Optional[str] = None):
+    """Sites probed by username scans, optionally only those tagged with tag"""
+    platforms = platform_registry.select(tags=[tag]) if tag else platform_registry.platforms
+    return {
+        "status": "success",
+        "data": {
+            "count": len(platforms),
+            "tags": platform_registry.tags(),
+            "platforms": [platform.to_dict() for platform in platforms],
+        }
+    }
+
+
+@app.get("/api/probe-transfer")
+async def probe_transfer_stats():
+    """Per-platform probe counts, bytes downloaded and bodies cut off at PROBE_MAX_BYTES"""
+    return {
+        "status": "success",
+        "data": http_pool.transfer_stats()
+    }
+
+
 # ── Debug Endpoints (for testing) ──
 @app.get("/api/test/light-scan/{username}")
-async def test_light_scan(username: str):
+async def test_light_scan(username: str, force_refresh: bool = False):
     """
     Simple test endpoint for light scan.
     Returns raw light scan results without investigation case.
     Use this to verify light_scan is working.
     
-    Example: GET /api/test/light-scan/torvalds
+    Example: GET /api/test/light-scan/torvalds?force_refresh=true
     """
     try:
         logger.info(f"TEST: Running light scan for {username}")
-        result = light_scan(username)
+        result = await light_scan_async(username, force_refresh=force_refresh)
         
         logger.info(f"TEST: Light scan result: {result}")
         
@@ -135,10 +241,29 @@ async def username_suggestions(q: Optional[str] = None):
     }
 
 
+def _encode_list_cursor(case: Dict[str, Any]) -> str:
+    raw = json.dumps([case["created_at"], case["case_id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_list_cursor(cursor: str) -> Optional[tuple]:
+    try:
+        created_at, case_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), str(case_id)
+    except Exception:
+        return None
+
+
 @app.get("/api/investigation/list")
-async def list_investigations(page: int = 1, limit: int = 10):
+async def list_investigations(page: int = 1, limit: int = 10, status: Optional[str] = None,
+                              username: Optional[str] = None, created_after: Optional[str] = None,
+                              created_before: Optional[str] = None, cursor: Optional[str] = None):
     """
-    List investigation cases.
+    List investigation cases, newest first (summary fields only, no scan results).
+    
+    Filters: status, username (prefix match), created_after / created_before
+    (ISO timestamps). Pass the returned next_cursor as ?cursor= for keyset
+    pagination, which stays fast on deep pages; otherwise page is used.
     
     Response:
       {
@@ -147,18 +272,34 @@ async def list_investigations(page: int = 1, limit: int = 10):
         "pagination": {
           "page": 1,
           "limit": 10,
-          "total": N
+          "total": N,
+          "next_cursor": "opaque-string-or-null"
         }
       }
     """
     try:
-        case_list = db.list_cases()
-        total = len(case_list)
+        page = max(page, 1)
+        limit = min(max(limit, 1), 100)
+        filters = {
+            "status": status,
+            "username_prefix": username.strip() if username else None,
+            "created_after": created_after,
+            "created_before": created_before,
+        }
+        
+        after = None
+        if cursor:
+            after = _decode_list_cursor(cursor)
+            if not after:
+                return {
+                    "status": "error",
+                    "error": "Invalid cursor"
+                }
         
-        # Paginate
-        start = (page - 1) * limit
-        end = start + limit
-        paginated = case_list[start:end]
+        paginated = await run_blocking(
+            db.list_case_summaries, limit=limit, offset=(page - 1) * limit, after=after, **filters
+        )
+        total = await run_blocking(db.count_cases, **filters)
         
         return {
             "status": "success",
@@ -166,7 +307,8 @@ async def list_investigations(page: int = 1, limit: int = 10):
             "pagination": {
                 "page": page,
                 "limit": limit,
-                "total": total
+                "total": total,
+                "next_cursor": _encode_list_cursor(paginated[-1]) if len(paginated) == limit else None
             }
         }
     except Exception as e:
@@ -182,6 +324,11 @@ async def list_investigations(page: int = 1, limit: int = 10):
 async def create_investigation(request: CreateInvestigationRequest):
     """
     Create a new investigation case with optional filters.
+    Scans of the case only run what the filters select (see scan_plan.py):
+    platforms and exclude_platforms take names or "category:<tag>"
+    selectors, sources and exclude_sources take deep-scan source names
+    (leaks, mentions, breaches, devices), and scan_depth "light" leaves
+    out the API sources.
     
     Request:
       {
@@ -189,7 +336,9 @@ async def create_investigation(request: CreateInvestigationRequest):
         "email": "optional@email.com",
         "phone": "+1234567890",
         "filters": {
-          "platforms": ["twitter", "github"],
+          "platforms": ["github", "reddit", "category:coding"],
+          "exclude_platforms": ["category:forum"],
+          "sources": ["breaches", "leaks"],
           "exclude_age": true,
           "scan_depth": "deep"
         }
@@ -214,12 +363,22 @@ async def create_investigation(request: CreateInvestigationRequest):
                 "error": "Username must be at least 2 characters"
             }
         
+        # Reject filters a scan could not honor
+        filters = request.filters or {}
+        try:
+            plan_scan("deep", filters, username, request.email)
+        except ValueError as e:
+            return {
+                "status": "error",
+                "error": str(e)
+            }
+        
         # Create case ID
         case_id = str(uuid.uuid4())
         
         # Store case data in database
-        filters = request.filters or {}
-        case = db.create_case(
+        case = await run_blocking(
+            db.create_case,
             case_id=case_id,
             username=username,
             email=request.email,
@@ -249,77 +408,281 @@ async def create_investigation(request: CreateInvestigationRequest):
 
 
 @app.post("/api/investigation/scan/{case_id}/{scan_type}")
-async def start_scan(case_id: str, scan_type: str):
+async def start_scan(case_id: str, scan_type: str, priority: Optional[int] = None,
+                     force_refresh: bool = False, budget: Optional[float] = None):
     """
-    Run a scan on investigation case.
+    Queue a scan on investigation case.
     Scan types: 'light' or 'deep'
+    Returns 202 immediately; poll /api/investigation/status/{caseId}
+    or /api/investigation/job/{jobId} for progress.
+    If the same scan is already queued or running for the case, that
+    job is returned instead of a new one ("deduplicated": true).
+    Platform probes answered recently are served from the probe cache;
+    pass ?force_refresh=true to probe every platform again.
+    Scans stop at a time budget (LIGHT_SCAN_BUDGET / DEEP_SCAN_BUDGET, or
+    ?budget=<seconds>) and store what they found so far; such results
+    have "partial": true and list the "skipped" platforms and sources.
+    Only the platforms, sources and depth selected by the case's filters
+    are scanned; "plan" gives their counts and the requests planned.
     
-    Response:
+    Response (202):
       {
         "status": "success",
         "case_id": "uuid",
-        "data": {...scan results...},
-        "graph": null
+        "job_id": "uuid",
+        "data": {
+          "job": {...},
+          "deduplicated": false,
+          "plan": {"platforms": 12, "sources": [...], "requests": {"probes": 12, "api": 2, "total": 14}, ...}
+        }
       }
     """
     try:
-        case = db.get_case(case_id)
+        case = await run_blocking(db.get_case, case_id, ("username", "email", "filters"))
         if not case:
             return {
                 "status": "error",
                 "error": "Case not found"
             }
         
-        username = case["username"]
-        email = case.get("email")
-        
-        if scan_type not in ["light", "deep"]:
+        if scan_type not in SCAN_TYPES:
             return {
                 "status": "error",
                 "error": "Invalid scan type. Must be 'light' or 'deep'."
             }
         
-        logger.info(f"Starting {scan_type} scan for case {case_id}")
-        
-        # Run appropriate scan
-        if scan_type == "light":
-            result = light_scan(username)
-        else:  # deep
-            # Use enhanced deep scan service
-            result = deep_scan_service.deep_scan(username, email)
+        if budget is not None and not (math.isfinite(budget) and budget > 0):
+            return {
+                "status": "error",
+                "error": "Budget must be a positive number of seconds"
+            }
         
-        if not result.get("success"):
+        try:
+            plan = plan_scan(scan_type, case["filters"], case["username"], case.get("email"), strict=False)
+        except ValueError as e:
             return {
                 "status": "error",
-                "error": result.get("error", "Scan failed"),
-                "case_id": case_id
+                "error": f"Invalid case filters: {str(e)}"
             }
         
-        # Store result in database
-        scan_data = result["data"]
-        if scan_type == "light":
-            db.set_light_scan_result(case_id, scan_data)
-        else:
-            db.set_deep_scan_result(case_id, scan_data)
+        job, created = await run_blocking(scan_jobs.enqueue, case_id, scan_type, priority,
+                                          force_refresh=force_refresh, budget=budget)
         
-        logger.info(f"Scan result for {case_id}: {scan_data}")
+        logger.info(f"{scan_type} scan for case {case_id}: job {job['job_id']} ({'queued' if created else 'already in flight'})")
         
-        return {
+        return JSONResponse(status_code=202, content={
             "status": "success",
             "case_id": case_id,
-            "data": scan_data,
-            "graph": None  # Frontend expects this key
-        }
+            "job_id": job["job_id"],
+            "data": {
+                "job": job,
+                "deduplicated": not created,
+                "plan": plan.summary()
+            }
+        })
     
     except Exception as e:
         logger.error(f"Scan error: {str(e)}")
         return {
             "status": "error",
-            "error": "Scan failed. Please try again.",
+            "error": "Failed to queue scan. Please try again.",
             "case_id": case_id
         }
 
 
+@app.get("/api/investigation/job/{job_id}")
+async def get_scan_job(job_id: str):
+    """
+    Get scan job state and progress.
+    
+    Response:
+      {
+        "status": "success",
+        "data": {
+          "job_id": "uuid",
+          "case_id": "uuid",
+          "scan_type": "light|deep",
+          "state": "queued|running|done|failed",
+          "progress": {
+            "platforms_total": 24,
+            "platforms_done": 10,
+            "platforms_found": 3,
+            "platforms_skipped": 0,
+            "sources": {"leaks": "done", "devices": "pending", ...}
+          },
+          ...
+        }
+      }
+    """
+    try:
+        job = await run_blocking(db.get_job, job_id)
+        if not job:
+            return {
+                "status": "error",
+                "error": "Job not found"
+            }
+        
+        return {
+            "status": "success",
+            "data": job
+        }
+    
+    except Exception as e:
+        logger.error(f"Error getting job: {str(e)}")
+        return {
+            "status": "error",
+            "error": "Failed to retrieve job"
+        }
+
+
+def _sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """Format one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+async def _job_event_stream(job: Dict[str, Any], last_seq: int):
+    """Yield a job's events as SSE messages until its terminal event"""
+    job_id = job["job_id"]
+    subscription = job_events.subscribe(job_id)
+    try:
+        yield _sse("job", job)
+        last_sent = time.monotonic()
+        while True:
+            events = await run_blocking(db.get_job_events, job_id, after_seq=last_seq)
+            for event in events:
+                last_seq = event["seq"]
+                yield _sse(event["event"], event["payload"], event_id=last_seq)
+                if event["event"] in TERMINAL_EVENTS:
+                    return
+            if events:
+                last_sent = time.monotonic()
+                continue
+            
+            if not await run_blocking(db.get_job, job_id):
+                yield _sse("failed", {"error": "Job deleted"})
+                return
+            if time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            await subscription.wait(APIConfig.JOB_POLL_INTERVAL)
+    finally:
+        subscription.close()
+
+
+@app.get("/api/investigation/stream/{job_id}")
+async def stream_scan_job(job_id: str, request: Request):
+    """
+    Stream a scan job's results as Server-Sent Events.
+    Each platform probe and deep-scan source is pushed as soon as it
+    finishes, followed by the threat score (deep scans) and a final
+    'complete' or 'failed' event. Reconnecting clients resume from the
+    Last-Event-ID header.
+    
+    Events:
+      job           - current job snapshot (sent first)
+      plan          - {"platforms": 24} / {"sources": ["leaks", ...]}
+      platform      - {"platform": "GitHub", "found": true, "finding": {...}}
+      source        - {"source": "breaches", "ok": true, "count": 2, "items": [...]}
+      threat_score  - {"threat_score": 55, "risk_level": "medium"}
+      complete      - {"count": 5, "threat_score": 55}
+      failed        - {"error": "..."}
+    """
+    job = await run_blocking(db.get_job, job_id)
+    if not job:
+        return {
+            "status": "error",
+            "error": "Job not found"
+        }
+    
+    try:
+        last_seq = int(request.headers.get("last-event-id", 0))
+    except ValueError:
+        last_seq = 0
+    
+    return StreamingResponse(
+        _job_event_stream(job, last_seq),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+async def _batch_event_stream(usernames: List[str], rejected: List[str], force_refresh: bool):
+    """Yield a batch scan's events as SSE messages"""
+    if rejected:
+        yield _sse("rejected", {"usernames": rejected, "error": "Username must be at least 2 characters"})
+    try:
+        async for event in batch_scanner.stream(usernames, force_refresh=force_refresh):
+            yield _sse(event.pop("event"), event)
+    except Exception as e:
+        logger.error(f"Batch scan error: {str(e)}")
+        yield _sse("failed", {"error": "Batch scan failed"})
+
+
+@app.post("/api/batch/username-scan")
+async def batch_username_scan(request: BatchUsernameScanRequest):
+    """
+    Scan many usernames at once, streamed as Server-Sent Events.
+    Probes for all usernames are scheduled together and interleaved
+    across platform hosts under a process-wide concurrency cap; each
+    username's result is pushed as soon as its last probe finishes.
+    
+    Request:
+      {"usernames": ["alice", "bob", ...], "force_refresh": false}
+    
+    Events:
+      rejected  - {"usernames": [...], "error": "..."} (invalid usernames, if any)
+      plan      - {"usernames": 500, "platforms": 24, "probes": 12000}
+      result    - {"username": "alice", "data": {"findings": [...], "count": 3}}
+      summary   - {"probes": 12000, "found": 850, "skipped": 4, "elapsed": 41.2, "probes_per_sec": 291.3}
+      failed    - {"error": "..."}
+    """
+    try:
+        usernames, rejected = normalize_usernames(request.usernames)
+    except ValueError as e:
+        return {
+            "status": "error",
+            "error": str(e)
+        }
+    
+    if not usernames:
+        return {
+            "status": "error",
+            "error": "No valid usernames"
+        }
+    
+    logger.info(f"Batch username scan: {len(usernames)} usernames ({len(rejected)} rejected)")
+    return StreamingResponse(
+        _batch_event_stream(usernames, rejected, request.force_refresh),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+
+def _fetch_scan_result(case_id: str, *columns: str) -> tuple:
+    """
+    (case, most recent scan result) with the result JSON decoded; blocking.
+    The light result is only decoded when there is no deep one.
+    """
+    case = db.get_case(case_id, columns=(*columns, "deep_scan_result", "light_scan_result"))
+    if not case:
+        return None, None
+    return case, case.get("deep_scan_result") or case.get("light_scan_result")
+
+
 @app.get("/api/investigation/result/{case_id}")
 async def get_investigation_result(case_id: str):
     """
@@ -334,16 +697,13 @@ async def get_investigation_result(case_id: str):
       }
     """
     try:
-        case = db.get_case(case_id)
+        case, scan_result = await run_blocking(_fetch_scan_result, case_id)
         if not case:
             return {
                 "status": "error",
                 "error": "Case not found"
             }
         
-        # Return most recent scan result
-        scan_result = case.get("deep_scan_result") or case.get("light_scan_result")
-        
         if not scan_result:
             return {
                 "status": "error",
@@ -365,6 +725,80 @@ async def get_investigation_result(case_id: str):
         }
 
 
+@app.get("/api/investigation/related/{case_id}")
+async def get_related_investigations(case_id: str, kinds: Optional[str] = None, limit: int = 50):
+    """
+    Find other cases sharing indicators (profile URLs, emails, breaches,
+    device IPs, mention URLs, leak sources) with a case.
+    Optional kinds is a comma-separated subset, e.g. ?kinds=ip,breach
+    
+    Response:
+      {
+        "status": "success",
+        "case_id": "uuid",
+        "data": [
+          {"case_id": "uuid", "username": "...", "shared": [{"kind": "ip", "value": "203.0.113.45"}]}
+        ]
+      }
+    """
+    try:
+        if not await run_blocking(db.case_exists, case_id):
+            return {
+                "status": "error",
+                "error": "Case not found"
+            }
+        
+        selected = [kind.strip() for kind in kinds.split(",") if kind.strip()] if kinds else None
+        if selected and set(selected) - set(INDICATOR_TABLES):
+            return {
+                "status": "error",
+                "error": f"Invalid indicator kind. Must be one of: {', '.join(INDICATOR_TABLES)}"
+            }
+        
+        return {
+            "status": "success",
+            "case_id": case_id,
+            "data": await run_blocking(db.find_related_cases, case_id, selected, limit=min(max(limit, 1), 200))
+        }
+    
+    except Exception as e:
+        logger.error(f"Error finding related cases: {str(e)}")
+        return {
+            "status": "error",
+            "error": "Failed to retrieve related cases"
+        }
+
+
+@app.get("/api/indicator/{kind}/{value:path}")
+async def find_indicator(kind: str, value: str, limit: int = 100):
+    """
+    List cases whose scan results contain an indicator.
+    Kinds: url, email, breach, ip, mention, leak
+    
+    Example: GET /api/indicator/ip/203.0.113.45
+    """
+    try:
+        if kind not in INDICATOR_TABLES:
+            return {
+                "status": "error",
+                "error": f"Invalid indicator kind. Must be one of: {', '.join(INDICATOR_TABLES)}"
+            }
+        
+        return {
+            "status": "success",
+            "kind": kind,
+            "value": value,
+            "data": await run_blocking(db.find_cases_by_indicator, kind, value, limit=min(max(limit, 1), 500))
+        }
+    
+    except Exception as e:
+        logger.error(f"Error finding indicator: {str(e)}")
+        return {
+            "status": "error",
+            "error": "Failed to search indicator"
+        }
+
+
 @app.get("/api/investigation/status/{case_id}")
 async def get_investigation_status(case_id: str):
     """
@@ -380,24 +814,26 @@ async def get_investigation_status(case_id: str):
           "username": "...",
           "profile_count": 5,
           "risk_score": 10,
-          "risk_level": "low"
+          "risk_level": "low",
+          "job": {"job_id": "...", "state": "queued|running|done|failed", "progress": {...}}
         }
       }
     """
     try:
-        case = db.get_case(case_id)
+        # Status fields only; count and threat score are read inside SQLite
+        case = await run_blocking(db.get_case_status, case_id)
         if not case:
             return {
                 "status": "error",
                 "error": "Case not found"
             }
         
-        current_status = case.get("status", "created")
+        current_status = case.get("status") or "created"
         
-        # Get scan result if available
-        scan_result = case.get("deep_scan_result") or case.get("light_scan_result")
-        profile_count = scan_result.get("count", 0) if scan_result else 0
-        risk_score = scan_result.get("threat_score", 10) if scan_result else 10
+        # Get scan result summary if available
+        has_result = case["has_result"]
+        profile_count = (case["result_count"] or 0) if has_result else 0
+        risk_score = case["threat_score"] if has_result and case["threat_score"] is not None else 10
         
         # Determine risk level
         if risk_score >= 70:
@@ -419,7 +855,8 @@ async def get_investigation_status(case_id: str):
                 "username": case.get("username"),
                 "profile_count": profile_count,
                 "risk_score": risk_score,
-                "risk_level": risk_level
+                "risk_level": risk_level,
+                "job": await run_blocking(db.get_latest_job, case_id)
             }
         }
     
@@ -443,14 +880,13 @@ async def delete_investigation(case_id: str):
       }
     """
     try:
-        case = db.get_case(case_id)
-        if not case:
+        if not await run_blocking(db.case_exists, case_id):
             return {
                 "status": "error",
                 "error": "Case not found"
             }
         
-        db.delete_case(case_id)
+        await run_blocking(db.delete_case, case_id)
         
         return {
             "status": "success",
@@ -482,8 +918,13 @@ async def get_graph(case_id: str):
         }
       }
     """
+    return await run_blocking(_build_graph_response, case_id)
+
+
+def _build_graph_response(case_id: str) -> Dict[str, Any]:
+    """get_graph payload; blocking (reads and decodes the case, builds the graph)"""
     try:
-        case = db.get_case(case_id)
+        case, scan_result = _fetch_scan_result(case_id, "username")
         if not case:
             return {
                 "status": "error",
@@ -491,8 +932,6 @@ async def get_graph(case_id: str):
                 "graph": None
             }
         
-        scan_result = case.get("deep_scan_result") or case.get("light_scan_result")
-        
         if not scan_result:
             return {
                 "status": "error",
@@ -799,7 +1238,7 @@ async def phone_lookup(request: PhoneAnalysisRequest):
             }
         
         logger.info(f"Phone lookup: {phone}")
-        result = validate_and_analyze_phone(phone, country_code)
+        result = await run_blocking(validate_and_analyze_phone, phone, country_code)
         
         if "error" in result:
             return {
@@ -820,6 +1259,106 @@ async def phone_lookup(request: PhoneAnalysisRequest):
         }
 
 
+async def _ndjson_stream(rows):
+    """Serialize a blocking row generator as NDJSON, advancing it on the blocking executor"""
+    async for row in blocking_executor.iterate(rows):
+        yield json.dumps(row) + "\n"
+
+
+@app.post("/api/phone/batch-lookup")
+@app.post("/api/phone/batch")
+async def phone_batch_lookup(request: Request, stream: bool = False, country_code: Optional[str] = None):
+    """
+    Batch phone intelligence lookup.
+    Accepts a JSON body or a CSV upload (Content-Type: text/csv, raw body;
+    the phone column is detected from its header, else the first column).
+    Numbers are normalized in bulk and deduplicated by E.164 before the
+    carrier/geocoder/timezone lookups; large batches fan out across a
+    process pool.
+    
+    Request (JSON):
+      {"phone_numbers": ["+233XXXXXXXXX", ...], "country_code": "GH"}
+      or a bare array: ["+233XXXXXXXXX", ...] (country_code from the query)
+    
+    Response:
+      {
+        "status": "success",
+        "data": [{"index": 0, "input": "...", "number": "+233...", "carrier": "MTN", ...}],
+        "summary": {"total": N, "unique": U, "duplicates": D, "invalid_input": I, ...}
+      }
+    
+    With ?stream=true (or Accept: application/x-ndjson) rows are streamed
+    as NDJSON in completion order, ending with a {"summary": {...}} line.
+    """
+    try:
+        content_type = request.headers.get("content-type", "")
+        body = await request.body()
+        
+        if "csv" in content_type or content_type.startswith("text/"):
+            phones = parse_phone_csv(body.decode("utf-8-sig", errors="replace"))
+        else:
+            payload = json.loads(body or b"{}")
+            if isinstance(payload, list):
+                phones = payload  # bare array of numbers
+            elif isinstance(payload, dict):
+                # phone_numbers (apiClient.js) or phones (api.js)
+                phones = payload.get("phone_numbers") or payload.get("phones") or []
+                country_code = payload.get("country_code") or country_code
+            else:
+                return JSONResponse(status_code=400, content={
+                    "status": "error",
+                    "error": "Request body must be a JSON object or an array of phone numbers"
+                })
+        
+        if country_code is not None and not isinstance(country_code, str):
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "error": "country_code must be a string region code such as \"GH\""
+            })
+        if not isinstance(phones, list) or not phones:
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "error": "No phone numbers provided"
+            })
+        if len(phones) > APIConfig.PHONE_BATCH_MAX:
+            return JSONResponse(status_code=400, content={
+                "status": "error",
+                "error": f"Too many phone numbers (max {APIConfig.PHONE_BATCH_MAX})"
+            })
+        
+        country_code = country_code.upper() if country_code else None
+        logger.info(f"Phone batch lookup: {len(phones)} numbers")
+        rows = phone_batch_engine.lookup(phones, country_code)
+        
+        if stream or "application/x-ndjson" in request.headers.get("accept", ""):
+            return StreamingResponse(
+                _ndjson_stream(rows),
+                media_type="application/x-ndjson"
+            )
+        
+        results = await run_blocking(list, rows)
+        summary = results.pop()["summary"]
+        results.sort(key=lambda row: row["index"])
+        
+        return {
+            "status": "success",
+            "data": results,
+            "summary": summary
+        }
+    
+    except ValueError as e:
+        return {
+            "status": "error",
+            "error": f"Invalid request body: {str(e)}"
+        }
+    except Exception as e:
+        logger.error(f"Phone batch lookup error: {str(e)}")
+        return {
+            "status": "error",
+            "error": "Phone batch lookup failed"
+        }
+
+
 @app.post("/api/phone/scan")
 async def phone_scan(request: PhoneAnalysisRequest):
     """
@@ -828,6 +1367,119 @@ async def phone_scan(request: PhoneAnalysisRequest):
     return await phone_lookup(request)
 
 
+# ── Bulk Text Threat Scan Endpoints ──
+@app.post("/api/text/threat-scan")
+async def text_threat_scan(request: Request, format: str = "lines", case_id: Optional[str] = None,
+                           name: Optional[str] = None):
+    """
+    Threat-score an uploaded text dump (chat export, forum scrape) with
+    the deep scan keyword matcher. The raw request body is read as a
+    stream, so uploads of any size scan in constant memory.
+    
+    Query:
+      format:  lines (one document per line, default), paragraphs
+               (blank-line separated) or ndjson ({"id": ..., "text": ...})
+      case_id: attach the scan to a case
+      name:    label shown in the case's text scans
+    
+    Response:
+      {
+        "status": "success",
+        "scan_id": "uuid",
+        "summary": {"documents": N, "flagged": F, "threat_levels": {...}, "keywords": {...}, ...}
+      }
+    
+    Flagged documents are fetched from /api/text/threat-scan/{scan_id}/results.
+    """
+    if case_id and not await run_blocking(db.case_exists, case_id):
+        return {
+            "status": "error",
+            "error": "Case not found"
+        }
+    if format not in SEPARATORS:
+        return {
+            "status": "error",
+            "error": f"Invalid format: {format} (expected one of {', '.join(SEPARATORS)})"
+        }
+    
+    scan_id = str(uuid.uuid4())
+    await run_blocking(db.create_text_scan, scan_id, case_id, name)
+    logger.info(f"Text threat scan {scan_id} started (format={format}, case={case_id})")
+    
+    async def store(hits):
+        await run_blocking(db.add_text_scan_hits, scan_id, hits)
+    
+    try:
+        summary = await text_scan_engine.scan(request.stream(), format, on_hits=store)
+    except Exception as e:
+        logger.error(f"Text threat scan {scan_id} failed: {str(e)}")
+        await run_blocking(db.finish_text_scan, scan_id, "failed", error=str(e))
+        return {
+            "status": "error",
+            "scan_id": scan_id,
+            "error": "Text threat scan failed"
+        }
+    
+    await run_blocking(db.finish_text_scan, scan_id, "completed", summary)
+    logger.info(f"Text threat scan {scan_id}: {summary['documents']} documents, {summary['flagged']} flagged, "
+                f"{summary['mb_per_sec']} MB/s")
+    return {
+        "status": "success",
+        "scan_id": scan_id,
+        "case_id": case_id,
+        "summary": summary
+    }
+
+
+@app.get("/api/text/threat-scan/{scan_id}")
+async def get_text_threat_scan(scan_id: str):
+    """Text scan state and summary"""
+    scan = await run_blocking(db.get_text_scan, scan_id)
+    if not scan:
+        return {
+            "status": "error",
+            "error": "Text scan not found"
+        }
+    return {
+        "status": "success",
+        "data": scan
+    }
+
+
+@app.get("/api/text/threat-scan/{scan_id}/results")
+async def get_text_threat_scan_results(scan_id: str, levels: Optional[str] = None):
+    """
+    Flagged documents of a text scan as NDJSON, in input order.
+    Optional levels is a comma-separated filter, e.g. ?levels=high,medium
+    """
+    scan = await run_blocking(db.get_text_scan, scan_id)
+    if not scan:
+        return {
+            "status": "error",
+            "error": "Text scan not found"
+        }
+    wanted = [level.strip() for level in levels.split(",") if level.strip()] if levels else None
+    return StreamingResponse(
+        _ndjson_stream(db.iter_text_scan_hits(scan_id, wanted)),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.get("/api/investigation/text-scans/{case_id}")
+async def list_case_text_scans(case_id: str):
+    """Text scans attached to a case, newest first"""
+    if not await run_blocking(db.case_exists, case_id):
+        return {
+            "status": "error",
+            "error": "Case not found"
+        }
+    return {
+        "status": "success",
+        "case_id": case_id,
+        "data": await run_blocking(db.list_text_scans, case_id)
+    }
+
+
 # ── Root ──
 @app.get("/")
 async def root():
@@ -837,9 +1489,19 @@ async def root():
         "endpoints": [
             "POST /api/investigation/create",
             "POST /api/investigation/scan/{caseId}/{scanType}",
+            "GET /api/investigation/job/{jobId}",
+            "GET /api/investigation/stream/{jobId}",
             "GET /api/investigation/result/{caseId}",
+            "GET /api/investigation/related/{caseId}",
+            "GET /api/indicator/{kind}/{value}",
+            "POST /api/batch/username-scan",
             "POST /api/phone/lookup",
             "POST /api/phone/scan",
+            "POST /api/phone/batch-lookup",
+            "POST /api/text/threat-scan",
+            "GET /api/text/threat-scan/{scanId}/results",
+            "GET /api/investigation/text-scans/{caseId}",
+            "GET /api/platforms",
             "GET /api/health"
         ]
     }
@@ -871,9 +1533,21 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
     host = os.getenv("HOST", "0.0.0.0")
     
-    uvicorn.run(
-        app,
-        host=host,
-        port=port,
-        log_level="info"
-    )
+    if APIConfig.WEB_WORKERS > 1:
+        # Worker processes import the app themselves; caches and rate limits go through SHARED_STATE_DB.
+        # Equivalent: gunicorn -w $WEB_WORKERS -k uvicorn.workers.UvicornWorker app:app
+        logger.info(f"Starting {APIConfig.WEB_WORKERS} workers (shared state: {APIConfig.SHARED_STATE_DB})")
+        uvicorn.run(
+            "app:app",
+            host=host,
+            port=port,
+            workers=APIConfig.WEB_WORKERS,
+            log_level="info"
+        )
+    else:
+        uvicorn.run(
+            app,
+            host=host,
+            port=port,
+            log_level="info"
+        )
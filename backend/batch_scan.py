@@ -0,0 +1,193 @@
+"""
+batch_scan.py
+
+Batch username scanning with cross-target scheduling.
+A batch is a set of (username x platform) probes. They are not run one
+light scan at a time. The probes are queued per platform host and handed
+out round-robin across hosts. A host with a full per-host slot count is
+skipped, so the rest of the batch keeps moving and no single platform
+gets flooded. A process-wide cap (BATCH_MAX_CONCURRENCY) bounds the
+probes in flight across all running batches.
+Each username's result is emitted once all of its probes are done.
+Probes use the same path as light_scan (_probe_platform): the same
+semantics, probe cache and rate limiter.
+"""
+
+import asyncio
+import time
+import logging
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from config import APIConfig
+from http_pool import http_pool
+from platforms import Platform
+from sherlock_scan import PLATFORMS, ProbeSkipped, _probe_platform, _validate_username
+
+logger = logging.getLogger(__name__)
+
+Probe = Tuple[str, Platform]  # (username, platform)
+EmitCallback = Callable[[Dict[str, Any]], None]
+
+
+class HostInterleaver:
+    """Round-robin over per-host probe queues, skipping hosts at their in-flight cap"""
+
+    def __init__(self, probes: List[Probe], per_host: int):
+        self.per_host = per_host
+        self._queues: "OrderedDict[str, Deque[Probe]]" = OrderedDict()
+        self._inflight: Dict[str, int] = {}
+        self._changed = asyncio.Condition()
+        for username, platform in probes:
+            host = platform.host
+            self._queues.setdefault(host, deque()).append((username, platform))
+
+    def _pick(self) -> Optional[Tuple[str, Probe]]:
+        for host in list(self._queues):
+            queue = self._queues[host]
+            if self._inflight.get(host, 0) >= self.per_host:
+                continue
+            probe = queue.popleft()
+            # Rotate: this host goes to the back of the line
+            self._queues.move_to_end(host)
+            if not queue:
+                del self._queues[host]
+            self._inflight[host] = self._inflight.get(host, 0) + 1
+            return host, probe
+        return None
+
+    async def next(self) -> Optional[Tuple[str, Probe]]:
+        """Next probe on a host with spare capacity; None when the batch is drained"""
+        async with self._changed:
+            while self._queues:
+                picked = self._pick()
+                if picked:
+                    return picked
+                await self._changed.wait()
+            return None
+
+    async def done(self, host: str):
+        async with self._changed:
+            self._inflight[host] -= 1
+            self._changed.notify_all()
+
+
+class BatchScanner:
+    """Runs username batches on the shared HTTP pool loop under one global concurrency cap"""
+
+    def __init__(self, max_concurrency: int = APIConfig.BATCH_MAX_CONCURRENCY,
+                 per_host: int = APIConfig.HTTP_MAX_PER_HOST):
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        """Process-wide probe slots; only valid on the engine loop"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    async def _run(self, usernames: List[str], emit: EmitCallback, force_refresh: bool = False,
+                   platforms: Optional[List[Platform]] = None) -> Dict[str, Any]:
+        """Probe every (username, platform) pair, emitting per-username results (engine loop)"""
+        platforms = platforms if platforms is not None else PLATFORMS
+        started = time.perf_counter()
+        scheduler = HostInterleaver([(u, p) for u in usernames for p in platforms], self.per_host)
+        pending = {username: len(platforms) for username in usernames}
+        findings: Dict[str, List[dict]] = {username: [] for username in usernames}
+        counters = {"probes": 0, "found": 0, "skipped": 0}
+
+        emit({"event": "plan", "usernames": len(usernames), "platforms": len(platforms),
+              "probes": len(usernames) * len(platforms)})
+
+        def finish_username(username: str):
+            profiles = sorted(findings.pop(username), key=lambda x: x["platform"])
+            emit({"event": "result", "username": username, "data": {
+                "username": username,
+                "findings": profiles,
+                "count": len(profiles),
+            }})
+
+        async def worker():
+            while True:
+                picked = await scheduler.next()
+                if picked is None:
+                    return
+                host, (username, platform) = picked
+                try:
+                    async with self.slots:
+                        result = await _probe_platform(username, platform, force_refresh=force_refresh)
+                except ProbeSkipped:
+                    result = None
+                    counters["skipped"] += 1
+                finally:
+                    await scheduler.done(host)
+                counters["probes"] += 1
+                if result:
+                    counters["found"] += 1
+                    findings[username].append(result)
+                pending[username] -= 1
+                if pending[username] == 0:
+                    finish_username(username)
+
+        if platforms:
+            workers = min(self.max_concurrency, len(usernames) * len(platforms))
+            await asyncio.gather(*(worker() for _ in range(workers)))
+        else:
+            for username in usernames:
+                finish_username(username)
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "event": "summary",
+            "usernames": len(usernames),
+            "probes": counters["probes"],
+            "found": counters["found"],
+            "skipped": counters["skipped"],  # probes that got no answer
+            "elapsed": round(elapsed, 3),
+            "probes_per_sec": round(counters["probes"] / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        emit(summary)
+        logger.info(f"Batch scan: {summary['usernames']} usernames, {summary['probes']} probes "
+                    f"in {summary['elapsed']}s ({summary['probes_per_sec']} probes/s)")
+        return summary
+
+    async def stream(self, usernames: List[str], force_refresh: bool = False,
+                     platforms: Optional[List[Platform]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run a batch on the engine loop and yield its events on the caller's loop:
+        plan, one result per username (in completion order), then summary.
+        Closing the iterator cancels the batch.
+        """
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        def emit(event: Dict[str, Any]):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        future = http_pool.submit(self._run(usernames, emit, force_refresh, platforms))
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+            future.result()
+        finally:
+            future.cancel()
+
+
+def normalize_usernames(usernames: List[str], limit: int = APIConfig.BATCH_MAX_USERNAMES) -> Tuple[List[str], List[str]]:
+    """Strip and dedupe usernames (order kept); returns (valid, rejected)"""
+    valid, rejected = [], []
+    for username in dict.fromkeys(u.strip() for u in usernames if isinstance(u, str)):
+        (rejected if _validate_username(username) else valid).append(username)
+    if len(valid) > limit:
+        raise ValueError(f"Too many usernames (max {limit})")
+    return valid, rejected
+
+
+# Initialize scanner singleton
+batch_scanner = BatchScanner()
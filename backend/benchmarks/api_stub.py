@@ -0,0 +1,125 @@
+"""
+api_stub.py
+
+Local stand-in for the metered deep-scan APIs, for benchmarks and
+manual testing. Serves canned JSON in the shape of:
+  GET /phonebook/search?q=...               IntelligenceX
+  GET /api/v3/breachedaccount/{email}       Have I Been Pwned
+  GET /shodan/host/search?query=...         Shodan
+after a configurable delay. Upstream hits are counted per endpoint.
+
+Point the service at it with INTELLIGENCEX_API_URL / HIBP_API_URL /
+SHODAN_API_URL (plus any non-empty *_API_KEY).
+
+Run standalone:  python benchmarks/api_stub.py --port 8090
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+def _intelx(query: str) -> dict:
+    return {"result": [{"source": f"paste-{i}", "name": f"{query}@example.com"} for i in range(3)]}
+
+
+def _hibp(email: str) -> list:
+    return [
+        {"Name": "LinkedIn", "Title": "LinkedIn Data Leak", "BreachDate": "2021-06-22", "PwnCount": 500000},
+        {"Name": "Canva", "Title": "Canva", "BreachDate": "2019-05-24", "PwnCount": 137272116},
+    ]
+
+
+def _shodan(query: str) -> dict:
+    return {
+        "matches": [
+            {"ip_str": f"203.0.113.{i + 10}", "port": port, "product": "nginx", "org": "Stub Hosting"}
+            for i, port in enumerate((22, 443))
+        ],
+        "total": 2,
+    }
+
+
+class APIStubServer:
+    """Threaded JSON stub of the IntelligenceX, HIBP and Shodan endpoints"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.2):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                if parts.path == "/phonebook/search":
+                    endpoint, body = "intelligencex", _intelx(query.get("q", [""])[0])
+                elif parts.path.startswith("/api/v3/breachedaccount/"):
+                    endpoint, body = "hibp", _hibp(parts.path.rsplit("/", 1)[-1])
+                elif parts.path == "/shodan/host/search":
+                    endpoint, body = "shodan", _shodan(query.get("query", [""])[0])
+                else:
+                    endpoint, body = None, {"error": "not found"}
+
+                with stub._lock:
+                    stub.requests[endpoint or "unknown"] += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                payload = json.dumps(body).encode()
+                self.send_response(200 if endpoint else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "APIStubServer":
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the deep-scan APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = APIStubServer(args.host, args.port, args.latency).start()
+    print(f"API stub listening on {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,78 @@
+"""
+bench_api_cache.py
+
+Upstream calls and wall time for deep-scan API lookups with and without
+the response cache. Many concurrent scans query a few distinct targets
+(the repeat-target pattern); each scan calls IntelligenceX, HIBP and
+Shodan on the local API stub.
+
+Usage:  python benchmarks/bench_api_cache.py --scans 40 --targets 4 --concurrency 8
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import APIConfig  # noqa: E402
+from database import Database  # noqa: E402
+from api_cache import APIResponseCache, QuotaLedger  # noqa: E402
+import deep_scan_service  # noqa: E402
+from deep_scan_service import DeepScanService  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+from api_stub import APIStubServer  # noqa: E402
+
+
+def run(service, scans, targets, concurrency):
+    def one(i):
+        target = f"target{i % targets}"
+        service.search_intelligencex(target)
+        service.check_hibp_breaches(f"{target}@example.com")
+        service.search_shodan(target)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(scans)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scans", type=int, default=40)
+    parser.add_argument("--targets", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub API response delay (s)")
+    args = parser.parse_args()
+
+    stub = APIStubServer(latency=args.latency).start()
+    for name in ("INTELLIGENCEX", "HIBP", "SHODAN"):
+        setattr(APIConfig, f"{name}_API_KEY", "bench-key")
+        setattr(APIConfig, f"{name}_ENABLED", True)
+        setattr(APIConfig, f"{name}_API_URL", stub.base_url)
+    # Measure the cache, not the politeness limits
+    deep_scan_service.rate_limiter = RateLimiter(rate=1e9, burst=1e9)
+
+    print(f"{args.scans} scans over {args.targets} targets, concurrency={args.concurrency}, "
+          f"stub latency={args.latency * 1000:.0f}ms")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = QuotaLedger(Database(str(Path(tmp) / "bench.db")), daily_limits={})
+            for label, cache in (("uncached", None), ("cached", APIResponseCache(ledger))):
+                stub.requests.clear()
+                elapsed = run(DeepScanService(cache=cache), args.scans, args.targets, args.concurrency)
+                upstream = sum(stub.requests.values())
+                print(f"{label:<9} wall={elapsed:6.2f}s  upstream calls={upstream:4d}  "
+                      f"({upstream / (args.scans * 3):.0%} of lookups)")
+            for row in ledger.usage():
+                print(f"ledger    {row['source']:<14} key={row['key_id']} calls={row['calls']} "
+                      f"cache_hits={row['cache_hits']} coalesced={row['coalesced']}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+bench_batch_scan.py
+
+Probes/sec for scanning many usernames: one light_scan per username
+(N at a time) versus a single batch with cross-target scheduling.
+Runs against local stub hosts in a child process.
+
+Usage:  python benchmarks/bench_batch_scan.py --usernames 200 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import batch_scan  # noqa: E402
+import sherlock_scan  # noqa: E402
+from http_pool import HTTPPool  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+from stub_server import ClusterProcess, stub_platforms  # noqa: E402
+
+
+async def run_per_username(usernames, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(username):
+        async with gate:
+            await sherlock_scan.light_scan_async(username, force_refresh=True)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(username) for username in usernames))
+    return time.perf_counter() - start
+
+
+async def run_batch(usernames, max_concurrency):
+    scanner = batch_scan.BatchScanner(max_concurrency=max_concurrency)
+    start = time.perf_counter()
+    summary = None
+    async for event in scanner.stream(usernames, force_refresh=True, platforms=sherlock_scan.PLATFORMS):
+        if event["event"] == "summary":
+            summary = event
+    return time.perf_counter() - start, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--usernames", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8, help="light scans in flight (per-username mode)")
+    parser.add_argument("--batch-concurrency", type=int, default=64, help="probes in flight (batch mode)")
+    parser.add_argument("--platforms", type=int, default=len(sherlock_scan.PLATFORMS))
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub response delay (s)")
+    args = parser.parse_args()
+
+    cluster = ClusterProcess(args.hosts, latency=args.latency)
+    sherlock_scan.PLATFORMS = stub_platforms(cluster.base_urls, args.platforms)
+    sherlock_scan.http_pool = batch_scan.http_pool = pool = HTTPPool()
+    sherlock_scan.rate_limiter = RateLimiter(rate=1e9, burst=1e9)
+    usernames = [f"user{i}" for i in range(args.usernames)]
+    probes = len(usernames) * args.platforms
+
+    try:
+        print(f"{args.usernames} usernames x {args.platforms} platforms over {args.hosts} hosts, "
+              f"stub latency={args.latency * 1000:.0f}ms")
+        elapsed = asyncio.run(run_per_username(usernames, args.concurrency))
+        print(f"per-username  probes/sec={probes / elapsed:8.1f}  wall={elapsed:6.2f}s")
+        elapsed, summary = asyncio.run(run_batch(usernames, args.batch_concurrency))
+        print(f"batch         probes/sec={probes / elapsed:8.1f}  wall={elapsed:6.2f}s  "
+              f"(engine reported {summary['probes_per_sec'] if summary else 0})")
+    finally:
+        pool.close()
+        cluster.stop()
+
+
+if __name__ == "__main__":
+    main()
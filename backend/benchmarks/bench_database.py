@@ -0,0 +1,111 @@
+"""
+bench_database.py
+
+Reads/writes per second for Database under concurrent load, comparing
+the pooled WAL connections against the old connect-per-call pattern
+with the default rollback journal. Worker threads stand in for the
+FastAPI threadpool: each loops over get_case (status polling) and
+set_light_scan_result (scan workers finishing).
+
+Usage:  python benchmarks/bench_database.py --threads 8 --seconds 5
+"""
+
+import argparse
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database import Database  # noqa: E402
+
+
+class PerCallDatabase(Database):
+    """Pre-pool behaviour: new connection per call, rollback journal"""
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def release_connection(self, conn):
+        conn.close()
+
+    def init_db(self):
+        super().init_db()
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+
+SCAN_RESULT = {
+    "username": "target",
+    "findings": [{"platform": f"Site{i}", "url": f"https://site{i}.example/target", "found": True}
+                 for i in range(12)],
+    "count": 12,
+}
+
+
+def run(database, threads, seconds, write_ratio, cases):
+    case_ids = [str(uuid.uuid4()) for _ in range(cases)]
+    for case_id in case_ids:
+        database.create_case(case_id, "target", filters={})
+
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker(seed):
+        reads = writes = errors = 0
+        i = seed
+        write_every = max(1, round(1 / write_ratio)) if write_ratio else 0
+        while time.perf_counter() < stop:
+            case_id = case_ids[i % len(case_ids)]
+            if write_every and i % write_every == 0:
+                if database.set_light_scan_result(case_id, SCAN_RESULT):
+                    writes += 1
+                else:
+                    errors += 1
+            else:
+                if database.get_case(case_id):
+                    reads += 1
+                else:
+                    errors += 1
+            i += 1
+        with lock:
+            counts["reads"] += reads
+            counts["writes"] += writes
+            counts["errors"] += errors
+
+    pool = [threading.Thread(target=worker, args=(n * 7919,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return {key: value / seconds for key, value in counts.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--cases", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.seconds:.0f}s, write ratio {args.write_ratio}")
+    for label, cls in (("per-call", PerCallDatabase), ("pooled-wal", Database)):
+        with tempfile.TemporaryDirectory() as tmp:
+            database = cls(str(Path(tmp) / "bench.db"))
+            rates = run(database, args.threads, args.seconds, args.write_ratio, args.cases)
+            database.close_all()
+        print(f"{label:<11} reads/sec={rates['reads']:9.0f}  writes/sec={rates['writes']:8.0f}  "
+              f"errors/sec={rates['errors']:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+bench_health_latency.py
+
+/api/health latency with the API idle and under load. The load is deep
+scans running against the slow API stub, plus clients hammering the
+status, result, graph and phone lookup endpoints on large cases. The
+app runs under uvicorn in a child process on a scratch database.
+With blocking work off the event loop, the two latency profiles should
+match.
+
+Usage:  python benchmarks/bench_health_latency.py --cases 20 --clients 16 --duration 10
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+from database import Database  # noqa: E402
+from api_stub import APIStubServer  # noqa: E402
+
+
+def large_result(username, findings):
+    return {
+        "username": username,
+        "findings": [
+            {"platform": f"Site{i}", "url": f"https://site{i}.example/{username}", "category": "social"}
+            for i in range(findings)
+        ],
+        "emails": [f"{username}{i}@example.com" for i in range(50)],
+        "count": findings,
+        "threat_score": 40,
+    }
+
+
+def seed(db_file, cases, findings):
+    database = Database(db_file)
+    case_ids = []
+    for i in range(cases):
+        case_id = f"bench-{i}"
+        database.create_case(case_id, f"benchuser{i}", email=f"benchuser{i}@example.com")
+        database.set_deep_scan_result(case_id, large_result(f"benchuser{i}", findings))
+        case_ids.append(case_id)
+    database.close_all()
+    return case_ids
+
+
+def request(base, path, body=None, timeout=30):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(base + path, data=data, method="POST" if data else "GET",
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.read()
+
+
+def sample_health(base, duration, interval=0.02):
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        request(base, "/api/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(interval)
+    return latencies
+
+
+def load_client(base, case_ids, stop, counter):
+    rng = random.Random()
+    while not stop.is_set():
+        case_id = rng.choice(case_ids)
+        path = rng.choice((f"/api/investigation/result/{case_id}", f"/api/graph/{case_id}",
+                           f"/api/investigation/status/{case_id}", None))
+        try:
+            if path:
+                request(base, path)
+            else:
+                request(base, "/api/phone/lookup", {"phone_number": f"+23324{rng.randrange(10 ** 7):07d}"})
+            counter.append(1)
+        except Exception:
+            pass
+
+
+def summarize(label, latencies):
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]  # noqa: E731
+    print(f"{label:<6} health n={len(ordered):5d}  p50={pick(0.5):7.1f}ms  p95={pick(0.95):7.1f}ms  "
+          f"p99={pick(0.99):7.1f}ms  max={ordered[-1]:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cases", type=int, default=20)
+    parser.add_argument("--findings", type=int, default=2000, help="findings per seeded case")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub API response delay (s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = str(Path(tmp) / "bench.db")
+        case_ids = seed(db_file, args.cases, args.findings)
+        stub = APIStubServer(latency=args.latency).start()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        env = dict(os.environ, DB_FILE=db_file, WEB_WORKERS="1", PHONE_METADATA_WARMUP="false")
+        for name in ("INTELLIGENCEX", "HIBP", "SHODAN"):
+            env[f"{name}_API_KEY"] = "bench-key"
+            env[f"{name}_API_URL"] = stub.base_url
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning"],
+            cwd=BACKEND, env=env,
+        )
+        base = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(100):
+                try:
+                    request(base, "/api/health", timeout=1)
+                    break
+                except Exception:
+                    time.sleep(0.2)
+
+            print(f"{args.cases} cases x {args.findings} findings, {args.clients} load clients, "
+                  f"stub latency={args.latency * 1000:.0f}ms")
+            summarize("idle", sample_health(base, args.duration))
+
+            for case_id in case_ids:
+                request(base, f"/api/investigation/scan/{case_id}/deep?force_refresh=true", {})
+            stop, counter = threading.Event(), []
+            clients = [threading.Thread(target=load_client, args=(base, case_ids, stop, counter), daemon=True)
+                       for _ in range(args.clients)]
+            for client in clients:
+                client.start()
+            loaded = sample_health(base, args.duration)
+            stop.set()
+            for client in clients:
+                client.join(30)
+            summarize("loaded", loaded)
+            print(f"load clients completed {len(counter)} requests ({len(counter) / args.duration:.1f}/s)")
+        finally:
+            server.terminate()
+            server.wait(10)
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
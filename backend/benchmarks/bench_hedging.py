@@ -0,0 +1,111 @@
+"""
+bench_hedging.py
+
+Tail latency of light scans with and without hedged probes.
+Stub hosts answer most requests after --latency, but a --tail-ratio
+fraction of them only after an extra --tail-latency. Each mode reports
+probe and scan percentiles and the number of requests it sent, so the
+p99 improvement can be weighed against the extra load.
+
+Usage:  python benchmarks/bench_hedging.py --scans 200 --tail-latency 1.0 --tail-ratio 0.02
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sherlock_scan  # noqa: E402
+from hedging import Hedger  # noqa: E402
+from http_pool import HTTPPool  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+from stub_server import ClusterProcess, percentile, stub_platforms  # noqa: E402
+
+# The unhedged probe function, so hedging can be switched off again
+_fetch_platform = sherlock_scan._fetch_platform
+
+
+async def run_scans(scans, concurrency):
+    scan_latencies, probe_latencies = [], []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def timed_fetch(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await _fetch_platform(*args, **kwargs)
+        finally:
+            probe_latencies.append(time.perf_counter() - start)
+
+    async def one(i):
+        async with gate:
+            start = time.perf_counter()
+            await sherlock_scan.light_scan_async(f"user{i}", force_refresh=True)
+            scan_latencies.append(time.perf_counter() - start)
+
+    sherlock_scan._fetch_platform = timed_fetch
+    try:
+        await asyncio.gather(*(one(i) for i in range(scans)))
+    finally:
+        sherlock_scan._fetch_platform = _fetch_platform
+    return scan_latencies, probe_latencies
+
+
+def measure(label, hedger, args):
+    sherlock_scan.hedger = hedger
+    # Warm-up scans teach the hedger each platform's latency profile
+    asyncio.run(run_scans(args.warmup, args.concurrency))
+    before = hedger.metrics()
+    scans, probes = asyncio.run(run_scans(args.scans, args.concurrency))
+    after = hedger.metrics()
+
+    primaries = len(probes)
+    hedges = after["hedges"] - before["hedges"]
+    print(
+        f"{label:<10} probe p50={percentile(probes, 50) * 1000:7.1f}ms  "
+        f"p99={percentile(probes, 99) * 1000:7.1f}ms  "
+        f"scan p50={percentile(scans, 50) * 1000:7.1f}ms  "
+        f"p95={percentile(scans, 95) * 1000:7.1f}ms  "
+        f"p99={percentile(scans, 99) * 1000:7.1f}ms  "
+        f"requests={primaries + hedges} (+{hedges}, {hedges / primaries * 100:.1f}%)  "
+        f"hedge wins={after['hedge_wins'] - before['hedge_wins']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=40, help="scans run before measuring each mode")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--platforms", type=int, default=len(sherlock_scan.PLATFORMS))
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="normal stub response delay (s)")
+    parser.add_argument("--tail-latency", type=float, default=1.0, help="extra delay of slow responses (s)")
+    parser.add_argument("--tail-ratio", type=float, default=0.02, help="fraction of slow responses")
+    parser.add_argument("--percentile", type=float, default=95, help="hedge after this latency percentile")
+    parser.add_argument("--max-extra", type=float, default=0.1, help="hedge budget per primary request")
+    args = parser.parse_args()
+
+    cluster = ClusterProcess(args.hosts, latency=args.latency, tail_latency=args.tail_latency,
+                             tail_ratio=args.tail_ratio)
+    sherlock_scan.PLATFORMS = stub_platforms(cluster.base_urls, args.platforms)
+    sherlock_scan.http_pool = pool = HTTPPool(verify=False)
+    # Measure the hedging, not the politeness limits
+    sherlock_scan.rate_limiter = RateLimiter(rate=1e9, burst=1e9)
+
+    try:
+        print(f"{args.scans} scans x {args.platforms} platforms, concurrency={args.concurrency}, "
+              f"stub latency={args.latency * 1000:.0f}ms + {args.tail_latency * 1000:.0f}ms "
+              f"for {args.tail_ratio * 100:.1f}% of requests")
+        measure("unhedged", Hedger(enabled=False), args)
+        measure("hedged", Hedger(enabled=True, platforms=set(), percentile=args.percentile,
+                                 max_extra=args.max_extra), args)
+    finally:
+        pool.close()
+        cluster.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+bench_light_scan.py
+
+Compare the legacy thread-pool light scan (new ThreadPoolExecutor and
+un-pooled requests.get per probe) against the pooled async engine.
+Both run against local stub hosts in a child process, optionally over
+TLS (--tls) so per-probe handshake cost is visible.
+
+Usage:  python benchmarks/bench_light_scan.py --scans 60 --concurrency 8 --tls
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import requests
+import urllib3
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sherlock_scan  # noqa: E402
+from http_pool import HTTPPool  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+from stub_server import ClusterProcess, percentile, self_signed_cert, stub_platforms  # noqa: E402
+
+
+# ── Legacy implementation (pre-pool), kept verbatim for comparison ──
+def legacy_check(username, platform, timeout=6):
+    try:
+        url = platform["url"].format(username)
+        response = requests.get(url, allow_redirects=True, timeout=timeout, stream=True, verify=False)
+        if 200 <= response.status_code < 400:
+            return {"platform": platform["name"], "url": url, "found": True}
+        return None
+    except Exception:
+        return None
+
+
+def legacy_light_scan(username, platforms):
+    profiles = []
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        futures = [executor.submit(legacy_check, username, p) for p in platforms]
+        for future in as_completed(futures):
+            result = future.result()
+            if result:
+                profiles.append(result)
+    return profiles
+
+
+def run_legacy(platforms, scans, concurrency):
+    latencies = []
+
+    def one(i):
+        start = time.perf_counter()
+        legacy_light_scan("admin" if i % 2 else f"user{i}", platforms)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as outer:
+        list(outer.map(one, range(scans)))
+    return time.perf_counter() - start, latencies
+
+
+async def run_async(scans, concurrency):
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            start = time.perf_counter()
+            await sherlock_scan.light_scan_async("admin" if i % 2 else f"user{i}", force_refresh=True)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(scans)))
+    return time.perf_counter() - start, latencies
+
+
+def report(label, elapsed, latencies):
+    print(
+        f"{label:<12} scans/sec={len(latencies) / elapsed:7.2f}  "
+        f"p50={percentile(latencies, 50) * 1000:7.1f}ms  "
+        f"p95={percentile(latencies, 95) * 1000:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scans", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--platforms", type=int, default=len(sherlock_scan.PLATFORMS))
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub response delay (s)")
+    parser.add_argument("--tls", action="store_true", help="serve the stubs over HTTPS")
+    args = parser.parse_args()
+
+    certfile = self_signed_cert() if args.tls else None
+    if args.tls and not certfile:
+        sys.exit("--tls needs the openssl CLI to generate a throwaway certificate")
+    urllib3.disable_warnings()
+
+    cluster = ClusterProcess(args.hosts, latency=args.latency, certfile=certfile)
+    sherlock_scan.PLATFORMS = stub_platforms(cluster.base_urls, args.platforms)
+    # Stub certs are self-signed; everything else matches the production pool
+    sherlock_scan.http_pool = pool = HTTPPool(verify=False)
+    # Measure the engine, not the politeness limits
+    sherlock_scan.rate_limiter = RateLimiter(rate=1e9, burst=1e9)
+
+    try:
+        print(f"{args.scans} scans x {args.platforms} platforms, concurrency={args.concurrency}, "
+              f"stub latency={args.latency * 1000:.0f}ms over {args.hosts} hosts, tls={bool(certfile)}")
+        # The legacy code took the old dict entries
+        legacy_platforms = [{"name": p.name, "url": p.url.template} for p in sherlock_scan.PLATFORMS]
+        report("thread-pool", *run_legacy(legacy_platforms, args.scans, args.concurrency))
+        asyncio.run(sherlock_scan.light_scan_async("warmup"))
+        report("async-pool", *asyncio.run(run_async(args.scans, args.concurrency)))
+    finally:
+        pool.close()
+        cluster.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+bench_phone_metadata.py
+
+Numbers/sec for analyze_parsed_number on a bulk list drawn from a
+handful of countries, with and without the prefix-keyed metadata cache.
+Parsing is done up front; both runs must produce identical results.
+
+Usage:  python benchmarks/bench_phone_metadata.py --numbers 100000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import phonenumbers  # noqa: E402
+import phone_intel  # noqa: E402
+from phone_intel import PhoneMetadataCache, analyze_parsed_number  # noqa: E402
+
+REGIONS = ("GH", "NG", "KE", "ZA", "GB", "US")
+NUMBER_TYPES = (phonenumbers.PhoneNumberType.MOBILE, phonenumbers.PhoneNumberType.FIXED_LINE)
+
+
+def make_numbers(count, seed=7):
+    """Example mobile/fixed-line numbers per region with randomized subscriber digits"""
+    rng = random.Random(seed)
+    templates = []
+    for region in REGIONS:
+        for number_type in NUMBER_TYPES:
+            example = phonenumbers.example_number_for_type(region, number_type)
+            if example:
+                templates.append(example)
+    numbers = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        national = str(template.national_number)
+        national = national[:-4] + f"{rng.randrange(10000):04d}"
+        numbers.append(phonenumbers.PhoneNumber(country_code=template.country_code, national_number=int(national)))
+    return numbers
+
+
+def run(numbers):
+    start = time.perf_counter()
+    results = [analyze_parsed_number(parsed) for parsed in numbers]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--numbers", type=int, default=100000)
+    parser.add_argument("--cache-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    numbers = make_numbers(args.numbers)
+    # Load the metadata tables and prefix lengths before timing
+    warm = PhoneMetadataCache()
+    warm.lookup(numbers[0], phonenumbers.format_number(numbers[0], phonenumbers.PhoneNumberFormat.E164),
+                phonenumbers.number_type(numbers[0]), phonenumbers.region_code_for_number(numbers[0]))
+
+    print(f"{args.numbers} numbers from {', '.join(REGIONS)}")
+    phone_intel.phone_metadata_cache = PhoneMetadataCache(max_entries=0)
+    uncached_elapsed, uncached = run(numbers)
+    print(f"uncached  numbers/sec={args.numbers / uncached_elapsed:9.1f}  wall={uncached_elapsed:6.2f}s")
+
+    cache = PhoneMetadataCache(max_entries=args.cache_size)
+    cache._prefix_lengths = warm._prefix_lengths
+    phone_intel.phone_metadata_cache = cache
+    cached_elapsed, cached = run(numbers)
+    stats = cache.stats()
+    print(f"cached    numbers/sec={args.numbers / cached_elapsed:9.1f}  wall={cached_elapsed:6.2f}s  "
+          f"hit_rate={stats['hit_rate']:.1%} entries={stats['entries']}")
+    print(f"speedup   {uncached_elapsed / cached_elapsed:.2f}x  results identical: {uncached == cached}")
+
+
+if __name__ == "__main__":
+    main()
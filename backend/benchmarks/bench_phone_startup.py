@@ -0,0 +1,70 @@
+"""
+bench_phone_startup.py
+
+Import time and resident memory of a fresh worker process, with the
+phone metadata loaded lazily (default) versus eagerly at startup
+(PHONE_METADATA_WARMUP). Also reports the first-lookup latency each
+mode leaves for the first phone request. Each run is a new interpreter,
+the same as a newly booted uvicorn worker.
+
+Usage:  python benchmarks/bench_phone_startup.py --runs 3 [--module app]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+import {module}
+import phone_intel
+if {eager}:
+    phone_intel.warm_up_phone_metadata()
+startup = time.perf_counter() - started
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+rss = rss_mb()
+started = time.perf_counter()
+phone_intel.validate_and_analyze_phone("+233241234567")
+first = time.perf_counter() - started
+print(json.dumps({{"startup": startup, "rss": rss, "first": first, "rss_after": rss_mb()}}))
+"""
+
+
+def measure(module, eager):
+    code = CHILD.format(module=module, eager=eager)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(BACKEND), os.environ.get("PYTHONPATH")])))
+    output = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--module", default="phone_intel",
+                        help="module a worker imports at boot (e.g. app, if its dependencies are installed)")
+    args = parser.parse_args()
+
+    print(f"worker boot importing {args.module}, best of {args.runs} fresh processes")
+    for label, eager in (("lazy", False), ("eager", True)):
+        runs = [measure(args.module, eager) for _ in range(args.runs)]
+        best = min(runs, key=lambda run: run["startup"])
+        print(f"{label:<6} startup={best['startup'] * 1000:8.1f}ms  rss={best['rss']:7.1f}MB  "
+              f"first lookup={best['first'] * 1000:8.1f}ms  rss after lookup={best['rss_after']:7.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+bench_text_scan.py
+
+Throughput and peak memory of the bulk text threat scan. A synthetic
+chat export is generated on the fly and fed to the engine in 64 KB
+chunks, as the upload endpoint does, so input size doesn't affect the
+benchmark's own memory. Peak RSS should stay the same as --mb grows.
+
+Usage:  python benchmarks/bench_text_scan.py --mb 500 --workers 1 4
+"""
+
+import argparse
+import asyncio
+import random
+import resource
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import THREAT_KEYWORDS  # noqa: E402
+from text_scan import TextScanEngine  # noqa: E402
+
+FILLER = ("the", "new", "project", "release", "skill", "update", "team", "posted", "thread",
+          "review", "sunday", "market", "video", "photos", "likes", "build", "tonight", "group")
+
+
+async def synthetic_upload(megabytes, chunk_size=64 * 1024, threat_rate=0.02, seed=5):
+    rng = random.Random(seed)
+    keywords = [word for words in THREAT_KEYWORDS.values() for word in words]
+    lines = []
+    for _ in range(2000):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(5, 40))]
+        if rng.random() < threat_rate:
+            words[rng.randrange(len(words))] = rng.choice(keywords)
+        lines.append(" ".join(words))
+    block = ("\n".join(lines) + "\n").encode()
+
+    remaining = int(megabytes * 1e6)
+    while remaining > 0:
+        for start in range(0, len(block), chunk_size):
+            chunk = block[start:start + chunk_size][:remaining]
+            remaining -= len(chunk)
+            yield chunk
+            if remaining <= 0:
+                return
+
+
+async def run(megabytes, workers):
+    engine = TextScanEngine(workers=workers)
+    hits = 0
+
+    async def count(rows):
+        nonlocal hits
+        hits += len(rows)
+
+    try:
+        return await engine.scan(synthetic_upload(megabytes), "lines", on_hits=count), hits
+    finally:
+        engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mb", type=float, default=200, help="upload size in MB")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        summary, hits = asyncio.run(run(args.mb, workers))
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"workers={workers:<3} documents={summary['documents']:9d}  flagged={hits:7d}  "
+              f"MB/s={summary['mb_per_sec']:7.2f}  wall={summary['elapsed']:7.2f}s  peak_rss={peak:6.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
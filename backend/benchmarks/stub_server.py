@@ -0,0 +1,173 @@
+"""
+stub_server.py
+
+Local stand-in HTTP server for benchmarks and manual testing.
+Answers every GET after a configurable delay: 200 when the last path
+segment is a "known" username, 404 otherwise. Several servers can be
+bound to distinct loopback addresses to emulate separate platform hosts.
+
+Run standalone:  python benchmarks/stub_server.py --port 8081
+"""
+
+import argparse
+import math
+import multiprocessing
+import random
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, List, Optional
+
+
+class StubServer:
+    """Threaded HTTP/1.1 keep-alive stub with injectable latency"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.02,
+                 known_users: Iterable[str] = ("admin",), tail_latency: float = 0.0,
+                 tail_ratio: float = 0.0, body_size: int = 512, certfile: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.known_users = set(known_users)
+        self.tail_latency = tail_latency
+        self.tail_ratio = tail_ratio
+        self.body = b"x" * body_size
+        self.certfile = certfile
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                delay = stub.latency
+                if stub.tail_ratio and random.random() < stub.tail_ratio:
+                    delay += stub.tail_latency
+                if delay:
+                    time.sleep(delay)
+                user = self.path.split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+                status = 200 if user in stub.known_users else 404
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(stub.body)))
+                self.end_headers()
+                self.wfile.write(stub.body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def base_url(self) -> str:
+        scheme = "https" if self.certfile else "http"
+        return f"{scheme}://{self.host}:{self.port}"
+
+    def start(self) -> "StubServer":
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        if self.certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.certfile)
+            self._server.socket = context.wrap_socket(
+                self._server.socket, server_side=True, do_handshake_on_connect=False
+            )
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def start_cluster(hosts: int, **kwargs) -> List[StubServer]:
+    """Start one stub per loopback address (127.0.0.1, 127.0.0.2, ...)"""
+    return [StubServer(host=f"127.0.0.{i + 1}", **kwargs).start() for i in range(hosts)]
+
+
+def _serve_cluster(hosts: int, kwargs: dict, pipe):
+    servers = start_cluster(hosts, **kwargs)
+    pipe.send([server.base_url for server in servers])
+    pipe.recv()  # block until the parent asks us to stop
+    for server in servers:
+        server.stop()
+
+
+class ClusterProcess:
+    """Stub cluster in a child process, so it does not share the client's GIL"""
+
+    def __init__(self, hosts: int, **kwargs):
+        self._parent, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve_cluster, args=(hosts, kwargs, child), daemon=True)
+        self._process.start()
+        self.base_urls: List[str] = self._parent.recv()
+
+    def stop(self):
+        self._parent.send("stop")
+        self._process.join(5)
+
+
+def self_signed_cert() -> Optional[str]:
+    """Generate a throwaway cert+key PEM with the openssl CLI (None if unavailable)"""
+    path = Path(tempfile.mkdtemp()) / "stub.pem"
+    try:
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=127.0.0.1", "-keyout", str(path), "-out", str(path)],
+            check=True, capture_output=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return str(path)
+
+
+def stub_platforms(base_urls: List[str], count: int) -> list:
+    """Build PLATFORMS-style entries spread round-robin over the stub hosts"""
+    # Imported here so the stub server also runs standalone, without the backend on sys.path
+    from platforms import Platform
+    return [
+        Platform(f"Stub{i:02d}", f"{base_urls[i % len(base_urls)]}/p{i}/{{}}")
+        for i in range(count)
+    ]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local stub HTTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--known", nargs="*", default=["admin"])
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, args.latency, args.known).start()
+    print(f"Stub server listening on {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
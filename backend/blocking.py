@@ -0,0 +1,72 @@
+"""
+blocking.py
+
+Bounded thread pool for the blocking work async endpoints need: SQLite
+queries, scan-result JSON decoding, graph building, phone analysis.
+Endpoints await run_blocking(...) instead of calling these directly, so
+a slow query or a large case never stalls the event loop. /api/health
+and the SSE streams keep responding while the work runs.
+The pool size (API_EXECUTOR_WORKERS) caps how many blocking calls run
+at once. Extra calls wait in the pool's queue, not on the loop.
+"""
+
+import asyncio
+import functools
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, AsyncIterator, Optional
+
+from config import APIConfig
+from shared_state import after_fork
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a sync iterator driven from async code
+_DONE = object()
+
+
+class BlockingExecutor:
+    """Fixed-size thread pool that async code awaits blocking calls on"""
+
+    def __init__(self, workers: int = APIConfig.API_EXECUTOR_WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        after_fork(self, "_reset_after_fork")
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="api-blocking")
+                logger.info(f"Blocking executor started with {self.workers} thread(s)")
+            return self._executor
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) on the pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def iterate(self, iterator: Iterator[Any]) -> AsyncIterator[Any]:
+        """Drive a blocking iterator (e.g. a sync generator) from async code, one item per pool call"""
+        while True:
+            item = await self.run(next, iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Initialize executor singleton
+blocking_executor = BlockingExecutor()
+run_blocking = blocking_executor.run
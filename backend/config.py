@@ -11,20 +11,40 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _parse_host_rates(value: str) -> dict:
+    """'host=rps,host=rps' -> {host: rps}"""
+    rates = {}
+    for item in value.split(","):
+        host, _, rate = item.partition("=")
+        if host.strip() and rate.strip():
+            rates[host.strip()] = float(rate)
+    return rates
+
+
+def _parse_workers(value: str) -> int:
+    """Worker process count; 'auto' means one per CPU core"""
+    if value.strip().lower() == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
 class APIConfig:
     """API configuration with environment variable fallbacks"""
     
     # IntelligenceX (for historical leak data)
     INTELLIGENCEX_API_KEY = os.getenv("INTELLIGENCEX_API_KEY", "")
     INTELLIGENCEX_ENABLED = bool(INTELLIGENCEX_API_KEY)
+    INTELLIGENCEX_API_URL = os.getenv("INTELLIGENCEX_API_URL", "https://2.intelx.io")
     
     # Have I Been Pwned (for email breach checking)
     HIBP_API_KEY = os.getenv("HIBP_API_KEY", "")
     HIBP_ENABLED = bool(HIBP_API_KEY)
+    HIBP_API_URL = os.getenv("HIBP_API_URL", "https://haveibeenpwned.com")
     
     # Shodan (for device/service discovery)
     SHODAN_API_KEY = os.getenv("SHODAN_API_KEY", "")
     SHODAN_ENABLED = bool(SHODAN_API_KEY)
+    SHODAN_API_URL = os.getenv("SHODAN_API_URL", "https://api.shodan.io")
     
     # Optional: Google API for mentions/posts
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
@@ -34,7 +54,124 @@ class APIConfig:
     REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "10"))
     REQUEST_RETRIES = int(os.getenv("REQUEST_RETRIES", "2"))
     REQUEST_DELAY = float(os.getenv("REQUEST_DELAY", "1.0"))
-    
+    # Whole-scan time budgets in seconds (0 = wait for every probe/source)
+    LIGHT_SCAN_BUDGET = float(os.getenv("LIGHT_SCAN_BUDGET", "15"))
+    DEEP_SCAN_BUDGET = float(os.getenv("DEEP_SCAN_BUDGET", "45"))
+
+    # Deployment: web worker processes ('auto' = one per core; WEB_CONCURRENCY also honored).
+    # With more than one, caches and rate limits live in SHARED_STATE_DB so all workers share them.
+    WEB_WORKERS = _parse_workers(os.getenv("WEB_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+    SHARED_STATE_DB = os.getenv(
+        "SHARED_STATE_DB",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "shared_state.db") if WEB_WORKERS > 1 else ""
+    )
+
+    # Per-host rate limiting, backoff and circuit breaking (all outbound scan traffic)
+    RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "5"))
+    RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+    RATE_LIMIT_HOSTS = _parse_host_rates(os.getenv(
+        "RATE_LIMIT_HOSTS", "api.shodan.io=1,haveibeenpwned.com=0.16,2.intelx.io=1,api.github.com=0.5"
+    ))
+    RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "60"))
+    BACKOFF_BASE = float(os.getenv("BACKOFF_BASE", "1.0"))
+    BACKOFF_MAX = float(os.getenv("BACKOFF_MAX", "30"))
+
+    # Shared HTTP connection pool (light scan probes)
+    HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+    HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "6"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    # Most body bytes a platform probe reads before dropping the connection (0 = status/headers only)
+    PROBE_MAX_BYTES = int(os.getenv("PROBE_MAX_BYTES", str(64 * 1024)))
+    # Platform probes in flight per process (all scans together); keeps queued probes out of the
+    # connection pool, where they would count against their own timeout
+    PROBE_MAX_CONCURRENCY = int(os.getenv("PROBE_MAX_CONCURRENCY", str(HTTP_MAX_CONNECTIONS)))
+
+    # Soft-404 detection: each platform's response for a random nonexistent username is
+    # fingerprinted (first SOFT404_FINGERPRINT_BYTES of the body) and refreshed every TTL seconds;
+    # "found" probes matching it are reported as not found
+    SOFT404_ENABLED = os.getenv("SOFT404_ENABLED", "true").lower() == "true"
+    SOFT404_BASELINE_TTL = float(os.getenv("SOFT404_BASELINE_TTL", "21600"))
+    SOFT404_RETRY_INTERVAL = float(os.getenv("SOFT404_RETRY_INTERVAL", "600"))
+    SOFT404_FINGERPRINT_BYTES = int(os.getenv("SOFT404_FINGERPRINT_BYTES", str(16 * 1024)))
+    SOFT404_SIZE_TOLERANCE = float(os.getenv("SOFT404_SIZE_TOLERANCE", "0.02"))
+
+    # Sites probed by username scans (Sherlock data.json format)
+    PLATFORMS_FILE = os.getenv(
+        "PLATFORMS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "platforms.json")
+    )
+
+    # Hedged platform probes (opt-in): a duplicate request goes out when a probe is slower
+    # than HEDGE_PERCENTILE of the platform's recent latencies. Hedges are capped at
+    # HEDGE_MAX_EXTRA x primary requests. HEDGE_PLATFORMS limits hedging to some platforms.
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+    HEDGE_PLATFORMS = {name.strip() for name in os.getenv("HEDGE_PLATFORMS", "").split(",") if name.strip()}
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    HEDGE_MAX_EXTRA = float(os.getenv("HEDGE_MAX_EXTRA", "0.1"))
+    HEDGE_HISTORY = int(os.getenv("HEDGE_HISTORY", "200"))
+    HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+
+    # Batch username scanning (process-wide probe cap across all batches)
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "64"))
+    BATCH_MAX_USERNAMES = int(os.getenv("BATCH_MAX_USERNAMES", "5000"))
+
+    # Batch phone lookups
+    PHONE_BATCH_MAX = int(os.getenv("PHONE_BATCH_MAX", "50000"))
+    PHONE_BATCH_WORKERS = int(os.getenv("PHONE_BATCH_WORKERS", str(os.cpu_count() or 1)))
+    PHONE_BATCH_PROCESS_THRESHOLD = int(os.getenv("PHONE_BATCH_PROCESS_THRESHOLD", "2000"))
+    PHONE_BATCH_CHUNK_SIZE = int(os.getenv("PHONE_BATCH_CHUNK_SIZE", "500"))
+    # Prefix-keyed carrier/region/timezone cache (entries; 0 disables)
+    PHONE_META_CACHE_SIZE = int(os.getenv("PHONE_META_CACHE_SIZE", "50000"))
+    # Load phone carrier/geocoder data at startup (in the background) instead of on first lookup
+    PHONE_METADATA_WARMUP = os.getenv("PHONE_METADATA_WARMUP", "false").lower() == "true"
+
+    # Bulk text threat scanning (sizes in characters)
+    TEXT_SCAN_WORKERS = int(os.getenv("TEXT_SCAN_WORKERS", str(os.cpu_count() or 1)))
+    TEXT_SCAN_BATCH_SIZE = int(os.getenv("TEXT_SCAN_BATCH_SIZE", str(1024 * 1024)))
+    TEXT_SCAN_MAX_DOCUMENT = int(os.getenv("TEXT_SCAN_MAX_DOCUMENT", str(1024 * 1024)))
+
+    # Username probe result cache (seconds; PROBE_CACHE_DB enables the on-disk tier,
+    # which defaults to the shared state file in multi-worker mode)
+    PROBE_CACHE_TTL = float(os.getenv("PROBE_CACHE_TTL", "3600"))
+    PROBE_CACHE_NEGATIVE_TTL = float(os.getenv("PROBE_CACHE_NEGATIVE_TTL", "600"))
+    PROBE_CACHE_SIZE = int(os.getenv("PROBE_CACHE_SIZE", "50000"))
+    PROBE_CACHE_DB = os.getenv("PROBE_CACHE_DB", SHARED_STATE_DB)
+
+    # Deep-scan API response cache (TTL seconds per source; 0 disables caching)
+    API_CACHE_TTLS = {
+        "intelligencex": float(os.getenv("API_CACHE_TTL_INTELLIGENCEX", "43200")),
+        "hibp": float(os.getenv("API_CACHE_TTL_HIBP", "86400")),
+        "shodan": float(os.getenv("API_CACHE_TTL_SHODAN", "3600")),
+        "github": float(os.getenv("API_CACHE_TTL_GITHUB", "1800")),
+        "duckduckgo": float(os.getenv("API_CACHE_TTL_DUCKDUCKGO", "1800")),
+    }
+    API_CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", "5000"))
+    # Upstream calls allowed per API key per day (0 = unlimited)
+    API_DAILY_QUOTAS = {
+        "intelligencex": int(os.getenv("API_DAILY_QUOTA_INTELLIGENCEX", "0")),
+        "hibp": int(os.getenv("API_DAILY_QUOTA_HIBP", "0")),
+        "shodan": int(os.getenv("API_DAILY_QUOTA_SHODAN", "0")),
+    }
+
+    # SQLite connection tuning (DB_FILE overrides backend/investigations.db)
+    DB_FILE = os.getenv("DB_FILE", "")
+    DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")  # NORMAL is durable in WAL mode
+    DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+    DB_BUSY_TIMEOUT = float(os.getenv("DB_BUSY_TIMEOUT", "5.0"))
+    DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+
+    # Background scan job queue
+    SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "4"))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+    # Threads for blocking calls made by async endpoints (DB queries, graph building, phone analysis)
+    API_EXECUTOR_WORKERS = int(os.getenv("API_EXECUTOR_WORKERS", "16"))
+
     # Feature flags
     DEEP_SCAN_ENABLED = os.getenv("DEEP_SCAN_ENABLED", "true").lower() == "true"
     THREAT_SCORING_ENABLED = os.getenv("THREAT_SCORING_ENABLED", "true").lower() == "true"
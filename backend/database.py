@@ -3,19 +3,96 @@ database.py
 
 SQLite database service for persistent case storage.
 Manages all database operations for investigations.
+Connections are persistent and per-thread (WAL journal, tuned pragmas),
+so each call reuses an open connection and its prepared statements.
 """
 
 import sqlite3
 import json
 import logging
+import threading
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Callable, Dict, Any, Iterator, List, Sequence, Tuple
 from pathlib import Path
 
+from config import APIConfig
+from shared_state import after_fork
+
 logger = logging.getLogger(__name__)
 
 # Database file location
-DB_PATH = Path(__file__).parent / "investigations.db"
+DB_PATH = Path(APIConfig.DB_FILE) if APIConfig.DB_FILE else Path(__file__).parent / "investigations.db"
+
+# Columns of the cases table, in schema order (whitelist for column-selective fetches)
+CASE_COLUMNS = (
+    "case_id", "username", "email", "phone", "filters", "status", "scan_type",
+    "light_scan_result", "deep_scan_result", "created_at", "updated_at",
+)
+
+
+# Normalized scan result tables: indicator kind -> (table, natural key column).
+# Rows mirror the list fields of the stored scan result JSON.
+INDICATOR_TABLES = {
+    "url": ("case_findings", "url"),
+    "email": ("case_emails", "email"),
+    "breach": ("case_breaches", "name"),
+    "ip": ("case_devices", "ip"),
+    "mention": ("case_mentions", "url"),
+    "leak": ("case_leaks", "source"),
+}
+
+# Schema version stored in PRAGMA user_version (1 = normalized tables backfilled)
+SCHEMA_VERSION = 1
+
+
+class CaseRow(dict):
+    """
+    Case record whose JSON columns are decoded on first access.
+    Behaves like the plain dict get_case used to return; a scan result
+    blob that is never read is never passed through json.loads.
+    """
+    
+    # JSON column -> value used when the column is empty
+    JSON_COLUMNS = {
+        "filters": {},
+        "light_scan_result": None,
+        "deep_scan_result": None,
+    }
+    
+    def __init__(self, row):
+        super().__init__(row)
+        self._encoded = {key for key in self.JSON_COLUMNS if key in self}
+    
+    def _decode(self, key):
+        if key in self._encoded:
+            self._encoded.discard(key)
+            raw = dict.__getitem__(self, key)
+            default = self.JSON_COLUMNS[key]
+            dict.__setitem__(self, key, json.loads(raw) if raw else (default.copy() if default is not None else None))
+    
+    def __getitem__(self, key):
+        self._decode(key)
+        return dict.__getitem__(self, key)
+    
+    def __setitem__(self, key, value):
+        self._encoded.discard(key)
+        dict.__setitem__(self, key, value)
+    
+    def __iter__(self):
+        # Overriding __iter__ also stops dict(row) from copying undecoded values
+        return dict.__iter__(self)
+    
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+    
+    def values(self):
+        return [self[key] for key in self]
+    
+    def items(self):
+        return [(key, self[key]) for key in self]
+    
+    def copy(self):
+        return dict(self.items())
 
 
 class Database:
@@ -23,20 +100,77 @@ class Database:
     
     def __init__(self, db_file: str = str(DB_PATH)):
         self.db_file = db_file
+        self._local = threading.local()
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        self._connections_lock = threading.Lock()
+        self._abandoned: List[sqlite3.Connection] = []
         self.init_db()
+        after_fork(self, "_reset_after_fork")
+    
+    def _reset_after_fork(self):
+        """Forked child: leave the parent's connections alone and open new ones on demand"""
+        # Closing an inherited SQLite connection can disturb the parent's locks; keep them referenced
+        self._abandoned.extend(self._connections.values())
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        self._local = threading.local()
     
-    def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_file)
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new tuned connection"""
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=APIConfig.DB_BUSY_TIMEOUT,
+            cached_statements=APIConfig.DB_STATEMENT_CACHE,
+            check_same_thread=False,  # only used by its owner thread; closed by close_all()
+        )
         conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA synchronous = {APIConfig.DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA cache_size = -{APIConfig.DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {APIConfig.DB_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
         return conn
     
+    def get_connection(self) -> sqlite3.Connection:
+        """Get this thread's persistent database connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._prune_dead_connections()
+                self._connections[threading.get_ident()] = conn
+        return conn
+    
+    def release_connection(self, conn: sqlite3.Connection):
+        """Hand a connection back after use; discards uncommitted work from failed calls"""
+        if conn.in_transaction:
+            conn.rollback()
+    
+    def _prune_dead_connections(self):
+        alive = {thread.ident for thread in threading.enumerate()}
+        for ident in [ident for ident in self._connections if ident not in alive]:
+            self._connections.pop(ident).close()
+    
+    def close_all(self):
+        """Close every pooled connection (shutdown)"""
+        with self._connections_lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.debug(f"Error closing connection: {str(e)}")
+            self._connections.clear()
+        self._local = threading.local()
+    
     def init_db(self):
         """Initialize database schema"""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
+            # WAL lets readers run alongside the writer; the setting persists in the file
+            cursor.execute("PRAGMA journal_mode = WAL")
+            
             # Create cases table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS cases (
@@ -54,13 +188,246 @@ class Database:
                 )
             """)
             
+            # Listing indexes (newest-first pagination, status and username filters)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cases_created_at ON cases (created_at, case_id)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cases_status ON cases (status, created_at, case_id)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_cases_username ON cases (username)
+            """)
+            
+            # Create scan jobs table (background scan queue)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    case_id TEXT NOT NULL,
+                    scan_type TEXT NOT NULL,
+                    priority INTEGER DEFAULT 0,
+                    state TEXT DEFAULT 'queued',
+                    options TEXT,
+                    progress TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    created_at TEXT,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    updated_at TEXT
+                )
+            """)
+            # Columns added after the first release
+            job_columns = {row['name'] for row in cursor.execute("PRAGMA table_info(jobs)")}
+            if 'options' not in job_columns:
+                cursor.execute("ALTER TABLE jobs ADD COLUMN options TEXT")
+            
+            # At most one in-flight job per case and scan type
+            cursor.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_inflight
+                ON jobs (case_id, scan_type) WHERE state IN ('queued', 'running')
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (state, priority, created_at)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_jobs_case ON jobs (case_id, created_at)
+            """)
+            
+            # Create scan job events table (streamed to clients in seq order)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS job_events (
+                    job_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    event TEXT NOT NULL,
+                    payload TEXT,
+                    created_at TEXT,
+                    PRIMARY KEY (job_id, seq)
+                )
+            """)
+            
+            # Deep-scan API spend per source, API key fingerprint and day
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS api_usage (
+                    source TEXT NOT NULL,
+                    key_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    calls INTEGER DEFAULT 0,
+                    failures INTEGER DEFAULT 0,
+                    cache_hits INTEGER DEFAULT 0,
+                    coalesced INTEGER DEFAULT 0,
+                    PRIMARY KEY (source, key_id, day)
+                )
+            """)
+            
+            # Bulk text threat scans (analyst uploads) and their flagged documents
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS text_scans (
+                    scan_id TEXT PRIMARY KEY,
+                    case_id TEXT,
+                    name TEXT,
+                    state TEXT DEFAULT 'running',
+                    summary TEXT,
+                    error TEXT,
+                    created_at TEXT,
+                    finished_at TEXT
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_text_scans_case ON text_scans (case_id, created_at)
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS text_scan_hits (
+                    scan_id TEXT NOT NULL,
+                    doc_index INTEGER NOT NULL,
+                    threat_level TEXT,
+                    result TEXT,
+                    PRIMARY KEY (scan_id, doc_index)
+                )
+            """)
+            
+            # Normalized scan results (one row per list item, keyed for cross-case queries)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS case_findings (
+                    case_id TEXT NOT NULL,
+                    scan_type TEXT NOT NULL,
+                    platform TEXT,
+                    url TEXT,
+                    status_code INTEGER
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS case_emails (
+                    case_id TEXT NOT NULL,
+                    email TEXT NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS case_breaches (
+                    case_id TEXT NOT NULL,
+                    name TEXT,
+                    title TEXT,
+                    breach_date TEXT,
+                    pwn_count INTEGER
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS case_devices (
+                    case_id TEXT NOT NULL,
+                    ip TEXT,
+                    port INTEGER,
+                    service TEXT,
+                    org TEXT
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS case_mentions (
+                    case_id TEXT NOT NULL,
+                    source TEXT,
+                    url TEXT,
+                    text TEXT,
+                    threat_level TEXT,
+                    keywords TEXT
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS case_leaks (
+                    case_id TEXT NOT NULL,
+                    source TEXT,
+                    breach_date TEXT,
+                    count INTEGER
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_case_findings_case ON case_findings (case_id, scan_type)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_case_findings_platform ON case_findings (platform)
+            """)
+            for table, column in INDICATOR_TABLES.values():
+                if table != "case_findings":
+                    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_case ON {table} (case_id)")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column})")
+            
+            # One (case_id, kind, value) row per indicator across all child tables
+            indicator_selects = [
+                f"SELECT case_id, '{kind}' AS kind, {column} AS value FROM {table}"
+                for kind, (table, column) in INDICATOR_TABLES.items()
+            ]
+            cursor.execute(f"CREATE VIEW IF NOT EXISTS case_indicators AS {' UNION ALL '.join(indicator_selects)}")
+            
             conn.commit()
+            
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                self._backfill_scan_tables(conn)
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            
             logger.info(f"Database initialized: {self.db_file}")
         except Exception as e:
             logger.error(f"Database initialization error: {str(e)}")
             raise
         finally:
-            conn.close()
+            self.release_connection(conn)
+    
+    @staticmethod
+    def _write_scan_rows(cursor: sqlite3.Cursor, case_id: str, scan_type: str, result: Dict[str, Any]):
+        """
+        Replace a case's normalized rows for one scan with those of result.
+        Runs inside the caller's transaction; each table is one executemany.
+        Light scans only own findings; deep scans own every table.
+        """
+        def items(key):
+            return [item for item in result.get(key) or [] if isinstance(item, dict)]
+        
+        cursor.execute("DELETE FROM case_findings WHERE case_id = ? AND scan_type = ?", (case_id, scan_type))
+        cursor.executemany("""
+            INSERT INTO case_findings (case_id, scan_type, platform, url, status_code) VALUES (?, ?, ?, ?, ?)
+        """, [(case_id, scan_type, f.get("platform"), f.get("url"), f.get("status_code"))
+              for f in items("findings")])
+        if scan_type != "deep":
+            return
+        
+        for table in ("case_emails", "case_breaches", "case_devices", "case_mentions", "case_leaks"):
+            cursor.execute(f"DELETE FROM {table} WHERE case_id = ?", (case_id,))
+        
+        emails = [e if isinstance(e, str) else e.get("email") for e in result.get("emails") or []]
+        cursor.executemany("INSERT INTO case_emails (case_id, email) VALUES (?, ?)",
+                           [(case_id, email) for email in dict.fromkeys(emails) if email])
+        cursor.executemany("""
+            INSERT INTO case_breaches (case_id, name, title, breach_date, pwn_count) VALUES (?, ?, ?, ?, ?)
+        """, [(case_id, b.get("Name"), b.get("Title"), b.get("BreachDate"), b.get("PwnCount"))
+              for b in items("breaches")])
+        cursor.executemany("""
+            INSERT INTO case_devices (case_id, ip, port, service, org) VALUES (?, ?, ?, ?, ?)
+        """, [(case_id, d.get("ip_str"), d.get("port"),
+               d.get("service") or d.get("product") or (d.get("_shodan") or {}).get("module"), d.get("org"))
+              for d in items("devices")])
+        cursor.executemany("""
+            INSERT INTO case_mentions (case_id, source, url, text, threat_level, keywords) VALUES (?, ?, ?, ?, ?, ?)
+        """, [(case_id, m.get("source"), m.get("url"), m.get("text"), m.get("threat_level"),
+               json.dumps(m.get("keywords") or []))
+              for m in items("mentions")])
+        cursor.executemany("""
+            INSERT INTO case_leaks (case_id, source, breach_date, count) VALUES (?, ?, ?, ?)
+        """, [(case_id, l.get("source") or l.get("name"), l.get("breach_date") or l.get("date"), l.get("count"))
+              for l in items("leaks")])
+    
+    def _backfill_scan_tables(self, conn: sqlite3.Connection):
+        """Populate the normalized tables from results stored before they existed"""
+        cursor = conn.cursor()
+        rows = cursor.execute("""
+            SELECT case_id, light_scan_result, deep_scan_result FROM cases
+            WHERE light_scan_result IS NOT NULL OR deep_scan_result IS NOT NULL
+        """).fetchall()
+        for row in rows:
+            for scan_type in ("light", "deep"):
+                raw = row[f"{scan_type}_scan_result"]
+                if raw:
+                    self._write_scan_rows(cursor, row["case_id"], scan_type, json.loads(raw))
+        conn.commit()
+        if rows:
+            logger.info(f"Backfilled normalized scan rows for {len(rows)} case(s)")
     
     def create_case(self, case_id: str, username: str, email: Optional[str] = None, 
                    phone: Optional[str] = None, filters: Optional[Dict] = None) -> Dict[str, Any]:
@@ -85,54 +452,174 @@ class Database:
             logger.error(f"Error creating case: {str(e)}")
             raise
         finally:
-            conn.close()
+            self.release_connection(conn)
     
-    def get_case(self, case_id: str) -> Optional[Dict[str, Any]]:
-        """Get a case by ID"""
+    def get_case(self, case_id: str, columns: Optional[Sequence[str]] = None) -> Optional[CaseRow]:
+        """
+        Get a case by ID.
+        Pass columns to read only those (e.g. ("username", "email")) and
+        leave the scan result blobs on disk. JSON columns are decoded lazily.
+        """
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            cursor.execute("SELECT * FROM cases WHERE case_id = ?", (case_id,))
-            row = cursor.fetchone()
+            if columns:
+                unknown = set(columns) - set(CASE_COLUMNS)
+                if unknown:
+                    raise ValueError(f"Unknown case columns: {sorted(unknown)}")
+                selected = ", ".join(dict.fromkeys(("case_id", *columns)))
+            else:
+                selected = "*"
             
-            if row:
-                case = dict(row)
-                # Parse JSON fields
-                case['filters'] = json.loads(case['filters']) if case['filters'] else {}
-                case['light_scan_result'] = json.loads(case['light_scan_result']) if case['light_scan_result'] else None
-                case['deep_scan_result'] = json.loads(case['deep_scan_result']) if case['deep_scan_result'] else None
-                return case
-            return None
+            cursor.execute(f"SELECT {selected} FROM cases WHERE case_id = ?", (case_id,))
+            row = cursor.fetchone()
+            return CaseRow(row) if row else None
         except Exception as e:
             logger.error(f"Error getting case: {str(e)}")
             return None
         finally:
-            conn.close()
+            self.release_connection(conn)
+    
+    def case_exists(self, case_id: str) -> bool:
+        """Check a case exists (primary key lookup only)"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT 1 FROM cases WHERE case_id = ?", (case_id,))
+            return cursor.fetchone() is not None
+        except Exception as e:
+            logger.error(f"Error checking case: {str(e)}")
+            return False
+        finally:
+            self.release_connection(conn)
+    
+    def get_case_status(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a case's status fields plus the latest result's count and
+        threat_score. Both are extracted inside SQLite, so the result blobs
+        are never copied into Python or parsed by json.loads.
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT case_id, username, status, scan_type, created_at, updated_at,
+                    deep_scan_result IS NOT NULL OR light_scan_result IS NOT NULL AS has_result,
+                    CASE WHEN deep_scan_result IS NOT NULL
+                        THEN json_extract(deep_scan_result, '$.count')
+                        ELSE json_extract(light_scan_result, '$.count') END AS result_count,
+                    CASE WHEN deep_scan_result IS NOT NULL
+                        THEN json_extract(deep_scan_result, '$.threat_score')
+                        ELSE json_extract(light_scan_result, '$.threat_score') END AS threat_score
+                FROM cases WHERE case_id = ?
+            """, (case_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            case = dict(row)
+            case['has_result'] = bool(case['has_result'])
+            return case
+        except Exception as e:
+            logger.error(f"Error getting case status: {str(e)}")
+            return None
+        finally:
+            self.release_connection(conn)
     
-    def list_cases(self) -> List[Dict[str, Any]]:
-        """List all cases"""
+    def list_cases(self) -> List[CaseRow]:
+        """List all cases (prefer list_case_summaries for pages)"""
         try:
             conn = self.get_connection()
             cursor = conn.cursor()
             
             cursor.execute("SELECT * FROM cases ORDER BY created_at DESC")
-            rows = cursor.fetchall()
+            return [CaseRow(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error listing cases: {str(e)}")
+            return []
+        finally:
+            self.release_connection(conn)
+    
+    @staticmethod
+    def _case_filter_clause(status: Optional[str] = None, username_prefix: Optional[str] = None,
+                            created_after: Optional[str] = None,
+                            created_before: Optional[str] = None) -> Tuple[List[str], List[Any]]:
+        """Build WHERE conditions for case listing filters"""
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if username_prefix:
+            # Range instead of LIKE so the username index is used
+            conditions.append("username >= ? AND username < ?")
+            params.extend([username_prefix, username_prefix + "\U0010ffff"])
+        if created_after:
+            conditions.append("created_at >= ?")
+            params.append(created_after)
+        if created_before:
+            conditions.append("created_at < ?")
+            params.append(created_before)
+        return conditions, params
+    
+    def list_case_summaries(self, limit: int = 10, offset: int = 0,
+                            after: Optional[Tuple[str, str]] = None,
+                            status: Optional[str] = None, username_prefix: Optional[str] = None,
+                            created_after: Optional[str] = None,
+                            created_before: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        List one page of cases, newest first, without the scan result blobs.
+        Pass after=(created_at, case_id) of the previous page's last row for
+        keyset pagination; otherwise offset is used.
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            conditions, params = self._case_filter_clause(status, username_prefix, created_after, created_before)
+            if after:
+                conditions.append("(created_at, case_id) < (?, ?)")
+                params.extend(after)
+                offset = 0
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            
+            cursor.execute(f"""
+                SELECT case_id, username, email, phone, filters, status, scan_type, created_at, updated_at
+                FROM cases {where}
+                ORDER BY created_at DESC, case_id DESC
+                LIMIT ? OFFSET ?
+            """, (*params, limit, offset))
             
             cases = []
-            for row in rows:
+            for row in cursor.fetchall():
                 case = dict(row)
                 case['filters'] = json.loads(case['filters']) if case['filters'] else {}
-                case['light_scan_result'] = json.loads(case['light_scan_result']) if case['light_scan_result'] else None
-                case['deep_scan_result'] = json.loads(case['deep_scan_result']) if case['deep_scan_result'] else None
                 cases.append(case)
-            
             return cases
         except Exception as e:
-            logger.error(f"Error listing cases: {str(e)}")
+            logger.error(f"Error listing case summaries: {str(e)}")
             return []
         finally:
-            conn.close()
+            self.release_connection(conn)
+    
+    def count_cases(self, status: Optional[str] = None, username_prefix: Optional[str] = None,
+                    created_after: Optional[str] = None, created_before: Optional[str] = None) -> int:
+        """Count cases matching the listing filters"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            conditions, params = self._case_filter_clause(status, username_prefix, created_after, created_before)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            
+            cursor.execute(f"SELECT COUNT(*) FROM cases {where}", params)
+            return cursor.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error counting cases: {str(e)}")
+            return 0
+        finally:
+            self.release_connection(conn)
     
     def update_case_status(self, case_id: str, status: str) -> bool:
         """Update case status"""
@@ -151,7 +638,7 @@ class Database:
             logger.error(f"Error updating case status: {str(e)}")
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
     
     def set_light_scan_result(self, case_id: str, result: Dict[str, Any]) -> bool:
         """Store light scan result"""
@@ -166,15 +653,18 @@ class Database:
                 UPDATE cases SET light_scan_result = ?, status = ?, updated_at = ? 
                 WHERE case_id = ?
             """, (result_json, 'light_complete', now, case_id))
+            updated = cursor.rowcount
+            if updated:
+                self._write_scan_rows(cursor, case_id, "light", result)
             
             conn.commit()
             logger.info(f"Light scan result stored for case {case_id}")
-            return cursor.rowcount > 0
+            return updated > 0
         except Exception as e:
             logger.error(f"Error storing light scan result: {str(e)}")
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
     
     def set_deep_scan_result(self, case_id: str, result: Dict[str, Any]) -> bool:
         """Store deep scan result"""
@@ -189,15 +679,18 @@ class Database:
                 UPDATE cases SET deep_scan_result = ?, status = ?, updated_at = ? 
                 WHERE case_id = ?
             """, (result_json, 'deep_complete', now, case_id))
+            updated = cursor.rowcount
+            if updated:
+                self._write_scan_rows(cursor, case_id, "deep", result)
             
             conn.commit()
             logger.info(f"Deep scan result stored for case {case_id}")
-            return cursor.rowcount > 0
+            return updated > 0
         except Exception as e:
             logger.error(f"Error storing deep scan result: {str(e)}")
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
     
     def delete_case(self, case_id: str) -> bool:
         """Delete a case"""
@@ -206,14 +699,545 @@ class Database:
             cursor = conn.cursor()
             
             cursor.execute("DELETE FROM cases WHERE case_id = ?", (case_id,))
+            deleted = cursor.rowcount
+            cursor.execute("""
+                DELETE FROM job_events WHERE job_id IN (SELECT job_id FROM jobs WHERE case_id = ?)
+            """, (case_id,))
+            cursor.execute("DELETE FROM jobs WHERE case_id = ?", (case_id,))
+            for table in dict.fromkeys(table for table, _ in INDICATOR_TABLES.values()):
+                cursor.execute(f"DELETE FROM {table} WHERE case_id = ?", (case_id,))
+            cursor.execute("""
+                DELETE FROM text_scan_hits WHERE scan_id IN (SELECT scan_id FROM text_scans WHERE case_id = ?)
+            """, (case_id,))
+            cursor.execute("DELETE FROM text_scans WHERE case_id = ?", (case_id,))
             conn.commit()
             logger.info(f"Case deleted: {case_id}")
-            return cursor.rowcount > 0
+            return deleted > 0
         except Exception as e:
             logger.error(f"Error deleting case: {str(e)}")
             return False
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    
+    # ── Cross-case correlation ──
+    def find_cases_by_indicator(self, kind: str, value: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Cases whose scan results contain an indicator, newest first.
+        kind is one of INDICATOR_TABLES (url, email, breach, ip, mention, leak).
+        """
+        if kind not in INDICATOR_TABLES:
+            raise ValueError(f"Unknown indicator kind: {kind}")
+        table, column = INDICATOR_TABLES[kind]
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute(f"""
+                SELECT c.case_id, c.username, c.status, c.created_at, COUNT(*) AS occurrences
+                FROM {table} t JOIN cases c ON c.case_id = t.case_id
+                WHERE t.{column} = ?
+                GROUP BY c.case_id
+                ORDER BY c.created_at DESC
+                LIMIT ?
+            """, (value, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error finding cases by indicator: {str(e)}")
+            return []
+        finally:
+            self.release_connection(conn)
+    
+    def find_related_cases(self, case_id: str, kinds: Optional[Sequence[str]] = None,
+                           limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Other cases sharing at least one indicator with case_id, most shared first.
+        Each result lists the shared indicators as {"kind", "value"} pairs.
+        """
+        kinds = list(kinds or INDICATOR_TABLES)
+        unknown = set(kinds) - set(INDICATOR_TABLES)
+        if unknown:
+            raise ValueError(f"Unknown indicator kinds: {sorted(unknown)}")
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            # Per-table self joins, each driven by the natural key index
+            joins = " UNION ".join(
+                f"""SELECT other.case_id AS case_id, '{kind}' AS kind, other.{column} AS value
+                    FROM {table} mine JOIN {table} other
+                        ON other.{column} = mine.{column} AND other.case_id != mine.case_id
+                    WHERE mine.case_id = ? AND mine.{column} IS NOT NULL"""
+                for kind, (table, column) in INDICATOR_TABLES.items() if kind in kinds
+            )
+            cursor.execute(f"""
+                SELECT s.case_id, c.username, c.status, c.created_at,
+                    json_group_array(json_object('kind', s.kind, 'value', s.value)) AS shared
+                FROM ({joins}) s JOIN cases c ON c.case_id = s.case_id
+                GROUP BY s.case_id
+                ORDER BY COUNT(*) DESC, c.created_at DESC
+                LIMIT ?
+            """, (*[case_id] * len(kinds), limit))
+            
+            related = []
+            for row in cursor.fetchall():
+                case = dict(row)
+                case['shared'] = json.loads(case['shared'])
+                related.append(case)
+            return related
+        except Exception as e:
+            logger.error(f"Error finding related cases: {str(e)}")
+            return []
+        finally:
+            self.release_connection(conn)
+    
+    # ── Bulk text scans ──
+    @staticmethod
+    def _text_scan_from_row(row) -> Dict[str, Any]:
+        scan = dict(row)
+        scan['summary'] = json.loads(scan['summary']) if scan['summary'] else None
+        return scan
+    
+    def create_text_scan(self, scan_id: str, case_id: Optional[str] = None, name: Optional[str] = None) -> bool:
+        """Record a text scan as running"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO text_scans (scan_id, case_id, name, state, created_at) VALUES (?, ?, ?, 'running', ?)
+            """, (scan_id, case_id, name, datetime.now().isoformat()))
+            
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error creating text scan: {str(e)}")
+            return False
+        finally:
+            self.release_connection(conn)
+    
+    def add_text_scan_hits(self, scan_id: str, hits: List[Dict[str, Any]]) -> bool:
+        """Store a batch of flagged documents"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.executemany("""
+                INSERT OR REPLACE INTO text_scan_hits (scan_id, doc_index, threat_level, result) VALUES (?, ?, ?, ?)
+            """, [(scan_id, hit["index"], hit["threat_level"], json.dumps(hit)) for hit in hits])
+            
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error storing text scan hits: {str(e)}")
+            return False
+        finally:
+            self.release_connection(conn)
+    
+    def finish_text_scan(self, scan_id: str, state: str, summary: Optional[Dict[str, Any]] = None,
+                         error: Optional[str] = None) -> bool:
+        """Mark a text scan completed/failed with its summary"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE text_scans SET state = ?, summary = ?, error = ?, finished_at = ? WHERE scan_id = ?
+            """, (state, json.dumps(summary) if summary is not None else None, error,
+                  datetime.now().isoformat(), scan_id))
+            
+            conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error finishing text scan: {str(e)}")
+            return False
+        finally:
+            self.release_connection(conn)
+    
+    def get_text_scan(self, scan_id: str) -> Optional[Dict[str, Any]]:
+        """Get a text scan by ID"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT * FROM text_scans WHERE scan_id = ?", (scan_id,))
+            row = cursor.fetchone()
+            return self._text_scan_from_row(row) if row else None
+        except Exception as e:
+            logger.error(f"Error getting text scan: {str(e)}")
+            return None
+        finally:
+            self.release_connection(conn)
+    
+    def list_text_scans(self, case_id: str) -> List[Dict[str, Any]]:
+        """Text scans attached to a case, newest first"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT * FROM text_scans WHERE case_id = ? ORDER BY created_at DESC
+            """, (case_id,))
+            return [self._text_scan_from_row(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error listing text scans: {str(e)}")
+            return []
+        finally:
+            self.release_connection(conn)
+    
+    def iter_text_scan_hits(self, scan_id: str, levels: Optional[Sequence[str]] = None,
+                            page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Flagged documents of a scan in input order, read a page at a time"""
+        after = -1
+        while True:
+            try:
+                conn = self.get_connection()
+                cursor = conn.cursor()
+                
+                conditions, params = ["scan_id = ?", "doc_index > ?"], [scan_id, after]
+                if levels:
+                    conditions.append(f"threat_level IN ({', '.join('?' * len(levels))})")
+                    params.extend(levels)
+                cursor.execute(f"""
+                    SELECT doc_index, result FROM text_scan_hits
+                    WHERE {' AND '.join(conditions)} ORDER BY doc_index LIMIT ?
+                """, (*params, page_size))
+                rows = cursor.fetchall()
+            except Exception as e:
+                logger.error(f"Error reading text scan hits: {str(e)}")
+                return
+            finally:
+                self.release_connection(conn)
+            
+            for row in rows:
+                yield json.loads(row["result"])
+            if len(rows) < page_size:
+                return
+            after = rows[-1]["doc_index"]
+    
+    # ── API quota ledger ──
+    def record_api_usage(self, source: str, key_id: str, day: str, calls: int = 0, failures: int = 0,
+                         cache_hits: int = 0, coalesced: int = 0) -> bool:
+        """Add to a source/key's usage counters for a day"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO api_usage (source, key_id, day, calls, failures, cache_hits, coalesced)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source, key_id, day) DO UPDATE SET
+                    calls = calls + excluded.calls,
+                    failures = failures + excluded.failures,
+                    cache_hits = cache_hits + excluded.cache_hits,
+                    coalesced = coalesced + excluded.coalesced
+            """, (source, key_id, day, calls, failures, cache_hits, coalesced))
+            
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error recording API usage: {str(e)}")
+            return False
+        finally:
+            self.release_connection(conn)
+    
+    def reserve_api_call(self, source: str, key_id: str, day: str, limit: int) -> Optional[bool]:
+        """
+        Count one call for a source/key and day if fewer than limit were made.
+        One statement, so concurrent callers (threads or processes) can't
+        both take the last call. None if the database couldn't be asked.
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO api_usage (source, key_id, day, calls, failures, cache_hits, coalesced)
+                VALUES (?, ?, ?, 1, 0, 0, 0)
+                ON CONFLICT (source, key_id, day) DO UPDATE SET calls = calls + 1
+                WHERE api_usage.calls < ?
+            """, (source, key_id, day, limit))
+            
+            conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error reserving API call: {str(e)}")
+            return None
+        finally:
+            self.release_connection(conn)
+    
+    def get_api_usage(self, day: str, source: Optional[str] = None,
+                      key_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Usage counters for a day, optionally narrowed to one source/key"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            conditions, params = ["day = ?"], [day]
+            if source:
+                conditions.append("source = ?")
+                params.append(source)
+            if key_id:
+                conditions.append("key_id = ?")
+                params.append(key_id)
+            
+            cursor.execute(f"""
+                SELECT source, key_id, day, calls, failures, cache_hits, coalesced FROM api_usage
+                WHERE {' AND '.join(conditions)} ORDER BY source, key_id
+            """, params)
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Error getting API usage: {str(e)}")
+            return []
+        finally:
+            self.release_connection(conn)
+    
+    # ── Scan Jobs ──
+    @staticmethod
+    def _job_from_row(row) -> Dict[str, Any]:
+        job = dict(row)
+        job['progress'] = json.loads(job['progress']) if job['progress'] else {}
+        job['options'] = json.loads(job['options']) if job.get('options') else {}
+        return job
+    
+    def enqueue_job(self, job_id: str, case_id: str, scan_type: str, priority: int = 0,
+                    options: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue a scan job.
+        Returns (job, created); if the case already has an in-flight job of
+        the same scan type, that job is returned with created=False.
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            now = datetime.now().isoformat()
+            try:
+                cursor.execute("""
+                    INSERT INTO jobs (job_id, case_id, scan_type, priority, state, options, progress, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, 'queued', ?, '{}', ?, ?)
+                """, (job_id, case_id, scan_type, priority, json.dumps(options or {}), now, now))
+                conn.commit()
+                created = True
+            except sqlite3.IntegrityError:
+                conn.rollback()
+                created = False
+            
+            cursor.execute("""
+                SELECT * FROM jobs WHERE case_id = ? AND scan_type = ? AND state IN ('queued', 'running')
+            """, (case_id, scan_type))
+            row = cursor.fetchone()
+            if created:
+                logger.info(f"Job queued: {job_id} ({scan_type}) for case {case_id}")
+            return (self._job_from_row(row) if row else None), created
+        except Exception as e:
+            logger.error(f"Error queueing job: {str(e)}")
+            raise
+        finally:
+            self.release_connection(conn)
+    
+    def claim_next_job(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically move the highest-priority queued job to running"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            # IMMEDIATE takes the write lock up front so two workers can't claim the same job
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("""
+                SELECT job_id FROM jobs WHERE state = 'queued'
+                ORDER BY priority DESC, created_at LIMIT 1
+            """)
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                return None
+            
+            now = datetime.now().isoformat()
+            cursor.execute("""
+                UPDATE jobs SET state = 'running', worker = ?, started_at = ?, updated_at = ?
+                WHERE job_id = ? AND state = 'queued'
+            """, (worker, now, now, row['job_id']))
+            conn.commit()
+            
+            cursor.execute("SELECT * FROM jobs WHERE job_id = ?", (row['job_id'],))
+            return self._job_from_row(cursor.fetchone())
+        except Exception as e:
+            logger.error(f"Error claiming job: {str(e)}")
+            return None
+        finally:
+            self.release_connection(conn)
+    
+    def update_job_progress(self, job_id: str, progress: Dict[str, Any]) -> bool:
+        """Store job progress snapshot"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            now = datetime.now().isoformat()
+            cursor.execute("""
+                UPDATE jobs SET progress = ?, updated_at = ? WHERE job_id = ?
+            """, (json.dumps(progress), now, job_id))
+            
+            conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error updating job progress: {str(e)}")
+            return False
+        finally:
+            self.release_connection(conn)
+    
+    def finish_job(self, job_id: str, state: str, progress: Optional[Dict[str, Any]] = None,
+                   error: Optional[str] = None) -> bool:
+        """Mark job as done or failed"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            now = datetime.now().isoformat()
+            cursor.execute("""
+                UPDATE jobs SET state = ?, progress = COALESCE(?, progress), error = ?,
+                    finished_at = ?, updated_at = ?
+                WHERE job_id = ?
+            """, (state, json.dumps(progress) if progress is not None else None, error, now, now, job_id))
+            
+            conn.commit()
+            logger.info(f"Job {job_id} finished: {state}")
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"Error finishing job: {str(e)}")
+            return False
+        finally:
+            self.release_connection(conn)
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by ID"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+            return self._job_from_row(row) if row else None
+        except Exception as e:
+            logger.error(f"Error getting job: {str(e)}")
+            return None
+        finally:
+            self.release_connection(conn)
+    
+    def get_latest_job(self, case_id: str) -> Optional[Dict[str, Any]]:
+        """Get the most recently queued job for a case"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT * FROM jobs WHERE case_id = ? ORDER BY created_at DESC LIMIT 1
+            """, (case_id,))
+            row = cursor.fetchone()
+            return self._job_from_row(row) if row else None
+        except Exception as e:
+            logger.error(f"Error getting latest job: {str(e)}")
+            return None
+        finally:
+            self.release_connection(conn)
+    
+    def append_job_event(self, job_id: str, seq: int, event: str, payload: Dict[str, Any],
+                         progress: Optional[Dict[str, Any]] = None) -> bool:
+        """Append a scan event (and optionally the progress snapshot) in one transaction"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            now = datetime.now().isoformat()
+            cursor.execute("""
+                INSERT INTO job_events (job_id, seq, event, payload, created_at) VALUES (?, ?, ?, ?, ?)
+            """, (job_id, seq, event, json.dumps(payload), now))
+            if progress is not None:
+                cursor.execute("""
+                    UPDATE jobs SET progress = ?, updated_at = ? WHERE job_id = ?
+                """, (json.dumps(progress), now, job_id))
+            
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error appending job event: {str(e)}")
+            return False
+        finally:
+            self.release_connection(conn)
+    
+    def get_job_events(self, job_id: str, after_seq: int = 0, limit: int = 500) -> List[Dict[str, Any]]:
+        """Get scan events with seq > after_seq, oldest first"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT seq, event, payload, created_at FROM job_events
+                WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?
+            """, (job_id, after_seq, limit))
+            
+            events = []
+            for row in cursor.fetchall():
+                event = dict(row)
+                event['payload'] = json.loads(event['payload']) if event['payload'] else {}
+                events.append(event)
+            return events
+        except Exception as e:
+            logger.error(f"Error getting job events: {str(e)}")
+            return []
+        finally:
+            self.release_connection(conn)
+    
+    def last_job_event_seq(self, job_id: str) -> int:
+        """Highest event seq recorded for a job (0 if none)"""
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT MAX(seq) FROM job_events WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+            return row[0] or 0
+        except Exception as e:
+            logger.error(f"Error getting job event seq: {str(e)}")
+            return 0
+        finally:
+            self.release_connection(conn)
+    
+    def requeue_interrupted_jobs(self, alive: Optional[Callable[[Optional[str]], bool]] = None) -> int:
+        """
+        Put jobs left 'running' by a previous process back in the queue.
+        With several web workers sharing the database, alive(worker) keeps
+        jobs whose owning process is still running.
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            
+            now = datetime.now().isoformat()
+            if alive is None:
+                cursor.execute("""
+                    UPDATE jobs SET state = 'queued', worker = NULL, started_at = NULL, updated_at = ?
+                    WHERE state = 'running'
+                """, (now,))
+            else:
+                cursor.execute("BEGIN IMMEDIATE")
+                running = cursor.execute("SELECT job_id, worker FROM jobs WHERE state = 'running'").fetchall()
+                orphaned = [(now, row["job_id"]) for row in running if not alive(row["worker"])]
+                cursor.executemany("""
+                    UPDATE jobs SET state = 'queued', worker = NULL, started_at = NULL, updated_at = ?
+                    WHERE job_id = ? AND state = 'running'
+                """, orphaned)
+            
+            conn.commit()
+            if cursor.rowcount:
+                logger.info(f"Requeued {cursor.rowcount} interrupted job(s)")
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Error requeueing jobs: {str(e)}")
+            return 0
+        finally:
+            self.release_connection(conn)
 
 
 # Initialize database singleton
@@ -0,0 +1,59 @@
+"""
+deadline.py
+
+Scan-wide time budgets.
+A scan creates one Deadline and passes it to every probe and API call
+it makes. Each network wait (rate limiter queue, request timeout, retry
+backoff, coalesced cache wait) is capped at the time the scan has left.
+The scan stops waiting at the deadline, cancels whatever is still
+running, and returns a partial result listing what was skipped.
+"""
+
+import time
+from typing import Optional
+
+# Below this much budget, a new request or attempt isn't started
+MIN_ATTEMPT_TIME = 0.1
+
+
+class DeadlineExceeded(TimeoutError):
+    """The scan's budget ran out before this call could complete"""
+
+
+class Deadline:
+    """Absolute monotonic deadline; a None budget never expires"""
+
+    def __init__(self, budget: Optional[float] = None):
+        self.budget = budget if budget and budget > 0 else None
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.budget if self.budget is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None without a budget"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def exhausted(self) -> bool:
+        """True once there is no time left to start another attempt"""
+        remaining = self.remaining()
+        return remaining is not None and remaining < MIN_ATTEMPT_TIME
+
+    def timeout(self, cap: float, what: str = "request") -> float:
+        """cap, shortened to the time left; raises DeadlineExceeded when too little is left"""
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        if remaining < MIN_ATTEMPT_TIME:
+            raise DeadlineExceeded(f"Scan deadline reached before {what}")
+        return min(cap, remaining)
+
+    def report(self) -> dict:
+        """Budget summary stored with scan results"""
+        return {
+            "budget": self.budget,
+            "elapsed": round(self.elapsed(), 3),
+        }
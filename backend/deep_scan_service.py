@@ -4,6 +4,9 @@ deep_scan_service.py
 Enhanced deep scan combining multiple OSINT APIs.
 Integrates IntelligenceX, HIBP, Shodan, and mention detection.
 Graceful fallbacks if APIs are unavailable - generates realistic sample data for demos/testing.
+API responses go through a shared response cache with quota accounting (see api_cache.py).
+The whole scan shares one time budget (see deadline.py). Sources still
+running when it expires are skipped, and the result is marked partial.
 """
 
 import requests
@@ -11,11 +14,16 @@ import time
 import logging
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 import random
 
-from config import APIConfig, THREAT_KEYWORDS, RISK_WEIGHTS
-from sherlock_scan import light_scan
+from config import APIConfig, RISK_WEIGHTS
+from deadline import Deadline, DeadlineExceeded
+from scan_plan import ScanPlan
+from sherlock_scan import light_scan, notify_progress, ProgressCallback
+from api_cache import api_cache, APIResponseCache
+from rate_limiter import rate_limiter, parse_retry_after, RateLimitError, THROTTLE_STATUSES
+from threat_matcher import threat_matcher
 
 logger = logging.getLogger(__name__)
 
@@ -44,37 +52,89 @@ SAMPLE_MENTIONS = [
 ]
 
 
+def risk_level_for_score(score: int) -> str:
+    """Map a 0-100 threat score to low/medium/high"""
+    return "high" if score >= 70 else "medium" if score >= 40 else "low"
+
+
 class DeepScanService:
     """Service for enhanced deep OSINT scanning"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[APIResponseCache] = api_cache):
         self.timeout = APIConfig.REQUEST_TIMEOUT
         self.retries = APIConfig.REQUEST_RETRIES
         self.delay = APIConfig.REQUEST_DELAY
+        self.cache = cache
+    
+    def _make_request(self, url: str, headers: Dict = None, params: Dict = None,
+                      source: Optional[str] = None, api_key: Optional[str] = None,
+                      force_refresh: bool = False, deadline: Optional[Deadline] = None) -> Optional[dict]:
+        """
+        Make HTTP request with retry logic.
+        With a source name the response is served from / stored in the
+        response cache, and upstream calls are charged to api_key's quota.
+        Raises DeadlineExceeded when the scan's deadline cuts the request short.
+        """
+        deadline = deadline or Deadline()
+        if source and self.cache is not None:
+            try:
+                return self.cache.fetch(
+                    source, url, params,
+                    lambda: self._request_upstream(url, headers, params, deadline),
+                    api_key=api_key, force_refresh=force_refresh, wait_timeout=deadline.remaining(),
+                )
+            except FuturesTimeout:
+                # Waited on another scan's identical request past our deadline
+                raise DeadlineExceeded(f"Scan deadline reached waiting for {url}")
+        return self._request_upstream(url, headers, params, deadline)
     
-    def _make_request(self, url: str, headers: Dict = None, params: Dict = None) -> Optional[dict]:
-        """Make HTTP request with retry logic"""
+    def _request_upstream(self, url: str, headers: Dict = None, params: Dict = None,
+                          deadline: Optional[Deadline] = None) -> Optional[dict]:
+        """
+        Make HTTP request with retry logic (no cache).
+        Admission, Retry-After and backoff go through the shared per-host
+        rate limiter, so concurrent scans back off together. Every wait is
+        capped at the deadline's remaining budget.
+        """
+        deadline = deadline or Deadline()
         for attempt in range(self.retries):
+            try:
+                rate_limiter.acquire(url, max_wait=deadline.timeout(rate_limiter.max_wait, f"requesting {url}"))
+            except RateLimitError as e:
+                logger.info(f"Request skipped: {str(e)}")
+                return None
+            
             try:
                 response = requests.get(
                     url,
                     headers=headers or {},
                     params=params or {},
-                    timeout=self.timeout
+                    timeout=deadline.timeout(self.timeout, f"requesting {url}")
                 )
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 429:  # Rate limited
-                    time.sleep(self.delay * (attempt + 1))
-                    continue
             except Exception as e:
+                rate_limiter.record(url, None)
+                if deadline.exhausted():
+                    raise DeadlineExceeded(f"Scan deadline reached while requesting {url}")
                 logger.debug(f"Request failed (attempt {attempt + 1}): {str(e)}")
                 if attempt < self.retries - 1:
-                    time.sleep(self.delay)
+                    time.sleep(deadline.timeout(rate_limiter.backoff(attempt), f"retrying {url}"))
+                continue
+            
+            rate_limiter.record(url, response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+            if response.status_code == 200:
+                try:
+                    return response.json()
+                except ValueError as e:
+                    logger.debug(f"Invalid JSON from {url}: {str(e)}")
+                    return None
+            if response.status_code not in THROTTLE_STATUSES and response.status_code < 500:
+                return None  # Definite answer (e.g. 404); retrying won't change it
+            # Throttled or server error: the limiter holds the host until it may be retried
         return None
     
     # ── IntelligenceX Integration ──
-    def search_intelligencex(self, query: str) -> Dict:
+    def search_intelligencex(self, query: str, force_refresh: bool = False,
+                             deadline: Optional[Deadline] = None) -> Dict:
         """Search IntelligenceX for historical leaks"""
         try:
             if not APIConfig.INTELLIGENCEX_ENABLED:
@@ -86,14 +146,16 @@ class DeepScanService:
                     "count": random.randint(2, 5)
                 }
             
-            url = "https://2.intelx.io/phonebook/search"
+            url = f"{APIConfig.INTELLIGENCEX_API_URL}/phonebook/search"
             headers = {
                 "User-Agent": "OSINT-Framework/1.0",
                 "x-key": APIConfig.INTELLIGENCEX_API_KEY
             }
             params = {"q": query, "limit": 100}
             
-            result = self._make_request(url, headers, params)
+            result = self._make_request(url, headers, params, source="intelligencex",
+                                        api_key=APIConfig.INTELLIGENCEX_API_KEY, force_refresh=force_refresh,
+                                        deadline=deadline)
             if result and "result" in result:
                 leaks = result.get("result", [])
                 logger.info(f"IntelligenceX: Found {len(leaks)} results for {query}")
@@ -102,6 +164,8 @@ class DeepScanService:
                     "source": "intelligencex",
                     "count": len(leaks)
                 }
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.warning(f"IntelligenceX error: {str(e)}")
         
@@ -109,7 +173,8 @@ class DeepScanService:
     
     
     # ── HIBP Integration ──
-    def check_hibp_breaches(self, email: str) -> Dict:
+    def check_hibp_breaches(self, email: str, force_refresh: bool = False,
+                            deadline: Optional[Deadline] = None) -> Dict:
         """Check Have I Been Pwned for email breaches"""
         try:
             if not APIConfig.HIBP_ENABLED:
@@ -122,13 +187,14 @@ class DeepScanService:
                     "breach_names": [b.get("Name") for b in random.sample(SAMPLE_BREACHES, 2)]
                 }
             
-            url = f"https://haveibeenpwned.com/api/v3/breachedaccount/{email}"
+            url = f"{APIConfig.HIBP_API_URL}/api/v3/breachedaccount/{email}"
             headers = {
                 "User-Agent": "OSINT-Framework/1.0",
                 "x-apikey": APIConfig.HIBP_API_KEY
             }
             
-            result = self._make_request(url, headers)
+            result = self._make_request(url, headers, source="hibp",
+                                        api_key=APIConfig.HIBP_API_KEY, force_refresh=force_refresh, deadline=deadline)
             if result:
                 breaches = result if isinstance(result, list) else [result]
                 logger.info(f"HIBP: Email {email} found in {len(breaches)} breaches")
@@ -138,13 +204,16 @@ class DeepScanService:
                     "count": len(breaches),
                     "breach_names": [b.get("Name") for b in breaches if isinstance(b, dict)]
                 }
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.warning(f"HIBP error: {str(e)}")
         
         return {"breaches": [], "source": "hibp", "count": 0}
     
     # ── Shodan Integration ──
-    def search_shodan(self, query: str) -> Dict:
+    def search_shodan(self, query: str, force_refresh: bool = False,
+                      deadline: Optional[Deadline] = None) -> Dict:
         """Search Shodan for devices/services"""
         try:
             if not APIConfig.SHODAN_ENABLED:
@@ -157,14 +226,15 @@ class DeepScanService:
                     "ips": [d.get("ip_str") for d in random.sample(SAMPLE_DEVICES, 2)]
                 }
             
-            url = "https://api.shodan.io/shodan/host/search"
+            url = f"{APIConfig.SHODAN_API_URL}/shodan/host/search"
             params = {
                 "query": query,
                 "key": APIConfig.SHODAN_API_KEY,
                 "limit": 50
             }
             
-            result = self._make_request(url, params=params)
+            result = self._make_request(url, params=params, source="shodan",
+                                        api_key=APIConfig.SHODAN_API_KEY, force_refresh=force_refresh, deadline=deadline)
             if result and "matches" in result:
                 devices = result.get("matches", [])
                 logger.info(f"Shodan: Found {len(devices)} matches for {query}")
@@ -174,6 +244,8 @@ class DeepScanService:
                     "count": len(devices),
                     "ips": [d.get("ip_str") for d in devices if isinstance(d, dict)]
                 }
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.warning(f"Shodan error: {str(e)}")
         
@@ -181,24 +253,8 @@ class DeepScanService:
     
     # ── Threat Keyword Detection ──
     def detect_threat_keywords(self, text: str) -> Tuple[List[str], str]:
-        """Detect threat keywords in text"""
-        if not text:
-            return [], "none"
-        
-        text_lower = text.lower()
-        found_keywords = []
-        threat_level = "none"
-        
-        for category, keywords in THREAT_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    found_keywords.append(keyword)
-                    if category == "violent":
-                        threat_level = "high"
-                    elif category == "illegal" and threat_level != "high":
-                        threat_level = "medium"
-        
-        return found_keywords, threat_level
+        """Detect threat keywords in text (single pass, word-start matches; see threat_matcher)"""
+        return threat_matcher.detect(text)
     
     def _extract_emails(self, username: str, findings: List[Dict]) -> List[str]:
         """Extract potential emails from findings and mentions"""
@@ -222,7 +278,8 @@ class DeepScanService:
         return list(set(emails))  # Remove duplicates
     
     # ── Mention/Post Detection ──
-    def search_mentions(self, username: str) -> Dict:
+    def search_mentions(self, username: str, force_refresh: bool = False,
+                        deadline: Optional[Deadline] = None) -> Dict:
         """Search for public mentions/posts (free APIs only)"""
         mentions = []
         threat_mentions = []  # Only mentions with threat keywords
@@ -232,7 +289,7 @@ class DeepScanService:
             # 1. Search GitHub for repositories/profiles containing username
             try:
                 url = f"https://api.github.com/search/repositories?q={username}&sort=stars&per_page=5"
-                result = self._make_request(url)
+                result = self._make_request(url, source="github", force_refresh=force_refresh, deadline=deadline)
                 if result and "items" in result:
                     for item in result.get("items", [])[:3]:
                         text = item.get("description", "")[:100]
@@ -247,6 +304,8 @@ class DeepScanService:
                         mentions.append(mention)
                         # Track all mentions for display
                         threat_mentions.append(mention)
+            except DeadlineExceeded:
+                raise
             except:
                 pass
             
@@ -258,7 +317,8 @@ class DeepScanService:
                     "format": "json",
                     "max_results": 5
                 }
-                result = self._make_request(url, params=params)
+                result = self._make_request(url, params=params, source="duckduckgo", force_refresh=force_refresh,
+                                            deadline=deadline)
                 if result and "Results" in result:
                     for item in result.get("Results", [])[:2]:
                         text = item.get("Text", "")[:100]
@@ -273,6 +333,8 @@ class DeepScanService:
                         mentions.append(mention)
                         # Track all mentions for display
                         threat_mentions.append(mention)
+            except DeadlineExceeded:
+                raise
             except:
                 pass
             
@@ -283,6 +345,8 @@ class DeepScanService:
                 threat_mentions = mentions  # Return all sample mentions
             
             logger.info(f"Mentions: Found {len(mentions)} total, {len(threat_mentions)} with threat keywords for {username}")
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.debug(f"Mention search error: {str(e)}")
         
@@ -332,25 +396,56 @@ class DeepScanService:
     
     
     # ── Main Deep Scan Function ──
-    def deep_scan(self, username: str, email: Optional[str] = None) -> Dict:
+    def deep_scan(self, username: str, email: Optional[str] = None,
+                  progress: Optional[ProgressCallback] = None, force_refresh: bool = False,
+                  deadline: Optional[Deadline] = None, plan: Optional[ScanPlan] = None) -> Dict:
         """
         Perform comprehensive deep scan.
         Combines light scan (profiles) with deep API investigations.
         Returns structured data with graceful fallbacks.
+        Optional progress callback receives platform and per-source events.
+        Probe results and API responses are reused from cache unless force_refresh.
+        The API sources run alongside the light scan under one deadline
+        (default DEEP_SCAN_BUDGET). Whatever is unfinished when it expires
+        is listed in "skipped" and the result is marked "partial".
+        A plan (see scan_plan.py) limits the probed platforms and the
+        sources called; without one, every platform and source runs.
         """
         logger.info(f"Starting deep scan for {username}")
+        deadline = deadline or Deadline(APIConfig.DEEP_SCAN_BUDGET)
+        executor = ThreadPoolExecutor(max_workers=4)
         
         try:
-            # STEP 1: Run LIGHT SCAN first to get social media profiles
+            # With a plan, the caller has already sent it as the "plan" event
+            if plan is not None:
+                sources = plan.sources
+            else:
+                sources = ["leaks", "mentions"] + (["breaches"] if email else []) + ["devices"]
+                notify_progress(progress, "plan", {"sources": sources})
+            
+            # STEP 1: Start the API calls; they run while the light scan probes platforms
+            calls = {
+                "leaks": (self.search_intelligencex, username),
+                "mentions": (self.search_mentions, username),
+                "breaches": (self.check_hibp_breaches, email),
+                "devices": (self.search_shodan, username),
+            }
+            futures = {
+                executor.submit(calls[key][0], calls[key][1], force_refresh, deadline): key
+                for key in sources
+            }
+            
+            # STEP 2: Run LIGHT SCAN to get social media profiles
             logger.info(f"Running light scan as baseline for {username}")
-            light_result = light_scan(username)
+            light_result = light_scan(username, progress=progress, force_refresh=force_refresh, deadline=deadline,
+                                      platforms=plan.platforms if plan is not None else None)
             if not light_result.get("success"):
                 logger.warning(f"Light scan failed: {light_result.get('error')}")
                 light_data = {"findings": [], "count": 0}
             else:
                 light_data = light_result.get("data", {})
             
-            # STEP 2: Build comprehensive scan data starting with light scan results
+            # STEP 3: Build comprehensive scan data starting with light scan results
             scan_data = {
                 "username": username,
                 "email": email,
@@ -368,24 +463,14 @@ class DeepScanService:
                 "data_sources": ["light_scan"]  # Always include light scan as data source
             }
             
-            # STEP 3: Run API calls in parallel for speed
-            with ThreadPoolExecutor(max_workers=4) as executor:
-                futures = {
-                    executor.submit(self.search_intelligencex, username): "leaks",
-                    executor.submit(self.search_mentions, username): "mentions",
-                }
-                
-                # Only add API calls if configured
-                if email:
-                    futures[executor.submit(self.check_hibp_breaches, email)] = "breaches"
-                
-                futures[executor.submit(self.search_shodan, username)] = "devices"
-                
-                # Collect results
-                for future in as_completed(futures):
+            # STEP 4: Collect API results until the deadline
+            finished = set()
+            try:
+                for future in as_completed(futures, timeout=deadline.remaining()):
                     key = futures[future]
                     try:
                         result = future.result()
+                        finished.add(key)
                         if result:
                             if key == "leaks":
                                 scan_data["leaks"] = result.get("leaks", [])
@@ -400,13 +485,37 @@ class DeepScanService:
                             
                             if "error" not in result:
                                 scan_data["data_sources"].append(result.get("source", key))
+                        notify_progress(progress, "source", {
+                            "source": key,
+                            "ok": bool(result) and "error" not in result,
+                            "count": len(scan_data.get(key, [])),
+                            "items": scan_data.get(key, []),
+                        })
+                    except DeadlineExceeded:
+                        pass  # reported as skipped below
                     except Exception as e:
+                        finished.add(key)
                         logger.warning(f"Error processing {key}: {str(e)}")
-
+                        notify_progress(progress, "source", {"source": key, "ok": False, "count": 0})
+            except FuturesTimeout:
+                logger.info(f"Deep scan for {username} hit its deadline with sources still running")
+            
+            skipped_sources = [key for key in futures.values() if key not in finished]
+            for key in skipped_sources:
+                notify_progress(progress, "source", {"source": key, "ok": False, "count": 0, "skipped": True})
+            skipped_platforms = light_data.get("skipped", {}).get("platforms", [])
+            scan_data["partial"] = bool(skipped_sources or skipped_platforms)
+            scan_data["skipped"] = {"platforms": skipped_platforms, "sources": skipped_sources}
+            scan_data["deadline"] = deadline.report()
             
             # Calculate threat score
             scan_data["threat_score"] = self.calculate_threat_score(scan_data)
             
+            notify_progress(progress, "threat_score", {
+                "threat_score": scan_data["threat_score"],
+                "risk_level": risk_level_for_score(scan_data["threat_score"]),
+            })
+            
             # Summary
             scan_data["summary"] = {
                 "total_profiles": scan_data.get("count", 0),
@@ -414,7 +523,8 @@ class DeepScanService:
                 "devices_found": len(scan_data["devices"]),
                 "leak_entries": len(scan_data["leaks"]),
                 "threat_mentions": scan_data.get("mention_count", 0),
-                "risk_level": "high" if scan_data["threat_score"] >= 70 else "medium" if scan_data["threat_score"] >= 40 else "low"
+                "risk_level": risk_level_for_score(scan_data["threat_score"]),
+                "partial": scan_data["partial"]
             }
             
             logger.info(f"Deep scan complete: profiles={scan_data['count']}, threat_score={scan_data['threat_score']}, sources={scan_data['data_sources']}")
@@ -431,6 +541,9 @@ class DeepScanService:
                 "error": f"Deep scan failed: {str(e)}",
                 "data": {"username": username, "findings": [], "count": 0}  # Return minimal results
             }
+        finally:
+            # Don't wait for stragglers; their own waits are capped by the deadline
+            executor.shutdown(wait=False, cancel_futures=True)
 
 
 # Initialize service
@@ -0,0 +1,178 @@
+"""
+hedging.py
+
+Hedged requests for platforms with heavy latency tails.
+Each platform's recent probe latencies are kept in a small ring buffer.
+When a probe has been outstanding longer than HEDGE_PERCENTILE of that
+history, a duplicate request is sent. Whichever reply comes back first
+is used, and the other request is cancelled.
+A primary cancelled because its hedge won still counts, as a lower
+bound on its latency, so the history keeps its slow tail.
+Hedges are paid for from a global budget. Every primary request adds
+HEDGE_MAX_EXTRA of a hedge to it, so extra traffic can never exceed
+that fraction of normal traffic, however slow the platforms get.
+"""
+
+import asyncio
+import math
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+from config import APIConfig
+
+logger = logging.getLogger(__name__)
+
+# Most hedges the budget can bank during quiet periods
+HEDGE_BURST = 5.0
+
+
+class Hedger:
+    """Per-platform latency history and a global hedge budget"""
+
+    def __init__(self, enabled: bool = APIConfig.HEDGE_ENABLED,
+                 platforms: Optional[Set[str]] = None,
+                 percentile: float = APIConfig.HEDGE_PERCENTILE,
+                 max_extra: float = APIConfig.HEDGE_MAX_EXTRA,
+                 history: int = APIConfig.HEDGE_HISTORY,
+                 min_samples: int = APIConfig.HEDGE_MIN_SAMPLES,
+                 min_delay: float = APIConfig.HEDGE_MIN_DELAY):
+        self.enabled = enabled
+        self.platforms = platforms if platforms is not None else APIConfig.HEDGE_PLATFORMS
+        self.percentile = percentile
+        self.max_extra = max_extra
+        self.history = history
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._budget = 0.0
+        self.counts = {
+            "primaries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "budget_denied": 0,
+            "admission_denied": 0,
+        }
+
+    def applies_to(self, key: str) -> bool:
+        return self.enabled and (not self.platforms or key in self.platforms)
+
+    def observe(self, key: str, seconds: float):
+        """Record how long a completed request to key took"""
+        with self._lock:
+            latencies = self._latencies.get(key)
+            if latencies is None:
+                latencies = self._latencies[key] = deque(maxlen=self.history)
+            latencies.append(seconds)
+
+    def delay_for(self, key: str) -> Optional[float]:
+        """Hedge delay for key, or None until enough history has been seen"""
+        with self._lock:
+            latencies = self._latencies.get(key)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            ordered = sorted(latencies)
+        rank = max(0, min(len(ordered) - 1, math.ceil(self.percentile / 100 * len(ordered)) - 1))
+        return max(self.min_delay, ordered[rank])
+
+    def _spend(self) -> bool:
+        """Take one hedge from the budget"""
+        with self._lock:
+            if self._budget < 1.0:
+                self.counts["budget_denied"] += 1
+                return False
+            self._budget -= 1.0
+            self.counts["hedges"] += 1
+            return True
+
+    async def _timed(self, key: str, send: Callable[[], Awaitable[Any]], primary: bool = False) -> Any:
+        started = time.monotonic()
+        try:
+            result = await send()
+        except asyncio.CancelledError:
+            # A primary cancelled after losing to its hedge took at least this long.
+            # Without these samples only fast winners are seen, the percentile
+            # drifts down and hedges fire ever earlier. A cancelled hedge has
+            # only run since the delay, so it would drag the percentile down
+            if primary:
+                self.observe(key, time.monotonic() - started)
+            raise
+        self.observe(key, time.monotonic() - started)
+        return result
+
+    async def run(self, key: str, send: Callable[[], Awaitable[Any]],
+                  admit: Optional[Callable[[], Awaitable[bool]]] = None) -> Any:
+        """
+        Await send(); if it is slower than key's hedge delay, race it
+        against a second send(). admit() is asked before the hedge goes
+        out (e.g. for a rate-limit token) and can veto it.
+        Exceptions only propagate once every attempt has failed.
+        """
+        if not self.applies_to(key):
+            return await send()
+
+        with self._lock:
+            self.counts["primaries"] += 1
+            self._budget = min(HEDGE_BURST, self._budget + self.max_extra)
+        delay = self.delay_for(key)
+
+        primary = asyncio.ensure_future(self._timed(key, send, primary=True))
+        hedge: Optional[asyncio.Future] = None
+        if delay is None:
+            return await primary
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._spend():
+                return await primary
+            if admit is not None and not await admit():
+                with self._lock:
+                    # Refund: the hedge never went out
+                    self._budget += 1.0
+                    self.counts["hedges"] -= 1
+                    self.counts["admission_denied"] += 1
+                return await primary
+
+            hedge = asyncio.ensure_future(self._timed(key, send))
+            pending = {primary, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is hedge:
+                            with self._lock:
+                                self.counts["hedge_wins"] += 1
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            # Cancels the slower attempt (or both, if the caller was cancelled)
+            primary.cancel()
+            if hedge is not None:
+                hedge.cancel()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self.counts)
+            platforms = list(self._latencies)
+        extra = counts["hedges"] / counts["primaries"] if counts["primaries"] else 0.0
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "max_extra": self.max_extra,
+            **counts,
+            "extra_load": round(extra, 4),
+            "delays": {
+                platform: round(delay, 3)
+                for platform in platforms
+                if (delay := self.delay_for(platform)) is not None
+            },
+        }
+
+
+# Initialize hedger singleton (probes run on the HTTP pool loop)
+hedger = Hedger()
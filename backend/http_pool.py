@@ -0,0 +1,266 @@
+"""
+http_pool.py
+
+Process-wide pooled HTTP client for outbound scan traffic.
+One asyncio event loop runs on a daemon thread and owns a single
+httpx.AsyncClient (keep-alive, HTTP/2 where available, per-host cap),
+so async endpoints and sync callers share the same connection pool.
+Platform probes use probe(): only the first PROBE_MAX_BYTES of a body
+are read, the connection is always handed back (or closed), and bytes
+downloaded are tallied per platform.
+"""
+
+import asyncio
+import threading
+import logging
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, Coroutine, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import APIConfig
+from shared_state import after_fork
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional 'h2' package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+
+class ProbeResponse:
+    """Status, headers and the first max_bytes of a probe's body; the connection is already released"""
+
+    __slots__ = ("response", "body", "truncated")
+
+    def __init__(self, response: httpx.Response, body: bytes, truncated: bool):
+        self.response = response
+        self.body = body
+        self.truncated = truncated
+
+    @property
+    def status_code(self) -> int:
+        return self.response.status_code
+
+    @property
+    def headers(self) -> httpx.Headers:
+        return self.response.headers
+
+    @property
+    def url(self) -> httpx.URL:
+        return self.response.url
+
+    @property
+    def history(self) -> List[httpx.Response]:
+        """Redirect responses that led to this one"""
+        return self.response.history
+
+    def raise_for_status(self):
+        self.response.raise_for_status()
+
+
+class HTTPPool:
+    """Shared async HTTP client running on a dedicated event loop thread"""
+
+    def __init__(self, max_connections: int = APIConfig.HTTP_MAX_CONNECTIONS,
+                 max_keepalive: int = APIConfig.HTTP_MAX_KEEPALIVE,
+                 max_per_host: int = APIConfig.HTTP_MAX_PER_HOST,
+                 keepalive_expiry: float = APIConfig.HTTP_KEEPALIVE_EXPIRY,
+                 http2: bool = APIConfig.HTTP2_ENABLED, verify: bool = True,
+                 probe_max_bytes: int = APIConfig.PROBE_MAX_BYTES,
+                 max_probes: int = APIConfig.PROBE_MAX_CONCURRENCY):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.max_per_host = max_per_host
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.verify = verify
+        self.probe_max_bytes = probe_max_bytes
+        self.max_probes = max_probes
+
+        self._lock = threading.Lock()
+        self._transfer_lock = threading.Lock()
+        self._transfer: Dict[str, Dict[str, int]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._probe_slots: Optional[asyncio.Semaphore] = None
+        after_fork(self, "_reset_after_fork")
+
+    def _reset_after_fork(self):
+        """Forked child: the engine thread did not survive the fork; start a new loop and client on demand"""
+        self._lock = threading.Lock()
+        self._transfer_lock = threading.Lock()
+        self._loop = self._thread = None
+        self._client = None
+        self._host_slots = {}
+        self._probe_slots = None
+
+    # ── Engine loop ──
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the engine loop thread on first use"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="http-pool", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+                logger.info(
+                    f"HTTP pool started (http2={self.http2}, max_connections={self.max_connections}, "
+                    f"per_host={self.max_per_host})"
+                )
+            return self._loop
+
+    def _in_engine_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the engine loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    async def run(self, coro: Coroutine) -> Any:
+        """Await a coroutine on the engine loop from any event loop"""
+        self._ensure_loop()
+        if self._in_engine_loop():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def run_sync(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the engine loop and block until it finishes"""
+        self._ensure_loop()
+        if self._in_engine_loop():
+            coro.close()
+            raise RuntimeError("run_sync() called from the HTTP pool loop; await run() instead")
+        return self.submit(coro).result(timeout)
+
+    # ── Client (engine loop only) ──
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared client; only valid on the engine loop"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                headers=DEFAULT_HEADERS,
+                follow_redirects=True,
+                verify=self.verify,
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def host_slot(self, url: str):
+        """Cap concurrent requests per host (httpx limits are pool-wide only)"""
+        host = urlsplit(url).hostname or ""
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        async with slot:
+            yield
+
+    @property
+    def probe_slots(self) -> asyncio.Semaphore:
+        """Process-wide cap on platform probes in flight; only valid on the engine loop"""
+        if self._probe_slots is None:
+            self._probe_slots = asyncio.Semaphore(self.max_probes)
+        return self._probe_slots
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET through the shared client; must be awaited on the engine loop"""
+        async with self.host_slot(url):
+            return await self.client.get(url, **kwargs)
+
+    async def probe(self, url: str, key: Optional[str] = None, max_bytes: Optional[int] = None,
+                    **kwargs) -> ProbeResponse:
+        """
+        GET reading at most max_bytes of the final body (default
+        probe_max_bytes; 0 reads none). The response is closed before
+        returning, on errors and on cancellation too: a fully read body
+        leaves the connection in the pool, a cut-off one is dropped.
+        Bytes downloaded are tallied under key (default: the host).
+        """
+        max_bytes = self.probe_max_bytes if max_bytes is None else max_bytes
+        body = bytearray()
+        response = None
+        try:
+            async with self.host_slot(url):
+                async with self.client.stream("GET", url, **kwargs) as response:
+                    if max_bytes > 0:
+                        async for chunk in response.aiter_bytes():
+                            room = max_bytes - len(body)
+                            body += chunk[:room]
+                            if len(chunk) > room:
+                                break
+            return ProbeResponse(response, bytes(body), truncated=not response.is_stream_consumed)
+        finally:
+            self._record_transfer(key or urlsplit(url).hostname or "", response)
+
+    def _record_transfer(self, key: str, response: Optional[httpx.Response]):
+        downloaded = response.num_bytes_downloaded if response is not None else 0
+        with self._transfer_lock:
+            stats = self._transfer.get(key)
+            if stats is None:
+                stats = self._transfer[key] = {
+                    "requests": 0, "responses": 0, "bytes": 0, "truncated": 0, "redirects": 0
+                }
+            stats["requests"] += 1
+            if response is not None:
+                stats["responses"] += 1
+                stats["bytes"] += downloaded
+                stats["truncated"] += int(not response.is_stream_consumed)
+                stats["redirects"] += len(response.history)
+
+    def transfer_stats(self) -> Dict[str, Any]:
+        """Per-platform probe counts and body bytes downloaded (on the wire, before decompression)"""
+        with self._transfer_lock:
+            platforms = {key: dict(stats) for key, stats in self._transfer.items()}
+        return {
+            "max_bytes": self.probe_max_bytes,
+            "bytes": sum(stats["bytes"] for stats in platforms.values()),
+            "requests": sum(stats["requests"] for stats in platforms.values()),
+            "platforms": platforms,
+        }
+
+    def close(self):
+        """Close the client and stop the engine loop"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+
+        async def _shutdown():
+            if self._client is not None:
+                await self._client.aclose()
+                self._client = None
+            self._host_slots.clear()
+            self._probe_slots = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(5)
+        except Exception as e:
+            logger.debug(f"HTTP pool shutdown error: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
+        logger.info("HTTP pool closed")
+
+
+# Initialize pool singleton
+http_pool = HTTPPool()
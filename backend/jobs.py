@@ -0,0 +1,329 @@
+"""
+jobs.py
+
+Background scan job queue.
+Scan requests are persisted to the jobs table and picked up by a fixed
+pool of worker threads, so the API returns immediately and a burst of
+scan requests never grows the number of threads.
+Every scan event is also appended to job_events so clients can stream
+results as they arrive (see JobEventHub).
+A job scans only what the case's filters select (see scan_plan.py); the
+plan, with its request count, is the job's first event.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+import logging
+from typing import Any, Dict, Optional, Set, Tuple
+
+from config import APIConfig
+from database import db, Database
+from deadline import Deadline
+from shared_state import after_fork
+from deep_scan_service import deep_scan_service
+from scan_plan import plan_scan
+from sherlock_scan import light_scan
+
+logger = logging.getLogger(__name__)
+
+SCAN_TYPES = ("light", "deep")
+
+# Higher runs first; light scans are short and usually interactive
+DEFAULT_PRIORITY = {
+    "light": 10,
+    "deep": 0,
+}
+
+# Last event of every job; stream consumers stop after one of these
+TERMINAL_EVENTS = ("complete", "failed")
+
+
+class JobEventSubscription:
+    """Wake-up flag for one stream consumer, settable from any thread"""
+
+    def __init__(self, hub: "JobEventHub", job_id: str):
+        self.hub = hub
+        self.job_id = job_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout: float):
+        """Wait for new events; the timeout doubles as a poll for other processes"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.event.clear()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class JobEventHub:
+    """In-process notifier telling stream consumers a job has new events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[JobEventSubscription]] = {}
+
+    def subscribe(self, job_id: str) -> JobEventSubscription:
+        subscription = JobEventSubscription(self, job_id)
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: JobEventSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.job_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.job_id]
+
+    def publish(self, job_id: str):
+        with self._lock:
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for subscription in subscribers:
+            subscription.notify()
+
+
+job_events = JobEventHub()
+
+
+class JobProgress:
+    """Records scan events and folds them into a persisted progress snapshot"""
+
+    FLUSH_INTERVAL = 0.5  # seconds between snapshot writes on platform events
+
+    def __init__(self, database: Database, job_id: str):
+        self.db = database
+        self.job_id = job_id
+        self.snapshot: Dict[str, Any] = {
+            "platforms_total": 0,
+            "platforms_done": 0,
+            "platforms_found": 0,
+            "platforms_skipped": 0,
+            "requests_planned": None,
+            "sources": {},
+        }
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        # Continue numbering if a previous attempt of this job was interrupted
+        self._seq = database.last_job_event_seq(job_id)
+
+    def __call__(self, event: str, payload: Dict):
+        with self._lock:
+            if event == "plan":
+                if "platforms" in payload:
+                    self.snapshot["platforms_total"] = payload["platforms"]
+                if "requests" in payload:
+                    self.snapshot["requests_planned"] = payload["requests"]["total"]
+                for source in payload.get("sources", []):
+                    self.snapshot["sources"].setdefault(source, "pending")
+            elif event == "platform":
+                self.snapshot["platforms_done"] += 1
+                self.snapshot["platforms_found"] += int(bool(payload.get("found")))
+                self.snapshot["platforms_skipped"] += int(bool(payload.get("skipped")))
+            elif event == "source":
+                self.snapshot["sources"][payload["source"]] = (
+                    "done" if payload.get("ok") else "skipped" if payload.get("skipped") else "failed"
+                )
+            elif event == "threat_score":
+                self.snapshot["threat_score"] = payload.get("threat_score")
+
+            # Platform events are frequent; snapshot writes for them are throttled
+            now = time.monotonic()
+            flush = event != "platform" or now - self._last_flush >= self.FLUSH_INTERVAL
+            if flush:
+                self._last_flush = now
+
+            self._seq += 1
+            self.db.append_job_event(self.job_id, self._seq, event, payload,
+                                     progress=self.snapshot if flush else None)
+        job_events.publish(self.job_id)
+
+
+def _process_start(pid: int) -> Optional[str]:
+    """Start time of a process (clock ticks since boot), or None without /proc"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Field 22; the command name (field 2) may contain spaces, so count from its ')'
+    return stat.rpartition(")")[2].split()[19]
+
+
+_instance: Optional[str] = None
+
+
+def worker_instance() -> str:
+    """'<pid>-<start time>' of this process; pids alone repeat across container restarts"""
+    global _instance
+    pid = os.getpid()
+    if _instance is None or not _instance.startswith(f"{pid}-"):  # new process or forked child
+        _instance = f"{pid}-{_process_start(pid) or uuid.uuid4().hex[:12]}"
+    return _instance
+
+
+def worker_alive(worker: Optional[str]) -> bool:
+    """Whether the process that claimed a job ('<pid>-<start>/scan-worker-<n>') is still running"""
+    instance, _, _ = (worker or "").partition("/")
+    pid, _, started = instance.partition("-")
+    if not pid.isdigit() or not started:
+        return False  # claimed before workers were instance-qualified
+    if int(pid) == os.getpid():
+        # An earlier run that had our pid (e.g. PID 1 in a restarted container)
+        return instance == worker_instance()
+    current = _process_start(int(pid))
+    if current is not None:
+        return current == started
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ScanJobQueue:
+    """Persistent priority queue of scan jobs with a fixed worker pool"""
+
+    def __init__(self, database: Database, workers: int = APIConfig.SCAN_WORKERS,
+                 poll_interval: float = APIConfig.JOB_POLL_INTERVAL):
+        self.db = database
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+        after_fork(self, "_reset_after_fork")
+
+    def _reset_after_fork(self):
+        # Worker threads are not copied by fork; the child starts its own
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Requeue jobs orphaned by dead processes and start the worker threads"""
+        if self._threads:
+            return
+        self.db.requeue_interrupted_jobs(alive=worker_alive)
+        self._stopping.clear()
+        instance = worker_instance()
+        for i in range(self.workers):
+            # Instance-qualified, so other web workers can tell whether the job's owner still runs
+            thread = threading.Thread(
+                target=self._worker_loop, args=(f"{instance}/scan-worker-{i}",), name=f"scan-worker-{i}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Scan job queue started with {self.workers} worker(s)")
+
+    def stop(self, timeout: float = 5.0):
+        """Signal workers to exit after their current job"""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def enqueue(self, case_id: str, scan_type: str, priority: Optional[int] = None,
+                force_refresh: bool = False, budget: Optional[float] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queue a scan for a case.
+        Returns (job, created); created is False when an identical scan
+        is already queued or running for the case.
+        force_refresh makes the scan bypass cached probe results.
+        budget (seconds) overrides the scan type's default time budget.
+        """
+        if scan_type not in SCAN_TYPES:
+            raise ValueError(f"Invalid scan type: {scan_type}")
+        if priority is None:
+            priority = DEFAULT_PRIORITY[scan_type]
+
+        options = {"force_refresh": True} if force_refresh else {}
+        if budget is not None:
+            options["budget"] = budget
+        job, created = self.db.enqueue_job(str(uuid.uuid4()), case_id, scan_type, priority, options)
+        if created:
+            with self._wakeup:
+                self._wakeup.notify()
+        return job, created
+
+    def _worker_loop(self, name: str):
+        while not self._stopping.is_set():
+            job = self.db.claim_next_job(name)
+            if job is None:
+                # Poll as well as wait, so jobs queued by other processes are picked up
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            self._run_job(job)
+
+    def _run_job(self, job: Dict[str, Any]):
+        job_id = job["job_id"]
+        case_id = job["case_id"]
+        scan_type = job["scan_type"]
+        progress = JobProgress(self.db, job_id)
+
+        logger.info(f"Running {scan_type} scan job {job_id} for case {case_id}")
+        try:
+            case = self.db.get_case(case_id, columns=("username", "email", "filters"))
+            if not case:
+                raise ValueError("Case not found")
+            plan = plan_scan(scan_type, case["filters"], case["username"], case.get("email"), strict=False)
+            progress("plan", plan.summary())
+
+            force_refresh = bool(job["options"].get("force_refresh"))
+            # The budget starts when the job starts, not when it was queued
+            deadline = Deadline(job["options"]["budget"]) if "budget" in job["options"] else None
+            if scan_type == "light":
+                result = light_scan(case["username"], progress=progress, force_refresh=force_refresh,
+                                    deadline=deadline, platforms=plan.platforms)
+            else:
+                result = deep_scan_service.deep_scan(case["username"], case.get("email"), progress=progress,
+                                                     force_refresh=force_refresh, deadline=deadline, plan=plan)
+
+            if not result.get("success"):
+                raise RuntimeError(result.get("error", "Scan failed"))
+
+            if scan_type == "light":
+                self.db.set_light_scan_result(case_id, result["data"])
+            else:
+                self.db.set_deep_scan_result(case_id, result["data"])
+
+        except Exception as e:
+            logger.error(f"Scan job {job_id} failed: {str(e)}")
+            self._finish(job_id, progress, "failed", "failed", {"error": str(e)}, error=str(e))
+            return
+
+        self._finish(job_id, progress, "done", "complete", {
+            "count": result["data"].get("count", 0),
+            "threat_score": result["data"].get("threat_score"),
+            "partial": bool(result["data"].get("partial")),
+            "skipped": result["data"].get("skipped", {}),
+        })
+
+    def _finish(self, job_id: str, progress: "JobProgress", state: str, event: str, payload: Dict,
+                error: Optional[str] = None):
+        """Set the job's one terminal state, then send its terminal event (outside the scan's error handling)"""
+        self.db.finish_job(job_id, state, progress.snapshot, error=error)
+        try:
+            progress(event, payload)
+        except Exception as e:
+            logger.error(f"Scan job {job_id} finished ({state}) but its '{event}' event was lost: {str(e)}")
+
+
+# Initialize job queue singleton (workers start with the app)
+scan_jobs = ScanJobQueue(db)
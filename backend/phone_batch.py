@@ -0,0 +1,169 @@
+"""
+phone_batch.py
+
+Batch phone intelligence for large number lists (e.g. seized-device exports).
+- All inputs are normalized and parsed first, then deduplicated by E.164.
+  Each distinct number gets one validation and one carrier/geocoder/
+  timezone lookup, however often it appears in the list.
+- Small batches are analyzed in-process. Once a batch has at least
+  PHONE_BATCH_PROCESS_THRESHOLD distinct numbers, the lookups are split
+  into chunks and run on a process pool.
+- Results are yielded as they are ready: one row per input line, in
+  completion order, each carrying its input index.
+"""
+
+import csv
+import io
+import multiprocessing
+import threading
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import phonenumbers
+
+from config import APIConfig
+from shared_state import after_fork
+from phone_intel import parse_phone_number, analyze_parsed_number, warm_up_phone_metadata
+
+logger = logging.getLogger(__name__)
+
+# Column names recognized as the phone column in CSV uploads
+CSV_PHONE_COLUMNS = ("phone", "phone_number", "number", "msisdn", "tel", "mobile")
+
+
+def analyze_e164_chunk(numbers: List[str]) -> List[Tuple[str, dict]]:
+    """Analyze a chunk of E.164 numbers (runs in pool workers)"""
+    results = []
+    for number in numbers:
+        try:
+            results.append((number, analyze_parsed_number(phonenumbers.parse(number, None))))
+        except Exception as e:
+            results.append((number, {"error": f"Phone analysis error: {str(e)}", "valid": False}))
+    return results
+
+
+def parse_phone_csv(text: str) -> List[str]:
+    """
+    Phone numbers from CSV text. Uses a recognized header column
+    (phone, phone_number, number, ...) if present, else the first column.
+    """
+    rows = [row for row in csv.reader(io.StringIO(text)) if row and any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = next((header.index(name) for name in CSV_PHONE_COLUMNS if name in header), None)
+    if column is not None:
+        rows = rows[1:]
+    else:
+        column = 0
+        # Drop a header row that isn't a number
+        if not any(ch.isdigit() for ch in rows[0][0]):
+            rows = rows[1:]
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+
+class PhoneBatchEngine:
+    """Normalize, dedupe and analyze phone number batches"""
+
+    def __init__(self, workers: int = APIConfig.PHONE_BATCH_WORKERS,
+                 process_threshold: int = APIConfig.PHONE_BATCH_PROCESS_THRESHOLD,
+                 chunk_size: int = APIConfig.PHONE_BATCH_CHUNK_SIZE):
+        self.workers = workers
+        self.process_threshold = process_threshold
+        self.chunk_size = chunk_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        after_fork(self, "_reset_after_fork")
+
+    def _reset_after_fork(self):
+        # The parent's pool processes belong to the parent
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """Process pool, started on first large batch"""
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: the API process runs threads (scan workers, HTTP pool) that fork would copy mid-state
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=warm_up_phone_metadata
+                )
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    @staticmethod
+    def normalize(phones: Iterable[str], country_code: Optional[str] = None) -> Tuple[Dict[str, List[int]], List[dict]]:
+        """
+        Parse every input once.
+        Returns ({e164: [input indexes]}, [error rows for unparseable inputs]).
+        """
+        groups: Dict[str, List[int]] = {}
+        errors = []
+        for index, raw in enumerate(phones):
+            try:
+                if not isinstance(raw, str) or len(raw.strip()) < 7:
+                    raise ValueError("Invalid phone number format")
+                parsed = parse_phone_number(raw, country_code)
+                e164 = phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+                groups.setdefault(e164, []).append(index)
+            except phonenumbers.NumberParseException as e:
+                errors.append({"index": index, "input": raw, "error": f"Invalid phone number: {str(e)}", "valid": False})
+            except Exception as e:
+                errors.append({"index": index, "input": raw, "error": str(e), "valid": False})
+        return groups, errors
+
+    def _analyze(self, numbers: List[str]) -> Iterator[Tuple[str, dict]]:
+        """Yield (e164, result) for distinct numbers, fanning out when the batch is large"""
+        if len(numbers) < self.process_threshold or self.workers <= 1:
+            for start in range(0, len(numbers), self.chunk_size):
+                yield from analyze_e164_chunk(numbers[start:start + self.chunk_size])
+            return
+
+        futures = [self.pool.submit(analyze_e164_chunk, numbers[start:start + self.chunk_size])
+                   for start in range(0, len(numbers), self.chunk_size)]
+        try:
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def lookup(self, phones: List[str], country_code: Optional[str] = None) -> Iterator[dict]:
+        """
+        Yield one result row per input: {"index", "input", ...phone analysis}.
+        Rows for duplicate inputs share one lookup and are marked "duplicate": true.
+        The last item is a {"summary": {...}} row.
+        """
+        started = time.perf_counter()
+        groups, errors = self.normalize(phones, country_code)
+        yield from errors
+
+        valid_unique = 0
+        for number, result in self._analyze(list(groups)):
+            valid_unique += bool(result.get("valid"))
+            for position, index in enumerate(groups[number]):
+                yield {"index": index, "input": phones[index], **result, "duplicate": position > 0}
+
+        elapsed = time.perf_counter() - started
+        yield {"summary": {
+            "total": len(phones),
+            "unique": len(groups),
+            "duplicates": len(phones) - len(groups) - len(errors),
+            "invalid_input": len(errors),
+            "valid_unique": valid_unique,
+            "elapsed": round(elapsed, 3),
+            "numbers_per_sec": round(len(phones) / elapsed, 1) if elapsed > 0 else 0.0,
+        }}
+
+
+# Initialize engine singleton
+phone_batch_engine = PhoneBatchEngine()
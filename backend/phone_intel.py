@@ -4,28 +4,97 @@ phone_intel.py
 Phone Intelligence module using phonenumbers library with enhanced verification.
 Normalizes phone numbers and extracts carrier, country, timezone data.
 Includes verification through multiple sources.
+Carrier/region/timezone lookups are memoized by number prefix
+(PhoneMetadataCache), since bulk lists share prefixes heavily.
+The carrier/geocoder/timezone prefix data is large. It is imported on
+the first lookup (or by warm_up_phone_metadata), not when the module is
+imported, so workers that never see a phone lookup never pay for it.
 """
 
 import phonenumbers
-from phonenumbers import carrier, geocoder, timezone, COUNTRY_CODE_TO_REGION_CODE
-from typing import Optional
+from phonenumbers import COUNTRY_CODE_TO_REGION_CODE
+from collections import OrderedDict
+from functools import lru_cache
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
 import logging
 
+from config import APIConfig
+
 logger = logging.getLogger(__name__)
 
 
-# Country code mappings for common prefixes
-COUNTRY_PREFIXES = {
-    '1': 'US',      # US/Canada
-    '44': 'GB',     # UK
-    '233': 'GH',    # Ghana
-    '234': 'NG',    # Nigeria
-    '255': 'TZ',    # Tanzania
-    '256': 'UG',    # Uganda
-    '27': 'ZA',     # South Africa
-    '254': 'KE',    # Kenya
-    '212': 'MA',    # Morocco
-}
+_metadata_lock = threading.Lock()
+_metadata_modules: Optional[Tuple[ModuleType, ModuleType, ModuleType]] = None
+
+
+def phone_metadata() -> Tuple[ModuleType, ModuleType, ModuleType]:
+    """phonenumbers (carrier, geocoder, timezone) modules, imported on first use"""
+    global _metadata_modules
+    if _metadata_modules is None:
+        with _metadata_lock:
+            if _metadata_modules is None:
+                started = time.perf_counter()
+                from phonenumbers import carrier, geocoder, timezone
+                _metadata_modules = (carrier, geocoder, timezone)
+                logger.info(f"Loaded phone metadata in {time.perf_counter() - started:.2f}s")
+    return _metadata_modules
+
+
+def phone_metadata_loaded() -> bool:
+    return _metadata_modules is not None
+
+
+# Non-geographical entities (+800, +882, ...) map to this pseudo-region
+NON_GEO_REGION = "001"
+
+
+def _build_calling_code_trie() -> dict:
+    """
+    Digit trie over every ITU calling code. A node that ends a code holds
+    (code, regions) under the "" key; regions lists the main region first.
+    """
+    trie: dict = {}
+    for code, regions in COUNTRY_CODE_TO_REGION_CODE.items():
+        node = trie
+        for digit in str(code):
+            node = node.setdefault(digit, {})
+        node[""] = (str(code), tuple(regions))
+    return trie
+
+
+CALLING_CODE_TRIE = _build_calling_code_trie()
+
+
+def match_calling_code(digits: str) -> Optional[Tuple[str, Tuple[str, ...]]]:
+    """Longest calling code that prefixes digits, as (code, regions); None if none does"""
+    node = CALLING_CODE_TRIE
+    match = None
+    for digit in digits:
+        node = node.get(digit)
+        if node is None:
+            break
+        match = node.get("", match)
+    return match
+
+
+@lru_cache(maxsize=None)
+def _possible_lengths(region: str, code: str) -> Tuple[int, ...]:
+    """National number lengths phonenumbers allows for a region (or non-geo calling code)"""
+    from phonenumbers.phonemetadata import PhoneMetadata
+    if region == NON_GEO_REGION:
+        metadata = PhoneMetadata.metadata_for_nongeo_region(int(code))
+    else:
+        metadata = PhoneMetadata.metadata_for_region(region)
+    if metadata is None or metadata.general_desc is None:
+        return ()
+    return tuple(metadata.general_desc.possible_length or ())
+
+
+def _main_region(regions: Tuple[str, ...]) -> Optional[str]:
+    return regions[0] if regions and regions[0] != NON_GEO_REGION else None
 
 
 def normalize_phone_number(phone_number: str, country_code: Optional[str] = None) -> tuple:
@@ -45,13 +114,11 @@ def normalize_phone_number(phone_number: str, country_code: Optional[str] = None
     # Try to detect country code from the number itself
     detected_country = None
     
-    # If it starts with +, extract country code
+    # If it starts with +, extract country code (shared codes resolve to their main region)
     if phone.startswith('+'):
-        # Try to find matching country code (longest match first)
-        for prefix in sorted(COUNTRY_PREFIXES.keys(), key=len, reverse=True):
-            if phone[1:].startswith(prefix):
-                detected_country = COUNTRY_PREFIXES[prefix]
-                break
+        match = match_calling_code(phone[1:])
+        if match:
+            detected_country = _main_region(match[1])
     
     # If starts with 0, it's a local number
     elif phone.startswith('0'):
@@ -62,13 +129,16 @@ def normalize_phone_number(phone_number: str, country_code: Optional[str] = None
             detected_country = 'GH'
     
     # If starts with digits but no +, treat as international prefix
+    # unless it is already a plausible national number for the target region
+    # (every leading digit starts some calling code, e.g. a US 202... vs Egypt +20)
     else:
-        # Try to find matching country code from the beginning
-        for prefix in sorted(COUNTRY_PREFIXES.keys(), key=len, reverse=True):
-            if phone.startswith(prefix):
-                detected_country = COUNTRY_PREFIXES[prefix]
+        national_region = country_code.upper() if country_code else 'US'
+        match = match_calling_code(phone)
+        if match and len(phone) not in _possible_lengths(national_region, ""):
+            code, regions = match
+            if len(phone) - len(code) in _possible_lengths(regions[0], code):
+                detected_country = _main_region(regions)
                 phone = '+' + phone  # Add the + prefix
-                break
     
     # Use provided country_code if explicitly given, otherwise use detected
     final_country = country_code.upper() if country_code else (detected_country or 'US')
@@ -76,6 +146,188 @@ def normalize_phone_number(phone_number: str, country_code: Optional[str] = None
     return phone, final_country
 
 
+# Map number type to string
+NUMBER_TYPE_NAMES = {
+    phonenumbers.PhoneNumberType.MOBILE: "mobile",
+    phonenumbers.PhoneNumberType.FIXED_LINE: "fixed_line",
+    phonenumbers.PhoneNumberType.FIXED_LINE_OR_MOBILE: "fixed_or_mobile",
+    phonenumbers.PhoneNumberType.TOLL_FREE: "toll_free",
+    phonenumbers.PhoneNumberType.PREMIUM_RATE: "premium_rate",
+    phonenumbers.PhoneNumberType.SHARED_COST: "shared_cost",
+    phonenumbers.PhoneNumberType.VOIP: "voip",
+    phonenumbers.PhoneNumberType.PERSONAL_NUMBER: "personal",
+    phonenumbers.PhoneNumberType.PAGER: "pager",
+    phonenumbers.PhoneNumberType.UAN: "uan",
+    phonenumbers.PhoneNumberType.UNKNOWN: "unknown",
+}
+
+
+class PhoneMetadataCache:
+    """
+    Bounded LRU of carrier, region description and timezones keyed by
+    (number type, region, number prefix).
+    The phonenumbers prefix tables only ever look at the first few digits
+    of the E.164 number, and each cached answer also depends on the
+    number type and region. The prefix length is the longest key that
+    the carrier/geocoder/timezone tables hold for the number's country
+    code. That keeps hits exact while the key stays short: 6-9 digits
+    for most countries. max_entries=0 disables caching.
+    The cache is per process, so batch pool workers each keep their own.
+    """
+
+    def __init__(self, max_entries: int = APIConfig.PHONE_META_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[str, str, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._prefix_lengths: Optional[Dict[str, int]] = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _longest_keys() -> Dict[str, int]:
+        """Longest prefix-table key per country calling code"""
+        from phonenumbers.carrierdata import CARRIER_DATA
+        from phonenumbers.geodata import GEOCODE_DATA
+        from phonenumbers.tzdata import TIMEZONE_DATA
+        
+        lengths: Dict[str, int] = {}
+        for data in (CARRIER_DATA, GEOCODE_DATA, TIMEZONE_DATA):
+            for key in data:
+                # Calling codes are prefix-free, so the first match is the code
+                for size in (1, 2, 3):
+                    if int(key[:size]) in COUNTRY_CODE_TO_REGION_CODE:
+                        cc = key[:size]
+                        if len(key) > lengths.get(cc, 0):
+                            lengths[cc] = len(key)
+                        break
+        return lengths
+
+    def prefix_for(self, parsed: phonenumbers.PhoneNumber, e164: str) -> str:
+        """Shortest leading digits of e164 that decide every prefix-table lookup"""
+        if self._prefix_lengths is None:
+            lengths = self._longest_keys()
+            with self._lock:
+                self._prefix_lengths = lengths
+        cc = str(parsed.country_code)
+        length = self._prefix_lengths.get(cc, len(cc))
+        # Mobile-token countries (e.g. Argentina) geocode with the token removed, one digit further in
+        if phonenumbers.country_mobile_token(parsed.country_code):
+            length += 1
+        return e164[1:1 + length]
+
+    def lookup(self, parsed: phonenumbers.PhoneNumber, e164: str,
+               number_type: int, region_code: Optional[str]) -> Tuple[str, str, List[str]]:
+        """(carrier name, region description, timezones) for a parsed number"""
+        if self.max_entries <= 0:
+            return self._resolve(parsed)
+        
+        key = (number_type, region_code, self.prefix_for(parsed, e164))
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return cached
+            self._stats["misses"] += 1
+        
+        value = self._resolve(parsed)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        return value
+
+    @staticmethod
+    def _resolve(parsed: phonenumbers.PhoneNumber) -> Tuple[str, str, List[str]]:
+        carrier, geocoder, timezone = phone_metadata()
+        return (
+            carrier.name_for_number(parsed, "en"),
+            geocoder.description_for_number(parsed, "en"),
+            list(timezone.time_zones_for_number(parsed)),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["metadata_loaded"] = phone_metadata_loaded()
+        return stats
+
+
+# Initialize cache singleton
+phone_metadata_cache = PhoneMetadataCache()
+
+
+def warm_up_phone_metadata():
+    """Load the prefix data and cache key lengths ahead of the first lookup"""
+    phone_metadata()
+    example = phonenumbers.example_number("US")
+    if example is not None:
+        analyze_parsed_number(example)
+
+
+def parse_phone_number(phone_number: str, country_code: Optional[str] = None) -> phonenumbers.PhoneNumber:
+    """Normalize and parse a phone number; raises phonenumbers.NumberParseException"""
+    normalized_phone, detected_country = normalize_phone_number(phone_number, country_code)
+    return phonenumbers.parse(normalized_phone, detected_country)
+
+
+def analyze_parsed_number(parsed: phonenumbers.PhoneNumber) -> dict:
+    """
+    Validation and carrier/geocoder/timezone metadata for a parsed number.
+    This is the expensive part of a lookup; batch callers run it once per
+    distinct E.164 number.
+    """
+    # Validate
+    is_valid = phonenumbers.is_valid_number(parsed)
+    is_possible = phonenumbers.is_possible_number(parsed)
+    
+    # Format numbers
+    e164_format = phonenumbers.format_number(
+        parsed, 
+        phonenumbers.PhoneNumberFormat.E164
+    )
+    international_format = phonenumbers.format_number(
+        parsed,
+        phonenumbers.PhoneNumberFormat.INTERNATIONAL
+    )
+    
+    # Extract metadata (carrier/region/timezone memoized by prefix)
+    region_code = phonenumbers.region_code_for_number(parsed)
+    number_type = phonenumbers.number_type(parsed)
+    carrier_name, location, timezones = phone_metadata_cache.lookup(
+        parsed, e164_format, number_type, region_code
+    )
+    
+    type_str = NUMBER_TYPE_NAMES.get(number_type, "unknown")
+    
+    # Calculate confidence based on validation results
+    confidence = 0.95 if is_valid else 0.50 if is_possible else 0.10
+    
+    return {
+        "number": e164_format,
+        "number_international": international_format,
+        "country": location or region_code,
+        "country_code": region_code,
+        "region": location,
+        "carrier": carrier_name or "Unknown",
+        "timezone": timezones[0] if timezones else None,
+        "type": type_str,
+        "valid": is_valid,
+        "possible": is_possible,
+        "confidence": confidence,
+    }
+
+
 def validate_and_analyze_phone(phone_number: str, country_code: Optional[str] = None) -> dict:
     """
     Validate and analyze a phone number with enhanced verification.
@@ -97,61 +349,11 @@ def validate_and_analyze_phone(phone_number: str, country_code: Optional[str] =
         # Parse phone number with detected country
         parsed = phonenumbers.parse(normalized_phone, detected_country)
         
-        # Validate
-        is_valid = phonenumbers.is_valid_number(parsed)
-        is_possible = phonenumbers.is_possible_number(parsed)
+        result = analyze_parsed_number(parsed)
         
-        # Extract metadata
-        region_code = phonenumbers.region_code_for_number(parsed)
-        carrier_name = carrier.name_for_number(parsed, "en")
-        location = geocoder.description_for_number(parsed, "en")
-        timezones = timezone.time_zones_for_number(parsed)
-        number_type = phonenumbers.number_type(parsed)
+        logger.info(f"Phone analysis result: {result['number']} - Valid: {result['valid']}, Carrier: {result['carrier']}")
         
-        # Format numbers
-        e164_format = phonenumbers.format_number(
-            parsed, 
-            phonenumbers.PhoneNumberFormat.E164
-        )
-        international_format = phonenumbers.format_number(
-            parsed,
-            phonenumbers.PhoneNumberFormat.INTERNATIONAL
-        )
-        
-        # Map number type to string
-        type_map = {
-            phonenumbers.PhoneNumberType.MOBILE: "mobile",
-            phonenumbers.PhoneNumberType.FIXED_LINE: "fixed_line",
-            phonenumbers.PhoneNumberType.FIXED_LINE_OR_MOBILE: "fixed_or_mobile",
-            phonenumbers.PhoneNumberType.TOLL_FREE: "toll_free",
-            phonenumbers.PhoneNumberType.PREMIUM_RATE: "premium_rate",
-            phonenumbers.PhoneNumberType.SHARED_COST: "shared_cost",
-            phonenumbers.PhoneNumberType.VOIP: "voip",
-            phonenumbers.PhoneNumberType.PERSONAL_NUMBER: "personal",
-            phonenumbers.PhoneNumberType.PAGER: "pager",
-            phonenumbers.PhoneNumberType.UAN: "uan",
-            phonenumbers.PhoneNumberType.UNKNOWN: "unknown",
-        }
-        type_str = type_map.get(number_type, "unknown")
-        
-        # Calculate confidence based on validation results
-        confidence = 0.95 if is_valid else 0.50 if is_possible else 0.10
-        
-        logger.info(f"Phone analysis result: {e164_format} - Valid: {is_valid}, Carrier: {carrier_name}")
-        
-        return {
-            "number": e164_format,
-            "number_international": international_format,
-            "country": location or region_code,
-            "country_code": region_code,
-            "region": location,
-            "carrier": carrier_name or "Unknown",
-            "timezone": timezones[0] if timezones else None,
-            "type": type_str,
-            "valid": is_valid,
-            "possible": is_possible,
-            "confidence": confidence,
-        }
+        return result
         
     except phonenumbers.NumberParseException as e:
         logger.warning(f"Phone parse error: {str(e)}")
@@ -0,0 +1,187 @@
+"""
+platforms.py
+
+Registry of the platforms a username scan probes.
+Sites are loaded from a Sherlock-style data file (PLATFORMS_FILE,
+data/platforms.json by default). Each entry gives the profile URL
+template, an optional separate probe URL, how a missing account shows
+up (errorType), an optional username regex and category tags.
+Templates, regexes and error markers are compiled once at load, so a
+probe only costs a string join and a bytes search.
+
+Detection methods (errorType):
+- status_code: the account exists if the final response is 2xx/3xx
+- message: as status_code, unless the body read by the probe contains
+  one of errorMsg
+- response_url: as status_code, unless the request was redirected
+  (to errorUrl, when one is given)
+"""
+
+import json
+import re
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import quote, urlsplit
+
+from config import APIConfig
+
+logger = logging.getLogger(__name__)
+
+DETECTION_METHODS = ("status_code", "message", "response_url")
+
+
+def _name_key(name: str) -> str:
+    """Name lowercased with spaces and punctuation dropped ("Product Hunt" -> "producthunt")"""
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+class UrlTemplate:
+    """URL with '{}' username placeholders, split once so formatting is a join"""
+
+    __slots__ = ("template", "_parts")
+
+    def __init__(self, template: str):
+        self.template = template
+        self._parts = template.split("{}")
+
+    def format(self, username: str) -> str:
+        return quote(username, safe="").join(self._parts)
+
+
+class Platform:
+    """One probed site with its compiled URL templates and detection rule"""
+
+    __slots__ = ("name", "url", "url_main", "probe_url", "host", "detection", "error_markers",
+                 "error_url", "username_pattern", "tags", "headers")
+
+    def __init__(self, name: str, url: str, detection: str = "status_code",
+                 error_msg: Any = None, error_url: Optional[str] = None,
+                 probe_url: Optional[str] = None, regex: Optional[str] = None,
+                 tags: Iterable[str] = (), url_main: Optional[str] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        if "{}" not in url:
+            raise ValueError(f"{name}: url has no '{{}}' username placeholder")
+        if detection not in DETECTION_METHODS:
+            raise ValueError(f"{name}: unknown errorType {detection!r}")
+        if detection == "message" and not error_msg:
+            raise ValueError(f"{name}: errorType 'message' needs errorMsg")
+
+        self.name = name
+        self.url = UrlTemplate(url)
+        self.probe_url = UrlTemplate(probe_url) if probe_url else self.url
+        self.host = urlsplit(self.probe_url.template.replace("{}", "x")).hostname or ""
+        self.url_main = url_main or f"https://{self.host}/"
+        self.detection = detection
+        messages = [error_msg] if isinstance(error_msg, str) else list(error_msg or ())
+        self.error_markers = tuple(message.encode("utf-8") for message in messages)
+        self.error_url = UrlTemplate(error_url) if error_url else None
+        self.username_pattern = re.compile(regex) if regex else None
+        self.tags = frozenset(tag.lower() for tag in tags)
+        self.headers = headers or None
+
+    @classmethod
+    def from_entry(cls, name: str, entry: Dict[str, Any]) -> "Platform":
+        """Build from a data file entry (Sherlock data.json keys)"""
+        return cls(
+            name,
+            entry["url"],
+            detection=entry.get("errorType", "status_code"),
+            error_msg=entry.get("errorMsg"),
+            error_url=entry.get("errorUrl"),
+            probe_url=entry.get("urlProbe"),
+            regex=entry.get("regexCheck"),
+            tags=entry.get("tags", ()),
+            url_main=entry.get("urlMain"),
+            headers=entry.get("headers"),
+        )
+
+    def accepts(self, username: str) -> bool:
+        """False when the site's username rules rule this name out (no request needed)"""
+        return self.username_pattern is None or self.username_pattern.search(username) is not None
+
+    def url_for(self, username: str) -> str:
+        """Profile URL shown in findings"""
+        return self.url.format(username)
+
+    def probe_url_for(self, username: str) -> str:
+        """URL actually requested (urlProbe, else the profile URL)"""
+        return self.probe_url.format(username)
+
+    def exists(self, response: Any, username: str) -> bool:
+        """Apply the detection rule to a probe response (see http_pool.ProbeResponse)"""
+        if not 200 <= response.status_code < 400:
+            return False
+        if self.detection == "message":
+            return not any(marker in response.body for marker in self.error_markers)
+        if self.detection == "response_url":
+            if self.error_url is not None:
+                return str(response.url).rstrip("/") != self.error_url.format(username).rstrip("/")
+            return not response.history
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "url": self.url.template,
+            "url_main": self.url_main,
+            "detection": self.detection,
+            "tags": sorted(self.tags),
+        }
+
+
+class PlatformRegistry:
+    """Platforms by name and tag, loaded from the data file"""
+
+    def __init__(self, platforms: Iterable[Platform]):
+        self.platforms: List[Platform] = list(platforms)
+        self._by_name = {platform.name.lower(): platform for platform in self.platforms}
+        # Looser lookup, so names saved before a site was renamed in the data file still resolve
+        self._by_key: Dict[str, Platform] = {}
+        for platform in self.platforms:
+            self._by_key.setdefault(_name_key(platform.name), platform)
+
+    @classmethod
+    def load(cls, path: str = APIConfig.PLATFORMS_FILE) -> "PlatformRegistry":
+        """Read a data file; malformed entries are logged and skipped"""
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+
+        platforms = []
+        for name, entry in entries.items():
+            if name.startswith("$"):
+                continue  # "$schema" and other metadata keys
+            try:
+                platforms.append(Platform.from_entry(name, entry))
+            except (KeyError, TypeError, ValueError, re.error) as e:
+                logger.warning(f"Skipping platform {name!r} in {path}: {str(e)}")
+        logger.info(f"Loaded {len(platforms)} platform(s) from {path}")
+        return cls(platforms)
+
+    def __len__(self) -> int:
+        return len(self.platforms)
+
+    def get(self, name: str) -> Optional[Platform]:
+        """Case-insensitive; spacing and punctuation are ignored if there is no exact match"""
+        return self._by_name.get(name.lower()) or self._by_key.get(_name_key(name))
+
+    def tags(self) -> Dict[str, int]:
+        """Tag -> number of platforms carrying it"""
+        counts = Counter(tag for platform in self.platforms for tag in platform.tags)
+        return dict(sorted(counts.items()))
+
+    def select(self, tags: Optional[Iterable[str]] = None,
+               names: Optional[Iterable[str]] = None) -> List[Platform]:
+        """Platforms with any of tags and/or in names (both None = all)"""
+        if tags is None and names is None:
+            return list(self.platforms)
+        wanted_tags = {tag.lower() for tag in tags or ()}
+        wanted_names = {name.lower() for name in names or ()}
+        return [
+            platform for platform in self.platforms
+            if platform.tags & wanted_tags or platform.name.lower() in wanted_names
+        ]
+
+
+# Initialize registry singleton (loaded once at import)
+platform_registry = PlatformRegistry.load()
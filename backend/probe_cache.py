@@ -0,0 +1,210 @@
+"""
+probe_cache.py
+
+Time-bounded cache of per-platform username probe results.
+Keyed on (platform, username). Found profiles and definite "not found"
+answers get separate TTLs. Failed probes (timeouts, connection errors)
+are never cached.
+Two tiers: an in-process LRU, and an optional SQLite file that
+survives restarts (PROBE_CACHE_DB).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import APIConfig
+from shared_state import after_fork
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeCache:
+    """Two-tier (memory LRU + optional SQLite) cache of platform probe results"""
+
+    def __init__(self, ttl: float = APIConfig.PROBE_CACHE_TTL,
+                 negative_ttl: float = APIConfig.PROBE_CACHE_NEGATIVE_TTL,
+                 max_entries: int = APIConfig.PROBE_CACHE_SIZE,
+                 db_file: Optional[str] = APIConfig.PROBE_CACHE_DB or None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.db_file = db_file
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Optional[dict]]]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        # A parent process's connection, inherited by fork and deliberately never used or closed
+        self._abandoned: Optional[sqlite3.Connection] = None
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+        after_fork(self, "_reset_after_fork")
+
+    def _reset_after_fork(self):
+        """Forked child: reopen the disk tier instead of sharing the parent's connection"""
+        self._lock = threading.Lock()
+        # Kept referenced rather than closed: closing (or garbage-collecting) the
+        # inherited handle in the child would release SQLite locks and file
+        # descriptors the parent still holds on the same database
+        self._abandoned = self._conn
+        self._conn = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and (self.ttl > 0 or self.negative_ttl > 0)
+
+    # ── Disk tier ──
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        """Open the SQLite tier on first use (caller holds the lock)"""
+        if not self.db_file:
+            return None
+        if self._conn is None:
+            try:
+                conn = sqlite3.connect(self.db_file, timeout=APIConfig.DB_BUSY_TIMEOUT, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS probe_cache (
+                        platform TEXT NOT NULL,
+                        username TEXT NOT NULL,
+                        result TEXT,
+                        expires_at REAL NOT NULL,
+                        PRIMARY KEY (platform, username)
+                    )
+                """)
+                conn.commit()
+                self._conn = conn
+            except Exception as e:
+                logger.warning(f"Probe cache disk tier disabled: {str(e)}")
+                self.db_file = None
+                return None
+        return self._conn
+
+    def _disk_get(self, key: Tuple[str, str], now: float) -> Tuple[bool, Optional[dict], float]:
+        conn = self._disk()
+        if conn is None:
+            return False, None, 0.0
+        try:
+            row = conn.execute(
+                "SELECT result, expires_at FROM probe_cache WHERE platform = ? AND username = ?", key
+            ).fetchone()
+        except Exception as e:
+            logger.debug(f"Probe cache read error: {str(e)}")
+            return False, None, 0.0
+        if not row or row[1] <= now:
+            return False, None, 0.0
+        return True, json.loads(row[0]) if row[0] else None, row[1]
+
+    def _disk_set(self, key: Tuple[str, str], result: Optional[dict], expires_at: float):
+        conn = self._disk()
+        if conn is None:
+            return
+        try:
+            conn.execute("""
+                INSERT OR REPLACE INTO probe_cache (platform, username, result, expires_at) VALUES (?, ?, ?, ?)
+            """, (*key, json.dumps(result) if result else None, expires_at))
+            conn.commit()
+        except Exception as e:
+            logger.debug(f"Probe cache write error: {str(e)}")
+
+    # ── Public API ──
+    def get(self, platform: str, username: str) -> Tuple[bool, Optional[dict]]:
+        """
+        Look up a probe result.
+        Returns (hit, result); result is None for a cached "not found".
+        """
+        if not self.enabled:
+            return False, None
+        key = (platform, username)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["negative_hits"] += result is None
+                    return True, dict(result) if result else None
+                del self._entries[key]
+                self._stats["expired"] += 1
+
+            hit, result, expires_at = self._disk_get(key, now)
+            if hit:
+                self._remember(key, result, expires_at)
+                self._stats["disk_hits"] += 1
+                self._stats["negative_hits"] += result is None
+                return True, dict(result) if result else None
+
+            self._stats["misses"] += 1
+            return False, None
+
+    def set(self, platform: str, username: str, result: Optional[dict], ttl: Optional[float] = None):
+        """Cache a definite probe answer (a finding dict, or None for not found); ttl overrides the default"""
+        if ttl is None:
+            ttl = self.ttl if result else self.negative_ttl
+        if not self.enabled or ttl <= 0:
+            return
+        key = (platform, username)
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, dict(result) if result else None, expires_at)
+            self._disk_set(key, result, expires_at)
+            self._stats["stores"] += 1
+
+    def _remember(self, key: Tuple[str, str], result: Optional[dict], expires_at: float):
+        self._entries[key] = (expires_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, username: str):
+        """Drop every cached probe for a username"""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == username]:
+                del self._entries[key]
+            conn = self._disk()
+            if conn is not None:
+                conn.execute("DELETE FROM probe_cache WHERE username = ?", (username,))
+                conn.commit()
+
+    def clear(self):
+        """Empty both tiers"""
+        with self._lock:
+            self._entries.clear()
+            conn = self._disk()
+            if conn is not None:
+                conn.execute("DELETE FROM probe_cache")
+                conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        stats["disk_tier"] = bool(self.db_file)
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Initialize cache singleton
+probe_cache = ProbeCache()
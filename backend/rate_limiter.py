@@ -0,0 +1,290 @@
+"""
+rate_limiter.py
+
+Shared per-host rate limiting for outbound scan traffic.
+Every host gets a token bucket. The refill rate backs off when the host
+throttles us (429/503) and recovers gradually as responses succeed.
+Retry-After is honored; without it the host pauses for a jittered
+exponential backoff. After repeated failures a circuit breaker stops
+traffic to the host for a cooldown.
+One process-wide instance is shared by sherlock_scan probes (async) and
+DeepScanService API calls (worker threads), so concurrent scans
+coordinate instead of each backing off on its own.
+In multi-worker deployments the buckets, pauses and open circuits live
+in SharedState, so every worker process draws from the same budget.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from config import APIConfig
+from shared_state import SharedState, shared_state
+
+logger = logging.getLogger(__name__)
+
+# Status codes meaning "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+
+class RateLimitError(Exception):
+    """A request was not allowed to go out"""
+
+
+class CircuitOpenError(RateLimitError):
+    """The host's circuit breaker is open"""
+
+
+class RateLimitExceeded(RateLimitError):
+    """The wait for a token would exceed the caller's limit"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header (delta-seconds or HTTP-date) to seconds from now"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class HostLimiter:
+    """Token bucket, throttle pause and circuit breaker state for one host"""
+
+    def __init__(self, host: str, rate: float, burst: float):
+        self.host = host
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.state = "closed"  # closed | open | half_open
+        self.open_until = 0.0
+        self.half_open_probe = False
+        self.metrics = {
+            "requests": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "throttled": 0,
+            "failures": 0,
+            "rejected": 0,
+            "trips": 0,
+        }
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RateLimiter:
+    """Per-host token buckets with Retry-After, backoff and circuit breaking"""
+
+    def __init__(self, rate: float = APIConfig.RATE_LIMIT_RPS, burst: float = APIConfig.RATE_LIMIT_BURST,
+                 host_rates: Optional[Dict[str, float]] = None,
+                 max_wait: float = APIConfig.RATE_LIMIT_MAX_WAIT,
+                 failure_threshold: int = APIConfig.CIRCUIT_FAILURE_THRESHOLD,
+                 cooldown: float = APIConfig.CIRCUIT_COOLDOWN,
+                 backoff_base: float = APIConfig.BACKOFF_BASE,
+                 backoff_max: float = APIConfig.BACKOFF_MAX,
+                 shared: Optional[SharedState] = None):
+        self.rate = rate
+        self.burst = burst
+        self.host_rates = host_rates if host_rates is not None else APIConfig.RATE_LIMIT_HOSTS
+        self.max_wait = max_wait
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.shared = shared
+
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, HostLimiter] = {}
+
+    @staticmethod
+    def host_for(url: str) -> str:
+        return urlsplit(url).hostname or url
+
+    def _host(self, host: str) -> HostLimiter:
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            if host in self.host_rates:
+                # Explicitly limited hosts (metered APIs) get a burst of one second's worth
+                rate = self.host_rates[host]
+                limiter = HostLimiter(host, rate, max(1.0, rate))
+            else:
+                limiter = HostLimiter(host, self.rate, self.burst)
+            self._hosts[host] = limiter
+        return limiter
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for retry attempt n (0-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # ── Admission ──
+    def reserve(self, url: str, max_wait: Optional[float] = None) -> float:
+        """
+        Take a token for url's host and return how long to wait before sending.
+        Raises CircuitOpenError or RateLimitExceeded instead of granting.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        now = time.monotonic()
+        with self._lock:
+            h = self._host(self.host_for(url))
+
+            if h.state == "open":
+                if now < h.open_until:
+                    h.metrics["rejected"] += 1
+                    raise CircuitOpenError(f"Circuit open for {h.host}")
+                h.state = "half_open"
+                h.half_open_probe = False
+            if h.state == "half_open":
+                if h.half_open_probe:
+                    h.metrics["rejected"] += 1
+                    raise CircuitOpenError(f"Circuit half-open for {h.host}; probe in flight")
+                h.half_open_probe = True
+
+            if self.shared is None:
+                h.refill(now)
+                h.tokens -= 1
+                wait = max(h.blocked_until - now, -h.tokens / h.rate if h.tokens < 0 else 0.0)
+                if wait > max_wait:
+                    h.tokens += 1
+                    return self._reject(h, RateLimitExceeded(f"Rate limit wait for {h.host} is {wait:.1f}s"))
+                return self._grant(h, wait)
+
+        # Shared bucket: the SQLite transaction runs outside the process lock
+        try:
+            wait, open_for = self.shared.take_token(h.host, h.max_rate, h.burst, max_wait)
+        except Exception:
+            with self._lock:
+                h.half_open_probe = False
+            raise
+        with self._lock:
+            if open_for > 0:
+                # Another worker tripped the breaker
+                h.state, h.open_until = "open", now + open_for
+                return self._reject(h, CircuitOpenError(f"Circuit open for {h.host}"))
+            if wait > max_wait:
+                return self._reject(h, RateLimitExceeded(f"Rate limit wait for {h.host} is {wait:.1f}s"))
+            return self._grant(h, wait)
+
+    @staticmethod
+    def _grant(h: HostLimiter, wait: float) -> float:
+        h.metrics["requests"] += 1
+        if wait > 0:
+            h.metrics["waits"] += 1
+            h.metrics["wait_seconds"] += wait
+        return wait
+
+    @staticmethod
+    def _reject(h: HostLimiter, error: RateLimitError):
+        h.half_open_probe = False
+        h.metrics["rejected"] += 1
+        raise error
+
+    def acquire(self, url: str, max_wait: Optional[float] = None):
+        """Block the calling thread until a request to url may be sent"""
+        wait = self.reserve(url, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, url: str, max_wait: Optional[float] = None):
+        """Async version of acquire"""
+        if self.shared is not None:
+            # The shared bucket is a SQLite transaction; keep it off the event loop
+            wait = await asyncio.to_thread(self.reserve, url, max_wait)
+        else:
+            wait = self.reserve(url, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    # ── Feedback ──
+    def record(self, url: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        """
+        Report the outcome of a request that went out.
+        status_code None means a transport error. Throttle statuses pause
+        the host and halve its rate; successes restore it gradually.
+        """
+        now = time.monotonic()
+        tripped = False
+        with self._lock:
+            h = self._host(self.host_for(url))
+            throttled = status_code in THROTTLE_STATUSES
+            failed = status_code is None or status_code >= 500 or throttled
+
+            if throttled:
+                h.metrics["throttled"] += 1
+                h.rate = max(h.max_rate / 16, h.rate / 2)
+                pause = retry_after if retry_after is not None else self.backoff(h.failures)
+                h.blocked_until = max(h.blocked_until, now + pause)
+                logger.info(f"{h.host} throttled ({status_code}); pausing {pause:.1f}s, rate {h.rate:.2f}/s")
+
+            if failed:
+                h.failures += 1
+                h.metrics["failures"] += 1
+                if h.state == "half_open" or h.failures >= self.failure_threshold:
+                    if h.state != "open":
+                        h.metrics["trips"] += 1
+                        tripped = True
+                        logger.warning(f"Circuit opened for {h.host} after {h.failures} failure(s)")
+                    h.state = "open"
+                    h.open_until = now + max(self.cooldown, h.blocked_until - now)
+            else:
+                h.failures = 0
+                h.rate = min(h.max_rate, h.rate + h.max_rate / 10)
+                if h.state != "closed":
+                    logger.info(f"Circuit closed for {h.host}")
+                h.state = "closed"
+            h.half_open_probe = False
+
+        if self.shared is not None:
+            try:
+                if throttled:
+                    self.shared.throttle_host(h.host, pause, h.max_rate / 16)
+                if tripped:
+                    self.shared.open_circuit(h.host, h.open_until - now)
+                if not failed:
+                    self.shared.recover_host(h.host, h.max_rate)
+            except Exception as e:
+                logger.debug(f"Shared rate-limit update failed for {h.host}: {str(e)}")
+
+    def release(self, url: str):
+        """Give up a granted slot without an outcome (e.g. the caller was cancelled)"""
+        with self._lock:
+            h = self._hosts.get(self.host_for(url))
+            if h is not None:
+                h.half_open_probe = False
+
+    # ── Metrics ──
+    def metrics(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            hosts = {}
+            for host, h in self._hosts.items():
+                h.refill(now)
+                hosts[host] = {
+                    "state": h.state,
+                    "tokens": round(h.tokens, 2),
+                    "rate": round(h.rate, 3),
+                    "max_rate": h.max_rate,
+                    "paused_for": round(max(0.0, h.blocked_until - now), 2),
+                    **{k: round(v, 3) if isinstance(v, float) else v for k, v in h.metrics.items()},
+                }
+        return {"hosts": hosts, "shared": self.shared is not None}
+
+
+# Initialize limiter singleton (shared across workers when SHARED_STATE_DB is set)
+rate_limiter = RateLimiter(shared=shared_state)
@@ -0,0 +1,156 @@
+"""
+scan_plan.py
+
+Turns a case's filters into the work a scan will actually do.
+Supported filters (stored with the case by create_investigation):
+- platforms: platform names and/or "category:<tag>" selectors; only
+  these are probed (default: every platform in the registry)
+- exclude_platforms: names/selectors removed from that selection
+- sources: deep-scan sources to call (leaks, mentions, breaches, devices;
+  default: all of them)
+- exclude_sources: sources removed from that selection
+- scan_depth: "deep" (default) or "light"; a light-depth case runs no
+  API sources, even in a deep scan
+Other filter keys are left alone. The plan's request count is an upper
+bound: cached probes and API responses are not sent again, and retries
+are not counted.
+Unknown platforms and categories are rejected when a case is created
+(strict); when a scan is planned from a stored case they are logged and
+ignored, since older cases may name sites the registry no longer has.
+If that leaves none of a case's platforms, every platform is scanned.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import APIConfig
+from platforms import Platform, PlatformRegistry, platform_registry
+
+logger = logging.getLogger(__name__)
+
+SCAN_DEPTHS = ("light", "deep")
+CATEGORY_PREFIX = "category:"
+
+# Deep-scan source -> (APIConfig flag it needs to call out, upstream requests per call).
+# A source whose API isn't configured returns sample data without a request.
+SOURCES = {
+    "leaks": ("INTELLIGENCEX_ENABLED", 1),
+    "mentions": (None, 2),  # GitHub search + DuckDuckGo, no key needed
+    "breaches": ("HIBP_ENABLED", 1),
+    "devices": ("SHODAN_ENABLED", 1),
+}
+
+
+class ScanPlan:
+    """Platforms and sources one scan will run, and the requests that takes"""
+
+    def __init__(self, scan_type: str, depth: str, platforms: List[Platform],
+                 sources: List[str], probes: int):
+        self.scan_type = scan_type
+        self.depth = depth
+        self.platforms = platforms
+        self.sources = sources
+        self.probes = probes
+        self.api_requests = sum(
+            count for flag, count in (SOURCES[source] for source in sources)
+            if flag is None or getattr(APIConfig, flag)
+        )
+
+    @property
+    def requests(self) -> int:
+        return self.probes + self.api_requests
+
+    def summary(self) -> Dict[str, Any]:
+        """Payload of the scan's "plan" event"""
+        return {
+            "scan_type": self.scan_type,
+            "depth": self.depth,
+            "platforms": len(self.platforms),
+            "sources": list(self.sources),
+            "requests": {
+                "probes": self.probes,
+                "api": self.api_requests,
+                "total": self.requests,
+            },
+        }
+
+
+def _string_list(filters: Dict[str, Any], key: str) -> List[str]:
+    value = filters.get(key) or []
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"Filter '{key}' must be a list of strings")
+    return [item.strip() for item in value if item.strip()]
+
+
+def _resolve_platforms(selectors: Iterable[str], registry: PlatformRegistry, key: str,
+                       strict: bool = True) -> List[Platform]:
+    """
+    Platforms matched by names and category:<tag> selectors.
+    Unknown ones raise ValueError, or are logged and dropped unless strict.
+    """
+    names, tags, unknown = [], [], []
+    known_tags = registry.tags()
+    for selector in selectors:
+        if selector.lower().startswith(CATEGORY_PREFIX):
+            tag = selector[len(CATEGORY_PREFIX):].strip().lower()
+            if tag in known_tags:
+                tags.append(tag)
+            else:
+                unknown.append(selector)
+        else:
+            platform = registry.get(selector)
+            if platform:
+                names.append(platform.name)
+            else:
+                unknown.append(selector)
+    if unknown:
+        if strict:
+            raise ValueError(f"Unknown platform(s) or categories in '{key}': {', '.join(unknown)}")
+        logger.warning(f"Ignoring unknown platform(s) or categories in '{key}': {', '.join(unknown)}")
+    return registry.select(tags=tags, names=names)
+
+
+def plan_scan(scan_type: str, filters: Optional[Dict[str, Any]], username: str,
+              email: Optional[str] = None, registry: PlatformRegistry = platform_registry,
+              strict: bool = True) -> ScanPlan:
+    """
+    Plan a light or deep scan of username under a case's filters; bad filters raise ValueError.
+    With strict=False (stored filters) unknown platforms and categories are ignored instead.
+    """
+    filters = filters or {}
+
+    depth = str(filters.get("scan_depth") or "deep").lower()
+    if depth not in SCAN_DEPTHS:
+        raise ValueError(f"Filter 'scan_depth' must be one of: {', '.join(SCAN_DEPTHS)}")
+
+    included = _string_list(filters, "platforms")
+    platforms = _resolve_platforms(included, registry, "platforms", strict) if included else list(registry.platforms)
+    if included and not platforms:
+        # Every selected site is gone from the registry; an empty scan would read as "nothing found"
+        logger.warning(f"None of the platforms in 'platforms' are registered; scanning all {len(registry)} instead")
+        platforms = list(registry.platforms)
+    excluded = _string_list(filters, "exclude_platforms")
+    if excluded:
+        dropped = {platform.name for platform in _resolve_platforms(excluded, registry, "exclude_platforms", strict)}
+        platforms = [platform for platform in platforms if platform.name not in dropped]
+
+    selected_sources = _string_list(filters, "sources")
+    excluded_sources = set(_string_list(filters, "exclude_sources"))
+    unknown = [source for source in [*selected_sources, *excluded_sources] if source not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s): {', '.join(unknown)} (expected: {', '.join(SOURCES)})")
+
+    sources = []
+    if scan_type == "deep" and depth == "deep":
+        sources = [
+            source for source in SOURCES
+            if (not selected_sources or source in selected_sources)
+            and source not in excluded_sources
+            and (source != "breaches" or email)  # HIBP is looked up by email
+        ]
+
+    # Names a site's username rules reject are answered without a request
+    probes = sum(1 for platform in platforms if platform.accepts(username))
+    return ScanPlan(scan_type, depth, platforms, sources, probes)
@@ -0,0 +1,184 @@
+"""
+shared_state.py
+
+Cross-process state for multi-worker deployments (WEB_WORKERS > 1).
+One SQLite file (SHARED_STATE_DB) is shared by every worker on the host:
+- shared_cache: TTL'd JSON entries (the API response cache's second tier)
+- host_limits: per-host token buckets, adaptive rates, throttle pauses
+  and open circuits, so rate limits hold for the host as a whole rather
+  than once per worker
+Single-process deployments leave SHARED_STATE_DB unset and keep all of
+this in memory.
+Also provides after_fork(), which process-wide singletons use to drop
+inherited connections, threads and locks in a forked worker.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+import logging
+from typing import Any, Optional, Tuple
+
+from config import APIConfig
+
+logger = logging.getLogger(__name__)
+
+
+def after_fork(instance: Any, method: str):
+    """
+    Call instance.<method>() in the child after os.fork().
+    Used by singletons that hold connections, threads or pools, so a
+    pre-forking server (gunicorn --preload) gives every worker fresh ones.
+    Holds only a weak reference to the instance.
+    """
+    if not hasattr(os, "register_at_fork"):
+        return
+    ref = weakref.ref(instance)
+
+    def _reinit():
+        target = ref()
+        if target is not None:
+            getattr(target, method)()
+
+    os.register_at_fork(after_in_child=_reinit)
+
+
+class SharedState:
+    """SQLite-backed cache entries and rate-limit buckets shared across worker processes"""
+
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._abandoned = []
+        self._init_schema()
+        after_fork(self, "_reset_after_fork")
+
+    def _reset_after_fork(self):
+        # Never close a connection inherited from the parent; just stop using it
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._abandoned.append(conn)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection (autocommit; transactions are explicit)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=APIConfig.DB_BUSY_TIMEOUT,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS shared_cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS host_limits (
+                host TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                rate REAL NOT NULL,
+                blocked_until REAL DEFAULT 0,
+                open_until REAL DEFAULT 0
+            )
+        """)
+
+    # ── Cache entries ──
+    def cache_get(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, expires_at wall time) for a live entry, else None"""
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM shared_cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time())
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def cache_set(self, namespace: str, key: str, value: Any, ttl: float):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO shared_cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, default=str), time.time() + ttl)
+        )
+
+    def cache_delete(self, namespace: Optional[str] = None, prefix: bool = False):
+        """Drop entries in a namespace (namespaces starting with it when prefix; all when None)"""
+        conn = self._conn()
+        if namespace is None:
+            conn.execute("DELETE FROM shared_cache")
+        elif prefix:
+            conn.execute("DELETE FROM shared_cache WHERE substr(namespace, 1, ?) = ?", (len(namespace), namespace))
+        else:
+            conn.execute("DELETE FROM shared_cache WHERE namespace = ?", (namespace,))
+
+    def purge_expired(self) -> int:
+        return self._conn().execute("DELETE FROM shared_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    # ── Rate-limit buckets ──
+    def take_token(self, host: str, rate: float, burst: float, max_wait: float) -> Tuple[float, float]:
+        """
+        Take a token from the host's shared bucket.
+        Returns (wait, open_for). open_for > 0 means the circuit is open and
+        no token was taken; wait > max_wait means no token was taken either.
+        rate seeds a new bucket; after that the bucket keeps its own
+        (throttle-adjusted) rate.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated, rate, blocked_until, open_until FROM host_limits WHERE host = ?", (host,)
+            ).fetchone()
+            tokens, updated, bucket_rate, blocked_until, open_until = row or (burst, now, rate, 0.0, 0.0)
+            if open_until > now:
+                conn.execute("COMMIT")
+                return 0.0, open_until - now
+
+            tokens = min(burst, tokens + max(0.0, now - updated) * bucket_rate) - 1
+            wait = max(blocked_until - now, -tokens / bucket_rate if tokens < 0 else 0.0)
+            if wait > max_wait:
+                tokens += 1
+            conn.execute("""
+                INSERT INTO host_limits (host, tokens, updated, rate, blocked_until, open_until)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(host) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated
+            """, (host, tokens, now, bucket_rate, blocked_until, open_until))
+            conn.execute("COMMIT")
+            return wait, 0.0
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def throttle_host(self, host: str, pause: float, min_rate: float):
+        """Halve the host's rate (down to min_rate) and pause it for pause seconds"""
+        self._conn().execute("""
+            UPDATE host_limits SET rate = max(?, rate / 2), blocked_until = max(blocked_until, ?)
+            WHERE host = ?
+        """, (min_rate, time.time() + pause, host))
+
+    def open_circuit(self, host: str, cooldown: float):
+        self._conn().execute(
+            "UPDATE host_limits SET open_until = max(open_until, ?) WHERE host = ?", (time.time() + cooldown, host)
+        )
+
+    def recover_host(self, host: str, max_rate: float):
+        """Step the host's rate back toward max_rate and close its circuit"""
+        self._conn().execute("""
+            UPDATE host_limits SET rate = min(?, rate + ? / 10), open_until = 0
+            WHERE host = ? AND (rate < ? OR open_until > 0)
+        """, (max_rate, max_rate, host, max_rate))
+
+
+# Initialize shared state singleton (multi-worker deployments only)
+shared_state = SharedState(APIConfig.SHARED_STATE_DB) if APIConfig.SHARED_STATE_DB else None
@@ -3,134 +3,263 @@ sherlock_scan.py
 
 Sherlock-style username discovery across social platforms.
 Light, fast baseline investigation using GET requests (more reliable than HEAD).
+Probes share one pooled async HTTP client (see http_pool.py), and
+definite answers are cached per (platform, username) (see probe_cache.py).
+Every probe is admitted by the shared per-host rate limiter (see rate_limiter.py).
+A scan runs against a time budget (see deadline.py): probes are cut off
+when it runs out and the result lists the platforms that were skipped.
+Slow probes can be hedged with a duplicate request (see hedging.py).
+Sites and their detection rules come from the platform registry (see
+platforms.py); probes in flight are capped process-wide by the pool's
+probe slots, so a scan's cost grows with the registry's size divided by
+that cap rather than with the size alone.
+"Found" answers are checked against each platform's soft-404 baseline
+(see soft404.py), fetched in the background once per baseline TTL.
 """
 
-import requests
-from typing import Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import time
+import httpx
+from typing import Callable, Dict, List, Optional, Set
 import logging
 
+from config import APIConfig
+from deadline import Deadline, DeadlineExceeded
+from hedging import hedger
+from http_pool import http_pool, ProbeResponse
+from platforms import Platform, platform_registry
+from probe_cache import probe_cache
+from rate_limiter import rate_limiter, parse_retry_after, RateLimitError, RateLimitExceeded, THROTTLE_STATUSES
+from soft404 import Fingerprint, soft_404
+
 logger = logging.getLogger(__name__)
 
-# Social media platforms to check (from GhostTR reference)
-PLATFORMS = [
-    {"name": "Facebook", "url": "https://www.facebook.com/{}"},
-    {"name": "Twitter", "url": "https://www.twitter.com/{}"},
-    {"name": "Instagram", "url": "https://www.instagram.com/{}/"},
-    {"name": "LinkedIn", "url": "https://www.linkedin.com/in/{}/"},
-    {"name": "GitHub", "url": "https://www.github.com/{}"},
-    {"name": "Pinterest", "url": "https://www.pinterest.com/{}/"},
-    {"name": "Tumblr", "url": "https://{}.tumblr.com"},
-    {"name": "YouTube", "url": "https://www.youtube.com/@{}"},
-    {"name": "SoundCloud", "url": "https://soundcloud.com/{}"},
-    {"name": "Snapchat", "url": "https://www.snapchat.com/add/{}"},
-    {"name": "TikTok", "url": "https://www.tiktok.com/@{}"},
-    {"name": "Behance", "url": "https://www.behance.net/{}"},
-    {"name": "Medium", "url": "https://www.medium.com/@{}"},
-    {"name": "Quora", "url": "https://www.quora.com/profile/{}"},
-    {"name": "Flickr", "url": "https://www.flickr.com/people/{}"},
-    {"name": "Periscope", "url": "https://www.periscope.tv/{}"},
-    {"name": "Twitch", "url": "https://www.twitch.tv/{}"},
-    {"name": "Dribbble", "url": "https://www.dribbble.com/{}"},
-    {"name": "StumbleUpon", "url": "https://www.stumbleupon.com/stumbler/{}"},
-    {"name": "Ello", "url": "https://www.ello.co/{}"},
-    {"name": "Product Hunt", "url": "https://www.producthunt.com/@{}"},
-    {"name": "Telegram", "url": "https://www.telegram.me/{}"},
-    {"name": "WeHeartIt", "url": "https://www.weheartit.com/{}"},
-    {"name": "Reddit", "url": "https://www.reddit.com/user/{}"},
-]
-
-
-def check_username_on_platform(username: str, platform: dict, timeout: int = 6) -> Optional[dict]:
-    """
-    Check if username exists on a single platform using GET request.
-    Uses GET instead of HEAD for better compatibility with all platforms.
+# Progress callback: progress(event, payload), e.g. ("platform", {"platform": "GitHub", "found": True})
+ProgressCallback = Callable[[str, Dict], None]
+
+
+class ProbeSkipped(Exception):
+    """A probe got no answer, so the platform is unchecked rather than not found"""
+
+# Sites probed by light scans (data/platforms.json, see platforms.py)
+PLATFORMS: List[Platform] = platform_registry.platforms
+
+
+async def _admit_hedge(url: str) -> bool:
+    """A hedge only goes out if the host's rate limit allows it right now"""
+    try:
+        await rate_limiter.acquire_async(url, max_wait=0)
+        return True
+    except RateLimitError:
+        return False
+
+
+async def _request(platform: Platform, url: str, timeout: float, hedge: bool = True) -> ProbeResponse:
+    """One rate-limited probe request; the limiter is told how it went"""
+    # Never queue for a token longer than the probe itself may take
+    await rate_limiter.acquire_async(url, max_wait=timeout)
+    started = time.monotonic()
     
-    Args:
-        username: Username to search for
-        platform: Platform dict with 'name' and 'url'
-        timeout: Request timeout in seconds
+    def send():
+        # A hedge gets what is left of the probe's timeout, not a fresh one
+        return http_pool.probe(url, key=platform.name, headers=platform.headers,
+                               timeout=max(0.1, timeout - (time.monotonic() - started)))
     
-    Returns:
-        dict with platform info if found, None otherwise
-    """
     try:
-        url = platform["url"].format(username)
-        
-        # Use GET request with proper headers (more reliable than HEAD)
-        response = requests.get(
-            url,
-            allow_redirects=True,
-            timeout=timeout,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-            },
-            stream=True  # Stream to avoid downloading large content
-        )
-        
-        # Check for success status (200-399 range)
-        if 200 <= response.status_code < 400:
-            return {
-                "platform": platform["name"],
-                "url": url,
-                "found": True,
-                "status_code": response.status_code,
-            }
-        
-        return None
-        
-    except requests.exceptions.Timeout:
-        logger.debug(f"Timeout checking {platform['name']} for {username}")
-        return None
-    except requests.exceptions.ConnectionError:
-        logger.debug(f"Connection error checking {platform['name']}")
-        return None
-    except requests.exceptions.RequestException as e:
-        logger.debug(f"Request error on {platform['name']}: {str(e)}")
-        return None
+        # GET instead of HEAD for better compatibility with all platforms
+        if hedge:
+            response = await hedger.run(platform.name, send, admit=lambda: _admit_hedge(url))
+        else:
+            response = await send()
+    except httpx.TransportError:
+        rate_limiter.record(url, None)
+        raise
+    except BaseException:
+        rate_limiter.release(url)
+        raise
+    
+    rate_limiter.record(url, response.status_code, parse_retry_after(response.headers.get("retry-after")))
+    return response
+
+
+# ── Soft-404 baselines ──
+# Background baseline fetches, referenced until they finish
+_baseline_tasks: Set[asyncio.Task] = set()
+
+
+async def _fetch_baseline(platform: Platform, timeout: int = 6):
+    """Probe a random nonexistent username and store the response's fingerprint (see soft404.py)"""
+    baseline = None
+    try:
+        username = soft_404.random_username(platform)
+        if username is None:
+            logger.debug(f"No soft-404 baseline for {platform.name}: no random name fits its username rules")
+        else:
+            async with http_pool.probe_slots:
+                response = await _request(platform, platform.probe_url_for(username), timeout, hedge=False)
+            if response.status_code not in THROTTLE_STATUSES:
+                baseline = Fingerprint.of(response, username)
     except Exception as e:
-        logger.debug(f"Error checking {platform['name']}: {str(e)}")
-        return None
+        logger.debug(f"Soft-404 baseline for {platform.name} failed: {str(e)}")
+    finally:
+        soft_404.set_baseline(platform.name, baseline)
 
 
-def light_scan(username: str) -> dict:
-    """
-    Perform a light Sherlock-style scan.
-    Check username across social platforms in parallel using GET requests.
-    
-    Args:
-        username: Username to scan
+def _schedule_baseline(platform: Platform):
+    """Start a baseline fetch for platform if it has none or it expired (pool loop only)"""
+    if soft_404.claim_refresh(platform.name):
+        task = asyncio.ensure_future(_fetch_baseline(platform))
+        _baseline_tasks.add(task)
+        task.add_done_callback(_baseline_tasks.discard)
+
+
+async def _fetch_platform(username: str, platform: Platform, timeout: int = 6) -> Optional[dict]:
+    """Send one probe; raises on errors and throttling so failures are never cached"""
+    _schedule_baseline(platform)
+    response = await _request(platform, platform.probe_url_for(username), timeout)
+    if response.status_code in THROTTLE_STATUSES:
+        response.raise_for_status()
     
-    Returns:
-        dict with success status and discovered profiles
-    """
-    if not username or len(username.strip()) < 2:
+    # A "found" that looks like the platform's page for a nonexistent user is a soft 404
+    if platform.exists(response, username) and not soft_404.is_soft_404(platform.name, response, username):
         return {
-            "success": False,
-            "error": "Username must be at least 2 characters",
-            "data": None,
+            "platform": platform.name,
+            "url": platform.url_for(username),
+            "found": True,
+            "status_code": response.status_code,
+            "tags": sorted(platform.tags),
         }
     
-    username = username.strip()
+    return None
+
+
+async def _probe_platform(username: str, platform: Platform, timeout: int = 6,
+                          force_refresh: bool = False, deadline: Optional[Deadline] = None) -> Optional[dict]:
+    """
+    Probe one platform through the shared pool and probe cache (runs on the pool loop).
+    Names the site's username rules reject are answered without a request.
+    With a deadline the probe's timeout is cut to the scan's remaining
+    budget, and DeadlineExceeded is raised once that budget is gone (or
+    is too short to wait for the host's rate limit).
+    A probe that got no answer (rate limited, timeout, connection or
+    request error) raises ProbeSkipped: the platform wasn't checked.
+    """
+    if not platform.accepts(username):
+        return None
+    if not force_refresh:
+        hit, cached = probe_cache.get(platform.name, username)
+        if hit:
+            return cached
+    
+    cap = timeout
+    # Checked before the request: a baseline that lands mid-probe only makes this conservative
+    verified = soft_404.can_check(platform.name)
+    try:
+        # Timeouts start once a probe slot is free, not while queued for one
+        async with http_pool.probe_slots:
+            if deadline is not None:
+                timeout = deadline.timeout(timeout, f"probing {platform.name}")
+            result = await _fetch_platform(username, platform, timeout)
+    except DeadlineExceeded:
+        raise
+    except RateLimitError as e:
+        if isinstance(e, RateLimitExceeded) and timeout < cap:
+            # The wait would have fit the probe's timeout, just not the scan's budget
+            raise DeadlineExceeded(f"Scan deadline too close to wait for {platform.name}: {str(e)}") from e
+        logger.debug(f"Skipped {platform.name} for {username}: {str(e)}")
+        raise ProbeSkipped(f"rate limited: {str(e)}") from e
+    except httpx.TimeoutException as e:
+        if deadline is not None and deadline.exhausted():
+            raise DeadlineExceeded(f"Scan deadline reached while probing {platform.name}")
+        logger.debug(f"Timeout checking {platform.name} for {username}")
+        raise ProbeSkipped("timeout") from e
+    except httpx.TransportError as e:
+        logger.debug(f"Connection error checking {platform.name}")
+        raise ProbeSkipped(f"connection error: {str(e)}") from e
+    except httpx.HTTPError as e:
+        logger.debug(f"Request error on {platform.name}: {str(e)}")
+        raise ProbeSkipped(f"request error: {str(e)}") from e
+    except Exception as e:
+        logger.debug(f"Error checking {platform.name}: {str(e)}")
+        raise ProbeSkipped(f"error: {str(e)}") from e
+    
+    # A "found" nothing could check for a soft 404 yet is only kept as long as a "not found"
+    probe_cache.set(platform.name, username, result,
+                    ttl=None if verified or result is None else probe_cache.negative_ttl)
+    return result
+
+
+def notify_progress(progress: Optional[ProgressCallback], event: str, payload: Dict):
+    """Invoke a progress callback; a failing callback never fails the scan"""
+    if progress is None:
+        return
+    try:
+        progress(event, payload)
+    except Exception as e:
+        logger.debug(f"Progress callback error ({event}): {str(e)}")
+
+
+# Result of a probe that was cut off or got no answer; reported as skipped, not "not found"
+_SKIPPED = object()
+
+
+async def _probe_with_platform(username: str, platform: Platform, force_refresh: bool = False,
+                               deadline: Optional[Deadline] = None):
+    try:
+        return platform, await _probe_platform(username, platform, force_refresh=force_refresh, deadline=deadline)
+    except (DeadlineExceeded, ProbeSkipped):
+        return platform, _SKIPPED
+
+
+async def _run_light_scan(username: str, progress: Optional[ProgressCallback] = None,
+                          force_refresh: bool = False, deadline: Optional[Deadline] = None,
+                          platforms: Optional[List[Platform]] = None) -> dict:
+    """
+    Fan out all platform probes concurrently, up to the pool's probe slots (runs on the pool loop).
+    Probes still running at the deadline are cancelled and, like probes
+    that got no answer, reported as skipped.
+    A caller that passes platforms has planned the scan and sends the "plan" event itself.
+    """
     profiles = []
+    checked = set()
+    deadline = deadline or Deadline(APIConfig.LIGHT_SCAN_BUDGET)
+    if platforms is None:
+        platforms = PLATFORMS
+        notify_progress(progress, "plan", {"platforms": len(platforms)})
     
-    logger.info(f"Starting light scan for username: {username}")
+    logger.info(f"Starting light scan for username: {username} ({len(platforms)} platforms)")
     
-    # Check platforms in parallel with increased workers for better throughput
-    with ThreadPoolExecutor(max_workers=12) as executor:
-        futures = {
-            executor.submit(check_username_on_platform, username, platform): platform
-            for platform in PLATFORMS
-        }
-        
-        for future in as_completed(futures):
+    probes = [asyncio.ensure_future(_probe_with_platform(username, platform, force_refresh, deadline))
+              for platform in platforms]
+    try:
+        for next_done in asyncio.as_completed(probes, timeout=deadline.remaining()):
             try:
-                result = future.result()
+                platform, result = await next_done
+                if result is _SKIPPED:
+                    continue
+                checked.add(platform.name)
                 if result:
                     profiles.append(result)
                     logger.info(f"Found profile on {result['platform']}: {result['url']}")
+                notify_progress(progress, "platform", {
+                    "platform": platform.name,
+                    "found": bool(result),
+                    "finding": result,
+                })
+            except asyncio.TimeoutError:
+                # Scan deadline (DeadlineExceeded is a TimeoutError too); the rest are skipped
+                break
             except Exception as e:
                 logger.debug(f"Error processing result: {e}")
+    finally:
+        for probe in probes:
+            probe.cancel()
+    
+    skipped = [platform.name for platform in platforms if platform.name not in checked]
+    for name in skipped:
+        notify_progress(progress, "platform", {"platform": name, "found": False, "finding": None, "skipped": True})
+    if skipped:
+        logger.info(f"Light scan for {username} skipped {len(skipped)} platform(s) (deadline or no answer)")
     
     return {
         "success": True,
@@ -138,5 +267,83 @@ def light_scan(username: str) -> dict:
             "username": username,
             "findings": sorted(profiles, key=lambda x: x["platform"]),
             "count": len(profiles),
+            "partial": bool(skipped),
+            "skipped": {"platforms": skipped},
+            "deadline": deadline.report(),
         }
     }
+
+
+def _validate_username(username: str) -> Optional[dict]:
+    if not username or len(username.strip()) < 2:
+        return {
+            "success": False,
+            "error": "Username must be at least 2 characters",
+            "data": None,
+        }
+    return None
+
+
+async def check_username_on_platform_async(username: str, platform: Platform, timeout: int = 6,
+                                           force_refresh: bool = False) -> Optional[dict]:
+    """
+    Check if username exists on a single platform using GET request.
+    Uses GET instead of HEAD for better compatibility with all platforms.
+    
+    Args:
+        username: Username to search for
+        platform: Platform from the registry
+        timeout: Request timeout in seconds
+        force_refresh: Skip the probe cache and probe the platform again
+    
+    Returns:
+        dict with platform info if found, None otherwise
+    
+    Raises:
+        ProbeSkipped: the platform didn't answer (rate limited, timeout, connection error)
+    """
+    return await http_pool.run(_probe_platform(username, platform, timeout, force_refresh))
+
+
+def check_username_on_platform(username: str, platform: Platform, timeout: int = 6,
+                               force_refresh: bool = False) -> Optional[dict]:
+    """Blocking wrapper around check_username_on_platform_async (raises ProbeSkipped too)"""
+    return http_pool.run_sync(_probe_platform(username, platform, timeout, force_refresh))
+
+
+async def light_scan_async(username: str, progress: Optional[ProgressCallback] = None,
+                           force_refresh: bool = False, deadline: Optional[Deadline] = None,
+                           platforms: Optional[List[Platform]] = None) -> dict:
+    """
+    Perform a light Sherlock-style scan.
+    Check username across social platforms concurrently over the shared
+    keep-alive connection pool; safe to await from async endpoints.
+    
+    Args:
+        username: Username to scan
+        progress: Optional callback, invoked once per finished platform probe
+        force_refresh: Ignore cached probe results (fresh results are still cached)
+        deadline: Scan budget (default LIGHT_SCAN_BUDGET); the result is marked
+            partial, with the skipped platforms, if probes were cut off
+        platforms: Sites to probe (default: every registered platform; see scan_plan.py)
+    
+    Returns:
+        dict with success status and discovered profiles
+    """
+    invalid = _validate_username(username)
+    if invalid:
+        return invalid
+    return await http_pool.run(_run_light_scan(username.strip(), progress, force_refresh, deadline, platforms))
+
+
+def light_scan(username: str, progress: Optional[ProgressCallback] = None,
+               force_refresh: bool = False, deadline: Optional[Deadline] = None,
+               platforms: Optional[List[Platform]] = None) -> dict:
+    """
+    Blocking light scan for sync callers (e.g. deep scan worker threads).
+    Runs on the same shared pool and probe cache as light_scan_async.
+    """
+    invalid = _validate_username(username)
+    if invalid:
+        return invalid
+    return http_pool.run_sync(_run_light_scan(username.strip(), progress, force_refresh, deadline, platforms))
@@ -0,0 +1,199 @@
+"""
+soft404.py
+
+Soft-404 detection for platform probes.
+Many sites answer 200, or redirect to a login or search page, for
+usernames that don't exist. So for each platform a username that
+certainly doesn't exist (random letters) is probed now and then, and
+the response is fingerprinted:
+- status code
+- final URL, with the username in its path and query replaced by a
+  placeholder
+- a hash of the first SOFT404_FINGERPRINT_BYTES of the body, with the
+  username, numbers and hex tokens masked out
+- the body size
+A real probe that a platform's rule calls "found" is checked against
+that baseline. If the fingerprints match, it is a soft 404 and is
+reported as not found.
+The check reuses the bytes the probe already read, so it costs no
+request. Baselines cost one request per platform per
+SOFT404_BASELINE_TTL and are fetched in the background (see
+sherlock_scan.py). Until a platform has a baseline, its probes are
+classified by the platform's own rule alone.
+"""
+
+import hashlib
+import random
+import re
+import string
+import threading
+import time
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from urllib.parse import quote, urlsplit
+
+from config import APIConfig
+
+logger = logging.getLogger(__name__)
+
+# Numbers and hex runs (ids, nonces, timestamps) vary between page loads.
+# Anchoring each run on a digit keeps the scan cheap (~0.1ms per 16KiB);
+# a letter-led hex run keeps its letters, which rarely change alone.
+_VOLATILE = re.compile(rb"[0-9][0-9a-fA-F]*")
+
+# Only whole occurrences of the username are masked, so a short one ("co")
+# doesn't also hit hostnames, tags and words ("example.co", "<code>", "co-op").
+# Dots join words too ("co.uk"), except as punctuation ("No results for co.").
+_WORD = r"[A-Za-z0-9_\-]"
+_DOTTED = r"[A-Za-z0-9_]\."
+_DOT_WORD = r"\.[A-Za-z0-9_]"
+
+
+@lru_cache(maxsize=1024)
+def _whole_word(form: str, body: bool) -> "re.Pattern":
+    """Form standing alone, in the body (bytes, dot rules) or a URL; the literal leads so re scans for it fast"""
+    literal = re.escape(form)
+    pattern = f"{literal}(?<!{_WORD}{literal})(?!{_WORD})"
+    if body:
+        pattern += f"(?<!{_DOTTED}{literal})(?!{_DOT_WORD})"
+        return re.compile(pattern.encode("utf-8"))
+    return re.compile(pattern)
+
+
+class Fingerprint:
+    """What a probe response looked like, with the probed username masked out"""
+
+    __slots__ = ("status_code", "final_url", "digest", "size", "truncated")
+
+    def __init__(self, status_code: int, final_url: str, digest: bytes, size: int, truncated: bool):
+        self.status_code = status_code
+        self.final_url = final_url
+        self.digest = digest
+        self.size = size
+        self.truncated = truncated
+
+    @classmethod
+    def of(cls, response: Any, username: str,
+           window: int = APIConfig.SOFT404_FINGERPRINT_BYTES) -> "Fingerprint":
+        """Fingerprint a probe response (see http_pool.ProbeResponse) for username"""
+        forms = {username, username.lower(), quote(username, safe="")}
+        final_url = str(response.url).rstrip("/")
+        # The host is left alone; the username only appears in the path and query
+        parts = urlsplit(final_url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if final_url.startswith(origin):
+            path = final_url[len(origin):]
+            for form in forms:
+                path = _whole_word(form, body=False).sub("{}", path)
+            final_url = origin + path
+
+        # Mask before cutting the window, so usernames of different lengths see the same bytes.
+        # One pass per form: an alternation would lose re's fast literal scan.
+        body = response.body
+        for form in forms:
+            body = _whole_word(form, body=True).sub(b"{}", body)
+        body = _VOLATILE.sub(b"0", body[:window])
+        return cls(response.status_code, final_url, hashlib.blake2b(body, digest_size=16).digest(),
+                   len(response.body), response.truncated)
+
+    def matches(self, other: "Fingerprint", tolerance: float = APIConfig.SOFT404_SIZE_TOLERANCE) -> bool:
+        """Same status and final URL, and the same masked body or (both read in full) nearly the same size"""
+        if self.status_code != other.status_code or self.final_url != other.final_url:
+            return False
+        if self.digest == other.digest:
+            return True
+        if self.truncated or other.truncated:
+            return False
+        return abs(self.size - other.size) <= tolerance * max(self.size, other.size)
+
+
+class SoftNotFoundDetector:
+    """Per-platform negative baselines and the soft-404 check against them"""
+
+    def __init__(self, enabled: bool = APIConfig.SOFT404_ENABLED,
+                 ttl: float = APIConfig.SOFT404_BASELINE_TTL,
+                 retry_interval: float = APIConfig.SOFT404_RETRY_INTERVAL):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+
+        self._lock = threading.Lock()
+        # platform -> (expires_at, baseline); a None baseline marks a failed attempt
+        self._baselines: Dict[str, tuple] = {}
+        self._refreshing = set()
+        self._stats = {"checks": 0, "soft_404s": 0, "unchecked": 0, "baselines_fetched": 0, "baseline_failures": 0}
+
+    @staticmethod
+    def random_username(platform: Any) -> Optional[str]:
+        """A name no one has registered that the platform's username rules accept"""
+        for alphabet in (string.ascii_lowercase, string.ascii_lowercase + string.digits):
+            for length in (14, 10, 6):
+                candidate = "".join(random.choices(alphabet, k=length))
+                if platform.accepts(candidate):
+                    return candidate
+        # Some sites want first_last style names
+        candidate = "_".join("".join(random.choices(string.ascii_lowercase, k=7)) for _ in range(2))
+        return candidate if platform.accepts(candidate) else None
+
+    def claim_refresh(self, platform: str) -> bool:
+        """True if the caller should fetch a new baseline for platform now (at most one in flight)"""
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            entry = self._baselines.get(platform)
+            if platform in self._refreshing or (entry is not None and entry[0] > now):
+                return False
+            self._refreshing.add(platform)
+            return True
+
+    def set_baseline(self, platform: str, baseline: Optional[Fingerprint]):
+        """Store a fetched baseline; None records a failed attempt, retried after retry_interval"""
+        with self._lock:
+            self._refreshing.discard(platform)
+            if baseline is None:
+                self._stats["baseline_failures"] += 1
+                self._baselines[platform] = (time.monotonic() + self.retry_interval, None)
+            else:
+                self._stats["baselines_fetched"] += 1
+                self._baselines[platform] = (time.monotonic() + self.ttl, baseline)
+
+    def baseline(self, platform: str) -> Optional[Fingerprint]:
+        """Latest baseline (an expired one is still used until it is replaced)"""
+        with self._lock:
+            entry = self._baselines.get(platform)
+        return entry[1] if entry is not None else None
+
+    def can_check(self, platform: str) -> bool:
+        """Whether a "found" on platform is checked right now (trivially true when disabled)"""
+        return not self.enabled or self.baseline(platform) is not None
+
+    def is_soft_404(self, platform: str, response: Any, username: str) -> bool:
+        """Whether a response the platform's rule calls "found" looks like its missing-user page"""
+        if not self.enabled:
+            return False
+        baseline = self.baseline(platform)
+        with self._lock:
+            if baseline is None:
+                self._stats["unchecked"] += 1
+                return False
+            self._stats["checks"] += 1
+        # A different status settles it without hashing the body
+        soft = response.status_code == baseline.status_code and Fingerprint.of(response, username).matches(baseline)
+        if soft:
+            with self._lock:
+                self._stats["soft_404s"] += 1
+            logger.debug(f"Soft 404 on {platform} for {username}")
+        return soft
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["baselines"] = sum(1 for _, baseline in self._baselines.values() if baseline is not None)
+        stats["enabled"] = self.enabled
+        return stats
+
+
+# Initialize detector singleton (baselines are fetched by sherlock_scan on the pool loop)
+soft_404 = SoftNotFoundDetector()
@@ -0,0 +1,21 @@
+"""
+Shared pytest setup.
+Config is read at import, so the environment is pinned before any
+backend module loads: a throwaway investigations database and no
+shared-state or probe-cache files.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(0, str(BACKEND / "benchmarks"))
+
+_tmp = tempfile.mkdtemp(prefix="osint-tests-")
+os.environ["DB_FILE"] = os.path.join(_tmp, "investigations.db")
+os.environ["SHARED_STATE_DB"] = ""
+os.environ["PROBE_CACHE_DB"] = ""
+os.environ["WEB_WORKERS"] = "1"
@@ -0,0 +1,170 @@
+"""APIResponseCache and QuotaLedger against the local API stub (benchmarks/api_stub.py)"""
+
+import json
+import threading
+import time
+import urllib.request
+from datetime import date
+
+import pytest
+
+from api_cache import APIResponseCache, QuotaLedger, key_fingerprint
+from api_stub import APIStubServer
+from database import Database
+
+
+@pytest.fixture
+def stub():
+    server = APIStubServer(latency=0.05).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def database(tmp_path):
+    return Database(str(tmp_path / "ledger.db"))
+
+
+def shodan(stub, query):
+    """Upstream callable for a Shodan search on the stub"""
+    def call():
+        with urllib.request.urlopen(f"{stub.base_url}/shodan/host/search?query={query}", timeout=5) as response:
+            return json.loads(response.read())
+    return call
+
+
+def usage(database, source, api_key):
+    rows = database.get_api_usage(date.today().isoformat(), source=source, key_id=key_fingerprint(api_key))
+    return rows[0] if rows else None
+
+
+def test_hit_within_ttl_and_miss_after(stub):
+    cache = APIResponseCache(ttls={"shodan": 0.3})
+    url = f"{stub.base_url}/shodan/host/search"
+
+    first = cache.fetch("shodan", url, {"query": "nginx"}, shodan(stub, "nginx"))
+    second = cache.fetch("shodan", url, {"query": "nginx"}, shodan(stub, "nginx"))
+    assert first == second and first["total"] == 2
+    assert stub.requests["shodan"] == 1
+
+    time.sleep(0.35)
+    cache.fetch("shodan", url, {"query": "nginx"}, shodan(stub, "nginx"))
+    assert stub.requests["shodan"] == 2
+    counters = cache.stats()["sources"]["shodan"]
+    assert (counters["hits"], counters["misses"], counters["upstream"]) == (1, 2, 2)
+
+
+def test_key_ignores_credentials_but_not_query(stub):
+    cache = APIResponseCache(ttls={"shodan": 60})
+    url = f"{stub.base_url}/shodan/host/search"
+
+    cache.fetch("shodan", url, {"query": "a", "key": "one"}, shodan(stub, "a"))
+    cache.fetch("shodan", url, {"query": "a", "key": "two"}, shodan(stub, "a"))
+    cache.fetch("shodan", url, {"query": "b", "key": "one"}, shodan(stub, "b"))
+    assert stub.requests["shodan"] == 2
+
+
+def test_zero_ttl_and_force_refresh_bypass_cache(stub):
+    cache = APIResponseCache(ttls={"shodan": 60})
+    url = f"{stub.base_url}/shodan/host/search"
+
+    for _ in range(2):
+        cache.fetch("hibp", url, None, shodan(stub, "x"))
+    assert stub.requests["shodan"] == 2
+
+    cache.fetch("shodan", url, None, shodan(stub, "x"))
+    cache.fetch("shodan", url, None, shodan(stub, "x"), force_refresh=True)
+    assert stub.requests["shodan"] == 4
+
+
+def test_concurrent_identical_requests_are_coalesced(stub):
+    stub.latency = 0.3
+    cache = APIResponseCache(ttls={"shodan": 60})
+    url = f"{stub.base_url}/shodan/host/search"
+    start = threading.Barrier(8)
+    results = []
+
+    def one():
+        start.wait()
+        results.append(cache.fetch("shodan", url, {"query": "q"}, shodan(stub, "q")))
+
+    threads = [threading.Thread(target=one) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert stub.requests["shodan"] == 1
+    assert len(results) == 8 and all(result == results[0] for result in results)
+    counters = cache.stats()["sources"]["shodan"]
+    assert counters["misses"] + counters["hits"] + counters["coalesced"] == 8
+    assert counters["upstream"] == 1
+    assert cache.stats()["inflight"] == 0
+
+
+def test_failures_are_never_cached(stub):
+    cache = APIResponseCache(ttls={"shodan": 60})
+    url = f"{stub.base_url}/shodan/host/search"
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return None
+
+    assert cache.fetch("shodan", url, None, failing) is None
+    assert cache.fetch("shodan", url, None, failing) is None
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 0
+
+    assert cache.fetch("shodan", url, None, shodan(stub, "x"))["total"] == 2
+    assert cache.stats()["sources"]["shodan"]["failures"] == 2
+
+
+def test_ledger_counts_calls_hits_coalesced_and_failures(stub, database):
+    cache = APIResponseCache(QuotaLedger(database, daily_limits={}), ttls={"shodan": 60})
+    url = f"{stub.base_url}/shodan/host/search"
+
+    cache.fetch("shodan", url, {"query": "a"}, shodan(stub, "a"), api_key="k")
+    cache.fetch("shodan", url, {"query": "a"}, shodan(stub, "a"), api_key="k")
+    cache.fetch("shodan", url, {"query": "b"}, lambda: None, api_key="k")
+
+    row = usage(database, "shodan", "k")
+    assert (row["calls"], row["cache_hits"], row["failures"]) == (2, 1, 1)
+    assert usage(database, "shodan", "other") is None
+    assert row["key_id"] != "k"
+
+
+def test_ledger_stops_calls_at_daily_limit(stub, database):
+    ledger = QuotaLedger(database, daily_limits={"shodan": 2})
+    cache = APIResponseCache(ledger, ttls={"shodan": 0})
+    url = f"{stub.base_url}/shodan/host/search"
+
+    assert ledger.remaining("shodan", "k") == 2
+    results = [cache.fetch("shodan", url, None, shodan(stub, "x"), api_key="k") for _ in range(3)]
+    assert results[0] and results[1] and results[2] is None
+    assert stub.requests["shodan"] == 2
+    assert ledger.remaining("shodan", "k") == 0
+    assert cache.stats()["sources"]["shodan"]["quota_denied"] == 1
+
+    # Another key has its own budget; an unlimited source none at all
+    assert ledger.remaining("shodan", "k2") == 2
+    assert ledger.remaining("hibp", "k") is None
+
+
+def test_ledger_reserve_is_atomic_across_threads(database):
+    ledger = QuotaLedger(database, daily_limits={"hibp": 3})
+    granted = []
+    start = threading.Barrier(10)
+
+    def one():
+        start.wait()
+        granted.append(ledger.reserve("hibp", "k"))
+
+    threads = [threading.Thread(target=one) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert granted.count(True) == 3
+    assert usage(database, "hibp", "k")["calls"] == 3
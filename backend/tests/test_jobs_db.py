@@ -0,0 +1,95 @@
+"""Job queue persistence: in-flight dedupe, claiming and requeue after a restart"""
+
+import threading
+
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def database(tmp_path):
+    return Database(str(tmp_path / "jobs.db"))
+
+
+def test_enqueue_dedupes_in_flight_job_per_case_and_scan_type(database):
+    job, created = database.enqueue_job("j1", "case1", "sherlock", options={"depth": "quick"})
+    assert created and job["job_id"] == "j1" and job["state"] == "queued"
+    assert job["options"] == {"depth": "quick"}
+
+    again, created = database.enqueue_job("j2", "case1", "sherlock")
+    assert not created and again["job_id"] == "j1"
+    assert database.get_job("j2") is None
+
+    # Another scan type or case is its own job
+    assert database.enqueue_job("j3", "case1", "deep")[1]
+    assert database.enqueue_job("j4", "case2", "sherlock")[1]
+
+    # Once the first job has finished, the same scan can be queued again
+    database.claim_next_job("w")
+    database.finish_job("j1", "done")
+    job, created = database.enqueue_job("j5", "case1", "sherlock")
+    assert created and job["job_id"] == "j5"
+
+
+def test_claim_takes_highest_priority_then_oldest(database):
+    database.enqueue_job("low", "c1", "sherlock", priority=0)
+    database.enqueue_job("high", "c2", "sherlock", priority=5)
+    database.enqueue_job("low2", "c3", "sherlock", priority=0)
+
+    claimed = [database.claim_next_job("w1")["job_id"] for _ in range(3)]
+    assert claimed == ["high", "low", "low2"]
+    assert database.claim_next_job("w1") is None
+
+    job = database.get_job("high")
+    assert job["state"] == "running" and job["worker"] == "w1" and job["started_at"]
+
+
+def test_concurrent_claims_never_share_a_job(database):
+    for i in range(20):
+        database.enqueue_job(f"j{i}", f"case{i}", "sherlock")
+    claimed = []
+    lock = threading.Lock()
+
+    def worker(name):
+        while True:
+            job = database.claim_next_job(name)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["job_id"])
+
+    threads = [threading.Thread(target=worker, args=(f"w{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(f"j{i}" for i in range(20))
+
+
+def test_requeue_interrupted_jobs(database):
+    database.enqueue_job("a", "c1", "sherlock")
+    database.enqueue_job("b", "c2", "sherlock")
+    database.enqueue_job("c", "c3", "sherlock")
+    for _ in range(3):
+        database.claim_next_job("old")
+    database.finish_job("c", "failed", error="boom")
+
+    assert database.requeue_interrupted_jobs() == 2
+    for job_id in ("a", "b"):
+        job = database.get_job(job_id)
+        assert job["state"] == "queued" and job["worker"] is None and job["started_at"] is None
+    assert database.get_job("c")["state"] == "failed"
+
+
+def test_requeue_keeps_jobs_of_live_workers(database):
+    database.enqueue_job("mine", "c1", "sherlock")
+    database.enqueue_job("theirs", "c2", "sherlock")
+    database.claim_next_job("alive-worker")
+    database.claim_next_job("dead-worker")
+
+    assert database.requeue_interrupted_jobs(alive=lambda worker: worker == "alive-worker") == 1
+    assert database.get_job("mine")["state"] == "running"
+    assert database.get_job("theirs")["state"] == "queued"
+    assert database.requeue_interrupted_jobs(alive=lambda worker: True) == 0
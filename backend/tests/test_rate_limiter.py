@@ -0,0 +1,126 @@
+"""Per-host token buckets, Retry-After handling and the circuit breaker"""
+
+import time
+from email.utils import formatdate
+
+import pytest
+
+from rate_limiter import CircuitOpenError, RateLimitExceeded, RateLimiter, parse_retry_after
+
+URL = "https://example.com/user"
+
+
+def limiter(**kwargs):
+    options = dict(rate=10.0, burst=2.0, host_rates={}, max_wait=5.0, failure_threshold=3,
+                   cooldown=0.2, backoff_base=0.5, backoff_max=1.0)
+    options.update(kwargs)
+    return RateLimiter(**options)
+
+
+def test_burst_then_waits_at_refill_rate():
+    rl = limiter()
+    assert rl.reserve(URL) == 0
+    assert rl.reserve(URL) == 0
+    assert rl.reserve(URL) == pytest.approx(0.1, abs=0.02)
+    assert rl.reserve(URL) == pytest.approx(0.2, abs=0.02)
+    # Hosts don't share a bucket
+    assert rl.reserve("https://other.example.org/") == 0
+
+
+def test_host_rates_override_default():
+    rl = limiter(host_rates={"api.example.com": 1.0})
+    assert rl.reserve("https://api.example.com/v1") == pytest.approx(0, abs=0.01)
+    assert rl.reserve("https://api.example.com/v1") == pytest.approx(1.0, abs=0.02)
+
+
+def test_wait_beyond_max_wait_is_refused_without_spending_a_token():
+    rl = limiter(rate=1.0, burst=1.0)
+    rl.reserve(URL)
+    with pytest.raises(RateLimitExceeded):
+        rl.reserve(URL, max_wait=0.5)
+    # The refused request didn't queue behind itself
+    assert rl.reserve(URL, max_wait=2.0) == pytest.approx(1.0, abs=0.02)
+    assert rl.metrics()["hosts"]["example.com"]["rejected"] == 1
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("120", 120.0),
+    (" 2.5 ", 2.5),
+    ("-3", 0.0),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after(formatdate(time.time() + 60, usegmt=True)) == pytest.approx(60, abs=2)
+    assert parse_retry_after(formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+
+def test_retry_after_pauses_host_and_halves_rate():
+    rl = limiter(failure_threshold=10)
+    rl.record(URL, 429, retry_after=3.0)
+    assert rl.reserve(URL) == pytest.approx(3.0, abs=0.05)
+    with pytest.raises(RateLimitExceeded):
+        rl.reserve(URL, max_wait=1.0)
+    host = rl.metrics()["hosts"]["example.com"]
+    assert host["rate"] == 5.0 and host["throttled"] == 1
+
+    # Successes restore the rate gradually
+    rl.record(URL, 200)
+    assert rl.metrics()["hosts"]["example.com"]["rate"] == 6.0
+
+
+def test_throttle_without_retry_after_uses_bounded_backoff():
+    rl = limiter(failure_threshold=10)
+    rl.record(URL, 503)
+    assert 0 <= rl.metrics()["hosts"]["example.com"]["paused_for"] <= 0.5
+
+
+def test_circuit_opens_after_threshold_and_recovers_through_half_open():
+    rl = limiter()
+    for _ in range(3):
+        rl.reserve(URL)
+        rl.record(URL, None)
+    with pytest.raises(CircuitOpenError):
+        rl.reserve(URL)
+
+    time.sleep(0.25)
+    # Half-open: one probe goes out, others are refused until it reports back
+    rl.reserve(URL)
+    with pytest.raises(CircuitOpenError):
+        rl.reserve(URL)
+    rl.record(URL, 200)
+    assert rl.metrics()["hosts"]["example.com"]["state"] == "closed"
+    rl.reserve(URL)
+
+
+def test_failed_half_open_probe_reopens_circuit():
+    rl = limiter(failure_threshold=1)
+    rl.record(URL, 500)
+    time.sleep(0.25)
+    rl.reserve(URL)
+    rl.record(URL, 500)
+    host = rl.metrics()["hosts"]["example.com"]
+    assert host["state"] == "open" and host["trips"] == 2
+    with pytest.raises(CircuitOpenError):
+        rl.reserve(URL)
+
+
+def test_released_half_open_probe_lets_another_through():
+    rl = limiter(failure_threshold=1)
+    rl.record(URL, None)
+    time.sleep(0.25)
+    rl.reserve(URL)
+    rl.release(URL)
+    rl.reserve(URL)
+
+
+def test_success_resets_failure_count():
+    rl = limiter()
+    for status in (500, 500, 200, 500, 500):
+        rl.record(URL, status)
+    assert rl.metrics()["hosts"]["example.com"]["state"] == "closed"
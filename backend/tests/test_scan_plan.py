@@ -0,0 +1,94 @@
+"""plan_scan: platform and source filters, depth, and request counts"""
+
+import pytest
+
+from config import APIConfig
+from platforms import Platform, PlatformRegistry
+from scan_plan import SOURCES, plan_scan
+
+
+@pytest.fixture
+def registry():
+    return PlatformRegistry([
+        Platform("GitHub", "https://github.com/{}", tags=["coding"]),
+        Platform("GitLab", "https://gitlab.com/{}", tags=["coding"]),
+        Platform("Reddit", "https://www.reddit.com/user/{}", tags=["social"]),
+        Platform("Product Hunt", "https://www.producthunt.com/@{}", tags=["tech"]),
+        Platform("Shorty", "https://shorty.example/{}", regex=r"^[a-z]{1,4}$", tags=["social"]),
+    ])
+
+
+@pytest.fixture(autouse=True)
+def configured_apis(monkeypatch):
+    for flag, _ in SOURCES.values():
+        if flag:
+            monkeypatch.setattr(APIConfig, flag, True)
+
+
+def names(plan):
+    return [platform.name for platform in plan.platforms]
+
+
+def test_defaults_scan_everything(registry):
+    plan = plan_scan("deep", None, "alice", email="alice@example.com", registry=registry)
+    assert len(plan.platforms) == 5 and plan.depth == "deep"
+    assert plan.sources == list(SOURCES)
+    # Shorty's username rules reject "alice" without a request
+    assert plan.probes == 4
+    assert plan.summary()["requests"] == {"probes": 4, "api": 5, "total": 9}
+
+
+def test_names_and_categories_select_platforms(registry):
+    plan = plan_scan("light", {"platforms": ["reddit", "category:coding", "producthunt"]}, "bob", registry=registry)
+    assert names(plan) == ["GitHub", "GitLab", "Reddit", "Product Hunt"]
+    assert plan.sources == [] and plan.requests == 4
+
+
+def test_exclusions_apply_after_selection(registry):
+    filters = {"platforms": "category:coding", "exclude_platforms": ["GitLab"]}
+    assert names(plan_scan("light", filters, "bob", registry=registry)) == ["GitHub"]
+    filters = {"exclude_platforms": ["category:social"]}
+    assert names(plan_scan("light", filters, "bob", registry=registry)) == ["GitHub", "GitLab", "Product Hunt"]
+
+
+def test_source_filters_and_email(registry):
+    plan = plan_scan("deep", {"sources": ["leaks", "breaches", "mentions"], "exclude_sources": "mentions"},
+                     "bob", email="bob@example.com", registry=registry)
+    assert plan.sources == ["leaks", "breaches"]
+    # Breaches are looked up by email
+    assert plan_scan("deep", {}, "bob", registry=registry).sources == ["leaks", "mentions", "devices"]
+
+
+def test_unconfigured_sources_cost_no_request(registry, monkeypatch):
+    monkeypatch.setattr(APIConfig, "SHODAN_ENABLED", False)
+    plan = plan_scan("deep", {"sources": ["devices", "mentions"]}, "bob", registry=registry)
+    assert plan.sources == ["mentions", "devices"] and plan.api_requests == 2
+
+
+def test_light_depth_runs_no_sources(registry):
+    plan = plan_scan("deep", {"scan_depth": "LIGHT"}, "bob", email="bob@example.com", registry=registry)
+    assert plan.depth == "light" and plan.sources == [] and plan.api_requests == 0
+
+
+@pytest.mark.parametrize("filters, message", [
+    ({"scan_depth": "medium"}, "scan_depth"),
+    ({"platforms": "nosuchsite"}, "nosuchsite"),
+    ({"platforms": ["category:nosuchtag"]}, "category:nosuchtag"),
+    ({"exclude_platforms": ["nosuchsite"]}, "exclude_platforms"),
+    ({"platforms": [1, 2]}, "list of strings"),
+    ({"sources": ["telepathy"]}, "telepathy"),
+    ({"exclude_sources": ["telepathy"]}, "telepathy"),
+])
+def test_bad_filters_raise(registry, filters, message):
+    with pytest.raises(ValueError, match=message):
+        plan_scan("deep", filters, "bob", registry=registry)
+
+
+def test_stored_filters_ignore_unknown_platforms(registry):
+    filters = {"platforms": ["GitHub", "Gone", "category:defunct"], "exclude_platforms": ["AlsoGone"]}
+    assert names(plan_scan("light", filters, "bob", registry=registry, strict=False)) == ["GitHub"]
+
+
+def test_stored_filters_with_only_unknown_platforms_scan_everything(registry):
+    plan = plan_scan("light", {"platforms": ["Gone", "category:defunct"]}, "bob", registry=registry, strict=False)
+    assert len(plan.platforms) == len(registry)
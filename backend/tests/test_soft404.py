@@ -0,0 +1,107 @@
+"""Soft-404 fingerprints (username masking, matching) and per-platform baselines"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from platforms import Platform
+from soft404 import Fingerprint, SoftNotFoundDetector
+
+HOST = "https://example.co"
+FILLER = b'<div><a href="/explore">Explore</a> <code>v2</code> <span data-nonce="9f8e7d6c">1718000000</span></div>'
+
+
+def response(url, body, status_code=200, truncated=False):
+    return SimpleNamespace(status_code=status_code, url=url, body=body, truncated=truncated)
+
+
+def search_page(username, nonce=b"1718000000"):
+    body = b"<title>Search | example.co</title><p>No results for " + username.encode() + b".</p>"
+    return response(f"{HOST}/search?q={username}", body + FILLER.replace(b"1718000000", nonce))
+
+
+def fingerprint(page, username):
+    return Fingerprint.of(page, username)
+
+
+@pytest.mark.parametrize("username", ["co", "ex", "de", "alice", "Bob_99"])
+def test_missing_user_pages_match_across_usernames(username):
+    baseline = fingerprint(search_page("qwertyuiopasdf"), "qwertyuiopasdf")
+    assert fingerprint(search_page(username, nonce=b"1718999999"), username).matches(baseline)
+
+
+def test_short_username_is_not_masked_inside_words_or_hosts():
+    page = response(f"{HOST}/co", b"<code>co-op</code> example.co co.uk hello co.")
+    masked = fingerprint(page, "co")
+    assert masked.final_url == f"{HOST}/{{}}"
+    # Only the trailing "co." (punctuation) is the username; hosts, tags and words stay
+    same_except_name = response(f"{HOST}/zz", b"<code>co-op</code> example.co co.uk hello zz.")
+    assert fingerprint(same_except_name, "zz").digest == masked.digest
+
+
+def test_username_is_masked_in_path_and_query_but_not_host():
+    page = response("https://alice.example.com/alice?next=/alice/", b"")
+    assert fingerprint(page, "alice").final_url == "https://alice.example.com/{}?next=/{}"
+
+
+def test_status_or_url_difference_never_matches():
+    baseline = fingerprint(search_page("qwertyuiop"), "qwertyuiop")
+    page = search_page("alice")
+    assert not fingerprint(response(page.url, page.body, status_code=404), "alice").matches(baseline)
+    assert not fingerprint(response(f"{HOST}/alice", page.body), "alice").matches(baseline)
+
+
+def test_size_tolerance_applies_only_to_full_bodies():
+    a = response(f"{HOST}/login", b"x" * 1000)
+    b = response(f"{HOST}/login", b"y" * 1040)
+    assert fingerprint(a, "u").matches(fingerprint(b, "u"), tolerance=0.05)
+    assert not fingerprint(a, "u").matches(fingerprint(b, "u"), tolerance=0.01)
+    truncated = response(f"{HOST}/login", b"y" * 1040, truncated=True)
+    assert not fingerprint(a, "u").matches(fingerprint(truncated, "u"), tolerance=0.05)
+
+
+def test_profile_page_does_not_match_missing_user_page():
+    baseline = fingerprint(search_page("qwertyuiop"), "qwertyuiop")
+    profile = response(f"{HOST}/search?q=alice", b"<title>alice | example.co</title><h1>alice</h1>" + FILLER * 3)
+    assert not fingerprint(profile, "alice").matches(baseline)
+
+
+def test_detector_baseline_lifecycle():
+    detector = SoftNotFoundDetector(enabled=True, ttl=3600, retry_interval=3600)
+    assert not detector.can_check("Site")
+    assert not detector.is_soft_404("Site", search_page("alice"), "alice")
+
+    assert detector.claim_refresh("Site")
+    assert not detector.claim_refresh("Site")  # one refresh in flight
+    detector.set_baseline("Site", fingerprint(search_page("qwertyuiop"), "qwertyuiop"))
+    assert not detector.claim_refresh("Site")  # fresh until ttl
+    assert detector.can_check("Site")
+
+    assert detector.is_soft_404("Site", search_page("alice"), "alice")
+    assert not detector.is_soft_404("Site", response(f"{HOST}/alice", b"profile"), "alice")
+    stats = detector.stats()
+    assert (stats["checks"], stats["soft_404s"], stats["unchecked"], stats["baselines"]) == (2, 1, 1, 1)
+
+
+def test_failed_baseline_is_retried_after_interval():
+    detector = SoftNotFoundDetector(enabled=True, ttl=3600, retry_interval=0)
+    assert detector.claim_refresh("Site")
+    detector.set_baseline("Site", None)
+    assert not detector.can_check("Site")
+    assert detector.claim_refresh("Site")
+    assert detector.stats()["baseline_failures"] == 1
+
+
+def test_disabled_detector_checks_nothing():
+    detector = SoftNotFoundDetector(enabled=False)
+    assert not detector.claim_refresh("Site")
+    assert detector.can_check("Site")
+    assert not detector.is_soft_404("Site", search_page("alice"), "alice")
+
+
+def test_random_username_respects_platform_rules():
+    lowercase_only = Platform("Strict", "https://strict.example/{}", regex=r"^[a-z]{6,10}$")
+    name = SoftNotFoundDetector.random_username(lowercase_only)
+    assert name and lowercase_only.accepts(name)
+    impossible = Platform("Numeric", "https://numeric.example/{}", regex=r"^[0-9]+$")
+    assert SoftNotFoundDetector.random_username(impossible) is None
@@ -0,0 +1,83 @@
+"""Keyword matching: word starts, longest-wins, categories and the clean-token cache"""
+
+import pytest
+
+import threat_matcher
+from threat_matcher import ThreatMatcher, _trie_pattern
+
+KEYWORDS = {
+    "violent": ["kill", "terror", "bomb"],
+    "illegal": ["hack", "ransom", "ransomware"],
+    "extremist": ["terror", "radical"],
+}
+
+
+@pytest.fixture
+def matcher():
+    return ThreatMatcher(keywords=KEYWORDS)
+
+
+def keywords(matcher, text):
+    return [keyword for keyword, _, _ in matcher.finditer(text)]
+
+
+def test_trie_pattern_factors_prefixes():
+    assert _trie_pattern(["ransom", "ransomware", "radical"]) == "ra(?:dical|nsom(?:ware)?)"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("he was killed", ["kill"]),
+    ("Hackers everywhere", ["hack"]),
+    ("terrorism news", ["terror"]),
+    ("a useful skill", []),
+    ("a fishing shack", []),
+    ("photobombed", []),
+    ("(kill) and kill.", ["kill", "kill"]),
+])
+def test_keywords_match_only_at_word_start(matcher, text, expected):
+    assert keywords(matcher, text) == expected
+
+
+def test_longest_keyword_wins(matcher):
+    result = matcher.scan("new ransomware strain, ransom paid")
+    assert result["counts"] == {"ransomware": 1, "ransom": 1}
+    assert [(m["start"], m["end"]) for m in result["matches"]] == [(4, 14), (23, 29)]
+
+
+def test_keyword_in_several_categories_counts_once(matcher):
+    result = matcher.scan("terror threat")
+    assert result["keywords"] == ["terror"]
+    assert result["categories"] == {"violent": 1, "extremist": 1}
+    assert result["threat_level"] == "high"
+
+
+def test_threat_level_and_detect(matcher):
+    assert matcher.detect("learning to hack, hack, hack") == (["hack"], "medium")
+    assert matcher.detect("radical ideas") == (["radical"], "none")
+    assert matcher.detect("") == ([], "none")
+
+
+def test_non_ascii_text_keeps_original_offsets(matcher):
+    text = "İstanbul: KILLED"
+    [(keyword, start, end)] = matcher.finditer(text)
+    assert keyword == "kill" and text[start:end] == "KILLED"
+
+
+def test_clean_tokens_are_cached(matcher):
+    assert keywords(matcher, "hello there friend") == []
+    assert {"hello", "there", "friend"} <= matcher._clean_tokens
+    assert keywords(matcher, "friend said kill") == ["kill"]
+    assert "kill" in matcher._flagged_tokens
+    # A flagged token still matches once every token is cached
+    assert keywords(matcher, "kill friend") == ["kill"]
+
+
+def test_token_cache_resets_when_full(matcher, monkeypatch):
+    monkeypatch.setattr(threat_matcher, "TOKEN_CACHE_SIZE", 3)
+    matcher.scan("one two three kill")
+    assert len(matcher._clean_tokens) + len(matcher._flagged_tokens) == 4
+
+    matcher.scan("five six")
+    assert matcher._clean_tokens == {"five", "six"} and not matcher._flagged_tokens
+    # Matching is unaffected by the reset
+    assert keywords(matcher, "kill two") == ["kill"]
@@ -0,0 +1,294 @@
+"""
+text_scan.py
+
+Bulk threat scanning of analyst-supplied text (chat exports, forum
+scrapes) with the same matcher detect_threat_keywords uses on mentions.
+- Uploads are read as a byte stream and split into documents as they
+  arrive. Supported layouts are one document per line, blank-line
+  separated paragraphs, and NDJSON objects with a "text" field.
+- A document split across upload chunks is carried over until its
+  separator arrives, so keywords are never cut at a chunk boundary.
+  Documents longer than TEXT_SCAN_MAX_DOCUMENT are cut at whitespace
+  into segments, and the segment results are merged back together.
+- Documents are grouped into batches of about TEXT_SCAN_BATCH_SIZE
+  characters. A single-batch upload is scanned in-process. Larger ones
+  go to a process pool, with at most two batches per worker in flight.
+  Memory therefore stays flat however large the upload is.
+- Only documents with hits are returned, in input order.
+"""
+
+import asyncio
+import codecs
+import json
+import multiprocessing
+import re
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import APIConfig
+from shared_state import after_fork
+from blocking import run_blocking
+from threat_matcher import threat_matcher, LEVEL_ORDER
+
+logger = logging.getLogger(__name__)
+
+# Document separators per upload layout
+SEPARATORS = {
+    "lines": re.compile(r"\n"),
+    "paragraphs": re.compile(r"\n(?:[ \t\r]*\n)+"),
+    "ndjson": re.compile(r"\n"),
+}
+
+# Offsets kept per document (keyword counts are always complete)
+MAX_MATCHES_PER_DOCUMENT = 100
+
+# Context kept either side of a document's first hit
+EXCERPT_CHARS = 80
+
+# Segment: (document index, document id, offset within the document, text)
+Segment = Tuple[int, Any, int, str]
+
+
+def scan_segments(segments: List[Segment]) -> List[Dict]:
+    """Scan a batch of segments (runs in pool workers); one hit row per segment with keywords"""
+    hits = []
+    for index, doc_id, offset, text in segments:
+        result = threat_matcher.scan(text, offsets=True)
+        if not result["keywords"]:
+            continue
+        matches = result.pop("matches")
+        first = matches[0]
+        result["excerpt"] = text[max(0, first["start"] - EXCERPT_CHARS):first["end"] + EXCERPT_CHARS]
+        result["matches"] = [
+            {"keyword": match["keyword"], "start": match["start"] + offset, "end": match["end"] + offset}
+            for match in matches[:MAX_MATCHES_PER_DOCUMENT]
+        ]
+        hits.append({"index": index, "id": doc_id, **result})
+    return hits
+
+
+def merge_hit(into: Dict, hit: Dict):
+    """Fold a later segment's hit row into the document's row"""
+    for keyword, count in hit["counts"].items():
+        into["counts"][keyword] = into["counts"].get(keyword, 0) + count
+    for category, count in hit["categories"].items():
+        into["categories"][category] = into["categories"].get(category, 0) + count
+    into["keywords"] = list(into["counts"])
+    into["matches"].extend(hit["matches"][:MAX_MATCHES_PER_DOCUMENT - len(into["matches"])])
+    into["threat_level"] = max(into["threat_level"], hit["threat_level"], key=LEVEL_ORDER.index)
+
+
+class DocumentSplitter:
+    """Incremental bytes -> document segments, for one upload"""
+
+    def __init__(self, mode: str = "lines", max_document: int = APIConfig.TEXT_SCAN_MAX_DOCUMENT):
+        if mode not in SEPARATORS:
+            raise ValueError(f"Unknown format: {mode} (expected one of {', '.join(SEPARATORS)})")
+        self.mode = mode
+        self.max_document = max_document
+        self.separator = SEPARATORS[mode]
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""      # start of the current document, not yet emitted
+        self._offset = 0        # characters of the current document already emitted
+        self._skipping = False  # dropping the rest of an oversized NDJSON line
+        self.documents = 0
+        self.invalid = 0
+        self.bytes = 0
+
+    def feed(self, data: bytes) -> List[Segment]:
+        self.bytes += len(data)
+        return self._split(self._decoder.decode(data), final=False)
+
+    def close(self) -> List[Segment]:
+        return self._split(self._decoder.decode(b"", final=True), final=True)
+
+    def _split(self, text: str, final: bool) -> List[Segment]:
+        parts = self.separator.split(self._pending + text)
+        self._pending = "" if final else parts.pop()
+        if final and parts and not parts[-1]:
+            # Trailing separator, not an empty last document
+            parts.pop()
+        if self._skipping:
+            if not parts and not final:
+                self._pending = ""
+                return []
+            self._skipping = False
+            parts = parts[1:]
+
+        segments = []
+        for part in parts:
+            segments.extend(self._document(part))
+        if len(self._pending) > self.max_document:
+            segments.extend(self._cut_oversized())
+        return segments
+
+    def _cut_oversized(self) -> List[Segment]:
+        """Emit the head of an over-long document, cut at whitespace"""
+        if self.mode == "ndjson":
+            # A JSON line can't be cut; drop it up to its newline
+            self.invalid += 1
+            self._pending, self._skipping = "", True
+            return []
+        segments = []
+        while len(self._pending) > self.max_document:
+            cut = max(self._pending.rfind(" ", 0, self.max_document),
+                      self._pending.rfind("\t", 0, self.max_document)) + 1 or self.max_document
+            segments.append((self.documents, None, self._offset, self._pending[:cut]))
+            self._offset += cut
+            self._pending = self._pending[cut:]
+        return segments
+
+    def _document(self, part: str) -> List[Segment]:
+        """Segments for a completed document"""
+        offset, self._offset = self._offset, 0
+        doc_id = None
+        if self.mode == "ndjson":
+            if not part.strip():
+                return []
+            try:
+                record = json.loads(part)
+                doc_id, text = (record.get("id"), record.get("text")) if isinstance(record, dict) else (None, record)
+                if not isinstance(text, str):
+                    raise ValueError("no text field")
+            except ValueError:
+                self.invalid += 1
+                return []
+        else:
+            text = part.rstrip("\r")
+
+        index = self.documents
+        self.documents += 1
+        if not text.strip():
+            return []
+        return [(index, doc_id, offset, text)]
+
+
+class TextScanEngine:
+    """Stream, split and threat-scan bulk text uploads"""
+
+    def __init__(self, workers: int = APIConfig.TEXT_SCAN_WORKERS,
+                 batch_size: int = APIConfig.TEXT_SCAN_BATCH_SIZE,
+                 max_document: int = APIConfig.TEXT_SCAN_MAX_DOCUMENT):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_document = max_document
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        after_fork(self, "_reset_after_fork")
+
+    def _reset_after_fork(self):
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """Process pool, started on the first multi-batch upload"""
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn: same reasoning as the phone batch pool
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    async def scan(self, chunks: AsyncIterator[bytes], mode: str = "lines",
+                   on_hits: Optional[Callable[[List[Dict]], Awaitable[Any]]] = None) -> Dict:
+        """
+        Scan an upload given as an async iterator of byte chunks.
+        Completed hit rows ({"index", "id", "keywords", "counts", "categories",
+        "threat_level", "matches", "excerpt"}) are passed to on_hits in
+        input order, a batch at a time. Returns the summary.
+        """
+        started = time.perf_counter()
+        splitter = DocumentSplitter(mode, self.max_document)
+        use_pool = False
+        inflight: deque = deque()
+        batch: List[Segment] = []
+        batch_chars = 0
+        current: Optional[Dict] = None
+        flagged = 0
+        levels: Dict[str, int] = {}
+        keywords: Dict[str, int] = {}
+
+        async def finish(documents: List[Dict]):
+            nonlocal flagged
+            for document in documents:
+                flagged += 1
+                levels[document["threat_level"]] = levels.get(document["threat_level"], 0) + 1
+                for keyword, count in document["counts"].items():
+                    keywords[keyword] = keywords.get(keyword, 0) + count
+            if documents and on_hits is not None:
+                await on_hits(documents)
+
+        async def collect(hits: List[Dict]):
+            # Rows arrive in input order; a row for a new index completes the previous document
+            nonlocal current
+            done = []
+            for hit in hits:
+                if current is not None and current["index"] == hit["index"]:
+                    merge_hit(current, hit)
+                    continue
+                if current is not None:
+                    done.append(current)
+                current = hit
+            await finish(done)
+
+        async def dispatch(segments: List[Segment]):
+            nonlocal use_pool
+            use_pool = use_pool or self.workers > 1
+            if not use_pool:
+                await collect(await run_blocking(scan_segments, segments))
+                return
+            while len(inflight) >= self.workers * 2:
+                await collect(await inflight.popleft())
+            inflight.append(asyncio.wrap_future(self.pool.submit(scan_segments, segments)))
+
+        try:
+            async for data in chunks:
+                for segment in splitter.feed(data):
+                    batch.append(segment)
+                    batch_chars += len(segment[3])
+                    if batch_chars >= self.batch_size:
+                        await dispatch(batch)
+                        batch, batch_chars = [], 0
+            batch.extend(splitter.close())
+            if batch:
+                if use_pool:
+                    await dispatch(batch)
+                else:
+                    await collect(await run_blocking(scan_segments, batch))
+            while inflight:
+                await collect(await inflight.popleft())
+            if current is not None:
+                await finish([current])
+        finally:
+            for future in inflight:
+                future.cancel()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "format": mode,
+            "documents": splitter.documents,
+            "flagged": flagged,
+            "invalid": splitter.invalid,
+            "bytes": splitter.bytes,
+            "threat_levels": levels,
+            "keywords": keywords,
+            "workers": self.workers if use_pool else 1,
+            "elapsed": round(elapsed, 3),
+            "mb_per_sec": round(splitter.bytes / 1e6 / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+
+# Initialize engine singleton
+text_scan_engine = TextScanEngine()
@@ -0,0 +1,172 @@
+"""
+threat_matcher.py
+
+Compiled threat keyword matcher, built once from config.THREAT_KEYWORDS.
+All keywords go into one regex, factored as a prefix trie so each
+position costs one branch per character instead of one try per keyword.
+Each text is scanned in a single pass, and every hit comes back with its
+keyword, categories and offsets.
+Most mentions have no threat words, and social text reuses a small
+vocabulary. So before any regex runs, a text's whitespace tokens are
+checked against a cache of tokens already known to be clean. Only
+texts with an unseen or flagged token are matched.
+- Keywords only match at the start of a word. Inflections still count
+  ("killed", "hackers", "terrorism"); words that merely contain a
+  keyword ("skill", "shack") do not.
+- A keyword listed in several categories ("terror") is one keyword with
+  several categories. It is never reported twice.
+- When keywords overlap, the longest wins ("ransomware" over "ransom").
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from config import THREAT_KEYWORDS
+
+# Threat level a category raises a text to; unlisted categories don't raise it
+CATEGORY_THREAT_LEVELS = {
+    "violent": "high",
+    "illegal": "medium",
+}
+
+LEVEL_ORDER = ("none", "low", "medium", "high")
+
+# Tokens remembered as clean/flagged before the caches are reset
+TOKEN_CACHE_SIZE = 200_000
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex alternation for words with shared prefixes factored out:
+    ["ransom", "ransomware", "radical"] -> "ra(?:dical|nsom(?:ware)?)".
+    The optional tails are greedy, so the longest keyword wins.
+    """
+    trie: Dict[str, Dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class ThreatMatcher:
+    """Single-pass keyword matcher with categories, offsets and counts"""
+
+    def __init__(self, keywords: Optional[Dict[str, List[str]]] = None,
+                 levels: Optional[Dict[str, str]] = None):
+        keywords = keywords if keywords is not None else THREAT_KEYWORDS
+        self.levels = levels if levels is not None else CATEGORY_THREAT_LEVELS
+
+        # keyword -> categories, in config order
+        self.categories: Dict[str, Tuple[str, ...]] = {}
+        for category, words in keywords.items():
+            for word in words:
+                word = word.lower()
+                if category not in self.categories.get(word, ()):
+                    self.categories[word] = self.categories.get(word, ()) + (category,)
+
+        # ASCII text is lowercased up front and matched case-sensitively,
+        # which is much cheaper than IGNORECASE. Lowercasing can change the
+        # length of non-ASCII text, so that keeps the IGNORECASE pattern
+        # and its offsets stay true to the original
+        source = r"(?<!\w)(" + _trie_pattern(self.categories) + r")\w*"
+        self.pattern = re.compile(source)
+        self.pattern_ignorecase = re.compile(source, re.IGNORECASE)
+
+        # Lowercased whitespace tokens with / without a keyword hit
+        self._clean_tokens: Set[str] = set()
+        self._flagged_tokens: Set[str] = set()
+
+    def _may_match(self, lowered: str) -> bool:
+        """False when every token of the (lowercased) text is known to be clean"""
+        # Scan threads share the caches without a lock: each call works on the
+        # sets it read, so a concurrent reset only drops entries, never answers
+        clean, flagged = self._clean_tokens, self._flagged_tokens
+        tokens = set(lowered.split())
+        unknown = tokens - clean
+        if not unknown:
+            return False
+        if len(clean) + len(flagged) > TOKEN_CACHE_SIZE:
+            clean, flagged = set(), set()
+            self._clean_tokens, self._flagged_tokens = clean, flagged
+        may_match = not flagged.isdisjoint(unknown)
+        for token in unknown - flagged:
+            if self.pattern.search(token):
+                flagged.add(token)
+                may_match = True
+            else:
+                clean.add(token)
+        return may_match
+
+    def finditer(self, text: str) -> Iterator[Tuple[str, int, int]]:
+        """(keyword, start, end) for every hit; the span covers the whole matched word"""
+        lowered = text.lower()
+        if not self._may_match(lowered):
+            return
+        if text.isascii():
+            for match in self.pattern.finditer(lowered):
+                yield match.group(1), match.start(), match.end()
+        else:
+            for match in self.pattern_ignorecase.finditer(text):
+                yield match.group(1).lower(), match.start(), match.end()
+
+    def level_for(self, keywords: Iterable[str]) -> str:
+        """Highest threat level raised by any of the keywords' categories"""
+        rank = 0
+        for keyword in keywords:
+            for category in self.categories.get(keyword, ()):
+                rank = max(rank, LEVEL_ORDER.index(self.levels.get(category, "none")))
+        return LEVEL_ORDER[rank]
+
+    def scan(self, text: str, offsets: bool = True) -> Dict:
+        """
+        Scan one text.
+        Returns {"keywords": [...] (first-seen order), "counts": {keyword: n},
+        "categories": {category: n}, "threat_level": ..., "matches": [...]}
+        """
+        counts: Dict[str, int] = {}
+        matches = []
+        for keyword, start, end in self.finditer(text or ""):
+            counts[keyword] = counts.get(keyword, 0) + 1
+            if offsets:
+                matches.append({"keyword": keyword, "start": start, "end": end})
+
+        categories: Dict[str, int] = {}
+        for keyword, count in counts.items():
+            for category in self.categories[keyword]:
+                categories[category] = categories.get(category, 0) + count
+
+        result = {
+            "keywords": list(counts),
+            "counts": counts,
+            "categories": categories,
+            "threat_level": self.level_for(counts),
+        }
+        if offsets:
+            result["matches"] = matches
+        return result
+
+    def scan_many(self, texts: Iterable[str], offsets: bool = False) -> Iterator[Dict]:
+        """scan() over a corpus, lazily"""
+        for text in texts:
+            yield self.scan(text, offsets=offsets)
+
+    def detect(self, text: str) -> Tuple[List[str], str]:
+        """(keywords, threat level): the DeepScanService.detect_threat_keywords contract"""
+        if not text:
+            return [], "none"
+        keywords = list(dict.fromkeys(keyword for keyword, _, _ in self.finditer(text)))
+        return keywords, self.level_for(keywords)
+
+
+# Initialize matcher singleton
+threat_matcher = ThreatMatcher()